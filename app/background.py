@@ -0,0 +1,36 @@
+import threading
+
+from app.config import settings
+from app.database import get_engine
+from app.summaries import start_refresh_thread
+from app.snapshots import start_snapshot_thread, duckdb_available
+from app.write_queue import start_flusher
+
+# Background threads shared by every session of the server process. Every
+# page calls start_background_threads first thing, so they run whichever
+# page a user opens first.
+
+_started = False
+_lock = threading.Lock()
+
+
+def start_background_threads():
+    """
+    Starts the configured background threads once per process: the summary
+    refresher, the analytics snapshots and the write-behind flusher.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+        if settings.SUMMARY_REFRESH_SECONDS > 0:
+            start_refresh_thread(get_engine(), settings.SUMMARY_REFRESH_SECONDS)
+        # Without duckdb nothing could read the snapshots (see validate_config)
+        if settings.ANALYTICS_BACKEND == 'snapshot' and settings.ANALYTICS_SNAPSHOT_SECONDS > 0 \
+                and duckdb_available():
+            start_snapshot_thread(get_engine(), settings.ANALYTICS_SNAPSHOT_SECONDS)
+        # Queued entries are written even if nobody opens an entry page
+        if settings.WRITE_BEHIND:
+            start_flusher()
@@ -0,0 +1,276 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+from sqlalchemy import func
+
+from app import crud
+from app.cache import forecast_cache, sales_frame_cache
+from app.database import get_engine, session_scope, SessionLocal
+from app.importer import import_file
+from app.models import Sale, Expense
+from app.reports import build_dashboard_data, build_overview_data
+from app.synthetic import generate_sales, generate_expenses
+from app.utils.calculations import get_roi
+
+# Times the read and write paths against whatever DATABASE_URL points at,
+# typically a database filled by `python -m app.synthetic`. Windows end on
+# the last day that has sales, so results stay comparable for the same
+# synthetic data. Write cases run inside a transaction that is rolled back,
+# so they leave the data as it was.
+
+WINDOWS = {'7d': 7, '30d': 30, '90d': 90, '365d': 365}
+DEFAULT_REPEAT = 5
+# Functions that return one object per row get slow and memory hungry on
+# long windows of a 10M row table, so they stop at this many days
+RAW_ROWS_MAX_DAYS = 90
+
+
+def _consume(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+def _overview(session, start, end):
+    span = end - start
+    return build_overview_data(session, start, end, start - span, start - timedelta(days=1))
+
+# (name, function(session, start, end), returns raw rows)
+CASES = [
+    ('get_sales_in_range', crud.get_sales_in_range, True),
+    ('get_expenses_in_range', crud.get_expenses_in_range, True),
+    ('get_sales_frame', crud.get_sales_frame, True),
+    ('get_expenses_frame', crud.get_expenses_frame, True),
+    ('iter_sales_csv', lambda s, a, b: _consume(crud.iter_sales_csv(s, a, b)), True),
+    ('iter_expenses_csv', lambda s, a, b: _consume(crud.iter_expenses_csv(s, a, b)), True),
+    ('get_sales_page', lambda s, a, b: crud.get_sales_page(s, start_date=a, end_date=b)[0], False),
+    ('get_expenses_page', lambda s, a, b: crud.get_expenses_page(s, start_date=a, end_date=b)[0], False),
+    ('get_sales_totals', crud.get_sales_totals, False),
+    ('get_expense_totals', crud.get_expense_totals, False),
+    ('get_period_comparison', lambda s, a, b: crud.get_period_comparison(s, a, b, a - (b - a), a), False),
+    ('get_daily_sales_totals', crud.get_daily_sales_totals, False),
+    ('get_daily_expense_totals', crud.get_daily_expense_totals, False),
+    ('get_sales_by_category', crud.get_sales_by_category, False),
+    ('get_sales_by_item', crud.get_sales_by_item, False),
+    ('get_expenses_by_type', crud.get_expenses_by_type, False),
+    ('get_data_version', crud.get_data_version, False),
+    ('get_roi', get_roi, False),
+    ('build_dashboard_data', build_dashboard_data, False),
+    ('build_overview_data', _overview, False),
+]
+
+# Rows written per run by the bulk and import write cases, spread over the window
+WRITE_ROWS = 10_000
+
+def _write_inputs(start, end):
+    # Synthetic rows like the generator's, in the shapes the write paths take
+    days = (end - start).days + 1
+    sales = next(generate_sales(WRITE_ROWS, days=days, end_date=end, chunk_size=WRITE_ROWS))
+    expenses = next(generate_expenses(WRITE_ROWS, days=days, end_date=end, chunk_size=WRITE_ROWS))
+    sales = sales.drop(columns=['total_sale', 'profit', 'day'])
+    expenses = expenses.drop(columns='day')
+    return {
+        'sales': sales.drop(columns='currency').to_dict('records'),
+        'expenses': expenses.drop(columns='currency').to_dict('records'),
+        'sales_csv': sales.to_csv(index=False).encode(),
+        'expenses_csv': expenses.to_csv(index=False).encode(),
+    }
+
+class _Savepoints:
+    # Stands in for the engine passed to import_file: each of its
+    # transactions becomes a savepoint on the benchmark's connection
+    def __init__(self, connection):
+        self.connection = connection
+
+    @contextmanager
+    def begin(self):
+        with self.connection.begin_nested():
+            yield self.connection
+
+def _import(session, source, kind):
+    return import_file(_Savepoints(session.connection()), io.BytesIO(source), kind)['rows_loaded']
+
+# (name, function(session, inputs from _write_inputs))
+WRITE_CASES = [
+    ('create_sale', lambda s, i: [crud.create_sale(s, **i['sales'][0])]),
+    ('create_expense', lambda s, i: [crud.create_expense(s, **i['expenses'][0])]),
+    ('create_sales_bulk', lambda s, i: crud.create_sales_bulk(s, i['sales'])),
+    ('create_expenses_bulk', lambda s, i: crud.create_expenses_bulk(s, i['expenses'])),
+    ('import_file_sales', lambda s, i: _import(s, i['sales_csv'], 'sales')),
+    ('import_file_expenses', lambda s, i: _import(s, i['expenses_csv'], 'expenses')),
+]
+
+
+def _size(result):
+    if isinstance(result, tuple):
+        return _size(result[0])
+    if isinstance(result, int):
+        return result
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        return None
+
+def time_case(function, start, end, repeat: int):
+    """
+    Runs function(session, start, end) `repeat` times, each in a fresh
+    session with the in-process caches cleared. Returns the run times in
+    seconds and the size of the last result.
+    """
+    runs, size = [], None
+    for _ in range(repeat):
+        forecast_cache.clear()
+        sales_frame_cache.clear()
+        with session_scope() as session:
+            started = time.perf_counter()
+            result = function(session, start, end)
+            runs.append(time.perf_counter() - started)
+            size = _size(result)
+            # Leave the data as it was; build_overview_data may store a forecast
+            session.rollback()
+    return runs, size
+
+def time_write_case(function, inputs, repeat: int):
+    """
+    Runs function(session, inputs) `repeat` times, each in a session whose
+    commits only release a savepoint of an outer transaction that is then
+    rolled back. Returns the run times in seconds and the size of the last
+    result.
+    """
+    runs, size = [], None
+    for _ in range(repeat):
+        with get_engine().connect() as connection:
+            if connection.dialect.name == 'sqlite':
+                # pysqlite doesn't emit BEGIN itself, and its implicit
+                # transactions don't survive a SAVEPOINT release, so the
+                # outer transaction is started by hand
+                connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                transaction = connection.begin()
+                connection.exec_driver_sql('BEGIN')
+            else:
+                transaction = connection.begin()
+            session = SessionLocal(bind=connection, join_transaction_mode='create_savepoint')
+            try:
+                started = time.perf_counter()
+                result = function(session, inputs)
+                runs.append(time.perf_counter() - started)
+                size = _size(result)
+            finally:
+                session.close()
+                transaction.rollback()
+    return runs, size
+
+def _result(name, window, runs, size):
+    return {
+        'case': name,
+        'window': window,
+        'median_s': statistics.median(runs),
+        'min_s': min(runs),
+        'mean_s': statistics.fmean(runs),
+        'max_s': max(runs),
+        'runs_s': runs,
+        'result_size': size,
+    }
+
+def run_benchmarks(windows=WINDOWS, repeat: int = DEFAULT_REPEAT, cases=None, on_result=None):
+    """
+    Times every case over each window and returns a JSON-ready report with
+    run metadata and one entry per (case, window). Write cases get their
+    WRITE_ROWS rows spread over the window.
+    """
+    with session_scope() as session:
+        sales_rows = session.query(func.count(Sale.id)).scalar()
+        expenses_rows = session.query(func.count(Expense.id)).scalar()
+        last = session.query(func.max(Sale.timestamp)).scalar()
+    end = (last or datetime.now()).date()
+
+    report = {
+        'meta': {
+            'started_at': datetime.now(UTC).isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'dialect': get_engine().dialect.name,
+            'python': platform.python_version(),
+            'sales_rows': sales_rows,
+            'expenses_rows': expenses_rows,
+            'data_end': end.isoformat(),
+            'repeat': repeat,
+        },
+        'results': [],
+    }
+
+    for name, function, raw_rows in CASES:
+        if cases and name not in cases:
+            continue
+        for window, days in windows.items():
+            if raw_rows and days > RAW_ROWS_MAX_DAYS:
+                continue
+            start = end - timedelta(days=days - 1)
+            result = _result(name, window, *time_case(function, start, end, repeat))
+            report['results'].append(result)
+            if on_result:
+                on_result(result)
+
+    write_cases = [(name, function) for name, function in WRITE_CASES if not cases or name in cases]
+    for window, days in windows.items():
+        if not write_cases:
+            break
+        inputs = _write_inputs(end - timedelta(days=days - 1), end)
+        for name, function in write_cases:
+            result = _result(name, window, *time_write_case(function, inputs, repeat))
+            report['results'].append(result)
+            if on_result:
+                on_result(result)
+    return report
+
+def compare(report: dict, baseline: dict):
+    """
+    Returns rows of (case, window, baseline median, current median, ratio)
+    for every (case, window) present in both reports.
+    """
+    before = {(r['case'], r['window']): r['median_s'] for r in baseline['results']}
+    rows = []
+    for r in report['results']:
+        key = (r['case'], r['window'])
+        if key in before:
+            rows.append((*key, before[key], r['median_s'], r['median_s'] / before[key] if before[key] else None))
+    return rows
+
+
+if __name__ == "__main__":
+    # python -m app.benchmark [--repeat N] [--windows 7d,30d] [--case NAME ...]
+    #                         [--output results.json] [--compare baseline.json]
+    parser = argparse.ArgumentParser(description="Benchmark the crud read and write paths and page data builders.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--windows", default=",".join(WINDOWS), help=f"any of {', '.join(WINDOWS)}")
+    parser.add_argument("--case", action="append", help="only run this case (repeatable)")
+    parser.add_argument("--output", help="JSON file for the results (default benchmark-<UTC time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare medians against")
+    args = parser.parse_args()
+
+    windows = {w: WINDOWS[w] for w in args.windows.split(",")}
+    report = run_benchmarks(windows, args.repeat, args.case, lambda r: print(
+        f"{r['case']:<26} {r['window']:>5}  median {r['median_s'] * 1000:9.2f} ms  "
+        f"min {r['min_s'] * 1000:9.2f} ms  size {r['result_size']}"
+    ))
+
+    output = Path(args.output or f"benchmark-{datetime.now(UTC):%Y%m%dT%H%M%SZ}.json")
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        print(f"\nCompared with {args.compare} (ratio < 1 is faster):")
+        for case, window, before, after, ratio in compare(report, json.loads(Path(args.compare).read_text())):
+            print(f"{case:<26} {window:>5}  {before * 1000:9.2f} ms -> {after * 1000:9.2f} ms  "
+                  f"x{ratio:.2f}" if ratio is not None else f"{case:<26} {window:>5}  n/a")
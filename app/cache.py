@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from datetime import timedelta
+import threading
+
+
+class RangeCache:
+    """
+    Process-wide cache for period results such as the dashboard data.
+
+    Each entry is stored with the data version of the date range it covers
+    (see crud.get_data_version). A lookup with a newer version recomputes that
+    entry only; every other range stays cached, with no TTL. The least
+    recently used entries are dropped beyond max_entries.
+
+    Cached values are shared between sessions and threads, so treat them as
+    read-only.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, version, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # Computed outside the lock so one slow period doesn't block others
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class IncrementalFrameCache:
+    """
+    Keeps previously fetched row frames (with a 'timestamp' column) together
+    with the data version of each day they cover (see
+    crud.get_day_versions).
+
+    When a window moves forward, like "Last 7 Days" on a new day or after
+    new sales, refresh drops rows that slid out of the window and re-fetches
+    only the days whose version changed, which includes the newly covered
+    ones. The cost then follows new activity rather than window size. Any
+    other change of window falls back to a full fetch.
+
+    Versions are bumped in the transaction that writes the row, so a row
+    that commits late, with a lower id than rows already seen, still marks
+    its day as changed. Cached frames are shared, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def refresh(self, key, start_date, end_date, fetch, versions: dict):
+        """
+        Returns the frame for start_date..end_date (whole days). fetch is
+        called as fetch(first_day, last_day) for the whole window or for
+        each run of changed days. versions maps each day of the window to
+        its data version; read it before fetching, so a write landing in
+        between makes its day look changed (safe) rather than current.
+        """
+        import pandas as pd
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry and entry['start'] <= start_date and entry['end'] <= end_date:
+            changed = sorted(day for day, version in versions.items()
+                             if entry['versions'].get(day) != version)
+            kept = entry['frame']
+            kept = kept[kept['timestamp'] >= pd.Timestamp(start_date)]
+            if changed:
+                kept = kept[~kept['timestamp'].dt.normalize().isin(pd.to_datetime(changed))]
+                new_rows = [rows for rows in (fetch(first, last) for first, last in _day_runs(changed))
+                            if not rows.empty]
+                frame = pd.concat([kept, *new_rows], ignore_index=True) \
+                    .sort_values('timestamp', kind='stable', ignore_index=True) if new_rows else kept
+            else:
+                frame = kept
+        else:
+            frame = fetch(start_date, end_date)
+
+        with self._lock:
+            self._entries[key] = {'start': start_date, 'end': end_date, 'frame': frame, 'versions': versions}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _day_runs(days):
+    # Sorted days grouped into (first, last) runs of consecutive days
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+# Module-level so they survive Streamlit reruns and are shared by all sessions
+dashboard_cache = RangeCache()
+overview_cache = RangeCache()
+forecast_cache = RangeCache()
+# Keyed by window length and distance from today, so each rolling window
+# ("Last 7 Days", ...) slides forward incrementally from one day to the next
+sales_frame_cache = IncrementalFrameCache()
@@ -0,0 +1,95 @@
+from sqlalchemy import select, update, func
+from typing import TYPE_CHECKING
+
+from app.models import Category, Product, Sale, DailySalesRollup
+from app.rollups import dialect_insert
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Keeps the product catalog in step with sales written by name only: bulk
+# inserts, file imports and synthetic data. Works with a Session or a
+# Connection, inside the caller's transaction. New names are inserted with
+# ON CONFLICT DO NOTHING, so concurrent writers adding the same product or
+# category don't fail each other.
+
+
+def _ids_by_name(executor, model, names):
+    return dict(executor.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+
+def _category_ids(executor, names):
+    names = set(names)
+    known = _ids_by_name(executor, Category, names)
+    missing = sorted(names - set(known))
+    if missing:
+        executor.execute(dialect_insert(executor, Category.__table__).on_conflict_do_nothing(index_elements=['name']),
+                         [{'name': name} for name in missing])
+        known.update(_ids_by_name(executor, Category, missing))
+    return known
+
+def product_ids(executor, sales: 'pd.DataFrame'):
+    """
+    Returns {item_name: product id} for the items in a batch of sales (the
+    sales table columns). Items not in the catalog yet are added with their
+    average unit cost and price in the batch. Only the batch's names are
+    looked at, so the cost follows the batch, not the history.
+    """
+    names = set(sales['item_name'])
+    known = _ids_by_name(executor, Product, names)
+    new = sales[~sales['item_name'].isin(list(known))]
+    if new.empty:
+        return known
+
+    items = new.groupby('item_name', observed=True).agg(
+        category=('category', 'first'), cost=('cost', 'sum'),
+        sales=('total_sale', 'sum'), units=('quantity_sold', 'sum')
+    )
+    category_ids = _category_ids(executor, items['category'])
+    executor.execute(dialect_insert(executor, Product.__table__).on_conflict_do_nothing(index_elements=['name']), [
+        {
+            'name': name,
+            'category_id': category_ids[row.category],
+            'unit_cost': round(row.cost / row.units, 2) if row.units else 0.0,
+            'unit_price': round(row.sales / row.units, 2) if row.units else None,
+        }
+        for name, row in items.iterrows()
+    ])
+    known.update(_ids_by_name(executor, Product, list(items.index)))
+    return known
+
+def sync_catalog(executor):
+    """
+    Adds every item the daily sales rollup knows but the catalog doesn't,
+    with its average unit cost and price so far, then links sales without a
+    product_id to their product by name. Returns the number of new products.
+
+    This scans all history, so it is for backfills (migration 9); write
+    paths set product_id from product_ids as they insert.
+    """
+    R = DailySalesRollup
+    quantity = func.sum(R.total_quantity)
+    new_items = executor.execute(
+        select(R.item_name, func.max(R.category), func.sum(R.total_cost), func.sum(R.total_sales), quantity)
+        .where(R.item_name.not_in(select(Product.name)))
+        .group_by(R.item_name)
+    ).all()
+
+    if new_items:
+        category_ids = _category_ids(executor, {category for _, category, *_ in new_items})
+        executor.execute(Product.__table__.insert(), [
+            {
+                'name': name,
+                'category_id': category_ids[category],
+                'unit_cost': round(cost / units, 2) if units else 0.0,
+                'unit_price': round(sales / units, 2) if units else None,
+            }
+            for name, category, cost, sales, units in new_items
+        ])
+
+    sales = Sale.__table__
+    executor.execute(
+        update(sales).where(sales.c.product_id.is_(None)).values(
+            product_id=select(Product.id).where(Product.name == sales.c.item_name).scalar_subquery()
+        )
+    )
+    return len(new_items)
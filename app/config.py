@@ -1,21 +1,81 @@
 from dotenv import load_dotenv
+import importlib.util
+import logging
 import os
-import sys
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
-    
-    def __init__(self):
-        self.validate_config()
-    
+    # How often the app refreshes the monthly summaries; 0 leaves it
+    # to `python -m app.summaries --loop` or an external scheduler
+    SUMMARY_REFRESH_SECONDS: int = int(os.getenv("SUMMARY_REFRESH_SECONDS", "0"))
+    # Connection pool: 'queue' keeps up to DB_POOL_SIZE idle connections and
+    # opens up to DB_MAX_OVERFLOW more under load; 'null' opens one per
+    # checkout and closes it after, for use behind PgBouncer. Live pool
+    # metrics are on the Diagnostics page.
+    DB_POOL: str = os.getenv("DB_POOL", "queue").lower()
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # Open every pooled connection in the background as soon as the engine is
+    # created, so the first users after a restart skip the connect handshake
+    DB_POOL_WARMUP: bool = os.getenv("DB_POOL_WARMUP", "false").lower() in ("1", "true", "yes")
+    # Per-statement timing shown on the Diagnostics page. Statements slower
+    # than SLOW_QUERY_MS are also appended to SLOW_QUERY_LOG (JSON lines) if set
+    QUERY_STATS: bool = os.getenv("QUERY_STATS", "true").lower() in ("1", "true", "yes")
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+    SLOW_QUERY_LOG: str = os.getenv("SLOW_QUERY_LOG")
+    # Threads, shared by every session in the process, that run page
+    # builders' independent queries at once, each on its own pooled
+    # connection. Defaults to what the pool can hand out (DB_POOL_SIZE +
+    # DB_MAX_OVERFLOW): fewer caps concurrent users below the pool, more
+    # only wait in it. 1 runs the queries one after another
+    QUERY_WORKERS: int = int(os.getenv("QUERY_WORKERS") or DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    # Entry forms append to a local SQLite queue and a background thread
+    # writes to the database, so a slow or unreachable database doesn't lose
+    # entries. Only turn on where WRITE_QUEUE_PATH survives restarts
+    WRITE_BEHIND: bool = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    WRITE_QUEUE_PATH: str = os.getenv("WRITE_QUEUE_PATH", "write_queue.sqlite")
+    WRITE_QUEUE_BATCH: int = int(os.getenv("WRITE_QUEUE_BATCH", "100"))
+    # Per-section render timing: RENDER_PROFILE (or ?profile=1 in the page
+    # URL) adds a cProfile of each rerun. Timings are appended to
+    # RENDER_TIMING_LOG (JSON lines) and profiles dumped to RENDER_PROFILE_DIR
+    RENDER_PROFILE: bool = os.getenv("RENDER_PROFILE", "false").lower() in ("1", "true", "yes")
+    RENDER_TIMING_LOG: str = os.getenv("RENDER_TIMING_LOG")
+    RENDER_PROFILE_DIR: str = os.getenv("RENDER_PROFILE_DIR")
+    # 'database' or 'snapshot'. With 'snapshot' the Overview's heavy scans read
+    # Parquet snapshots through DuckDB (optional, pip install duckdb), taken by
+    # `python -m app.snapshots` or every ANALYTICS_SNAPSHOT_SECONDS in the app.
+    # Without duckdb the database is used and the app takes no snapshots
+    ANALYTICS_BACKEND: str = os.getenv("ANALYTICS_BACKEND", "database").lower()
+    ANALYTICS_SNAPSHOT_DIR: str = os.getenv("ANALYTICS_SNAPSHOT_DIR", "snapshots")
+    ANALYTICS_SNAPSHOT_SECONDS: int = int(os.getenv("ANALYTICS_SNAPSHOT_SECONDS", "0"))
+
     def validate_config(self):
+        """
+        Called when the engine is first created rather than at import, so
+        importing app modules never exits the process.
+        """
         if not self.DATABASE_URL:
-            print("ERROR: DATABASE_URL environment variable is not set!")
-            print("Please set DATABASE_URL in your environment or .env file")
-            sys.exit(1)
-        
+            raise RuntimeError(
+                "DATABASE_URL environment variable is not set! "
+                "Please set DATABASE_URL in your environment or .env file"
+            )
+
+        if self.DB_POOL not in ('queue', 'null'):
+            raise RuntimeError(f"DB_POOL must be 'queue' or 'null', not {self.DB_POOL!r}")
+
+        if self.ANALYTICS_BACKEND not in ('database', 'snapshot'):
+            raise RuntimeError(f"ANALYTICS_BACKEND must be 'database' or 'snapshot', not {self.ANALYTICS_BACKEND!r}")
+        if self.ANALYTICS_BACKEND == 'snapshot' and importlib.util.find_spec('duckdb') is None:
+            logger.warning("ANALYTICS_BACKEND=snapshot needs duckdb (pip install duckdb), which is not "
+                           "installed; the Overview reads the database and no snapshots are taken")
+
         if not self.DATABASE_URL.startswith(('postgresql://', 'postgres://')):
             print("WARNING: DATABASE_URL should start with 'postgresql://' or 'postgres://'")
 
@@ -1,6 +1,18 @@
+from sqlalchemy import func, select, insert, tuple_, union_all, literal, Float, Integer
 from sqlalchemy.orm import Session
-from app.models import Sale, Expense
-from datetime import datetime, UTC
+from app.models import Sale, Expense, DailySalesRollup, DailyExpenseRollup, DailyDataVersion, Category, Product
+from app.catalog import product_ids
+from app.rollups import record_sale, record_expense, record_sales_batch, record_expenses_batch
+from app.summaries import sales_source, expense_source, fresh_months
+from datetime import datetime, timedelta, UTC
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas is imported inside the functions that build frames, so pages that
+# only write records (the entry forms) start without loading it
 
 # -----------------------------
 # 💰 SALES FUNCTIONS
@@ -13,14 +25,21 @@ def create_sale(
     price_per_unit: float,
     quantity_sold: int,
     cost: float,
-    timestamp: datetime = None
+    timestamp: datetime = None,
+    product_id: int = None,
+    commit: bool = True
 ):
     """
     Inserts a new sales record into the database.
-    Calculates total_sale and profit automatically.
+    Calculates total_sale and profit automatically. Without product_id the
+    sale is linked to the catalog product with the same name, if any.
+    With commit=False the sale is only flushed, for callers that write
+    several records in one transaction.
     """
     total_sale = price_per_unit * quantity_sold
     profit = total_sale - cost
+    if product_id is None:
+        product_id = session.query(Product.id).filter(Product.name == item_name).scalar()
 
     sale = Sale(
         item_name=item_name,
@@ -30,10 +49,15 @@ def create_sale(
         total_sale=total_sale,
         cost=cost,
         profit=profit,
-        timestamp=timestamp or datetime.now(UTC)
+        timestamp=timestamp or datetime.now(UTC),
+        product_id=product_id
     )
 
     session.add(sale)
+    record_sale(session, sale)
+    if not commit:
+        session.flush()
+        return sale
     session.commit()
     session.refresh(sale)
     return sale
@@ -45,6 +69,51 @@ def get_recent_sales(session: Session, limit: int = 10):
     return session.query(Sale).order_by(Sale.timestamp.desc()).limit(limit).all()
 
 
+# -----------------------------
+# 🏷️ PRODUCT CATALOG
+# -----------------------------
+
+def get_products(session: Session):
+    """
+    Returns every product with its category, unit cost and usual price,
+    ordered by name.
+    """
+    rows = session.query(Product.id, Product.name, Category.name, Product.unit_cost, Product.unit_price) \
+        .join(Category, Category.id == Product.category_id).order_by(Product.name).all()
+    return [
+        {'id': id, 'name': name, 'category': category, 'unit_cost': unit_cost, 'unit_price': unit_price}
+        for id, name, category, unit_cost, unit_price in rows
+    ]
+
+def get_categories(session: Session):
+    """
+    Returns all category names in alphabetical order.
+    """
+    return [name for (name,) in session.query(Category.name).order_by(Category.name)]
+
+def save_product(session: Session, name: str, category: str, unit_cost: float, unit_price: float = None):
+    """
+    Creates the product (and its category if new) or updates the existing
+    one with the same name. Returns the Product; the caller commits.
+    """
+    category_row = session.query(Category).filter(Category.name == category).one_or_none()
+    if category_row is None:
+        category_row = Category(name=category)
+        session.add(category_row)
+        session.flush()
+
+    product = session.query(Product).filter(Product.name == name).one_or_none()
+    if product is None:
+        product = Product(name=name)
+        session.add(product)
+    product.category_id = category_row.id
+    product.unit_cost = unit_cost
+    if unit_price is not None:
+        product.unit_price = unit_price
+    session.flush()
+    return product
+
+
 # -----------------------------
 # 🧾 EXPENSES FUNCTIONS
 # -----------------------------
@@ -54,10 +123,12 @@ def create_expense(
     expense_type: str,
     amount: float,
     description: str = None,
-    timestamp: datetime = None
+    timestamp: datetime = None,
+    commit: bool = True
 ):
     """
-    Inserts a new expense record into the database.
+    Inserts a new expense record into the database. commit works as in
+    create_sale.
     """
     expense = Expense(
         expense_type=expense_type,
@@ -67,6 +138,10 @@ def create_expense(
     )
 
     session.add(expense)
+    record_expense(session, expense)
+    if not commit:
+        session.flush()
+        return expense
     session.commit()
     session.refresh(expense)
     return expense
@@ -78,18 +153,473 @@ def get_recent_expenses(session: Session, limit: int = 10):
     return session.query(Expense).order_by(Expense.timestamp.desc()).limit(limit).all()
 
 
+# -----------------------------
+# 📜 KEYSET PAGINATION
+# -----------------------------
+# Pages walk backwards through (timestamp, id), so each page is an index seek
+# on ix_*_timestamp_id no matter how far back it is. Pass the returned cursor
+# to get the next page; it is None once there are no more rows.
+
+def _keyset_page(session: Session, model, cursor, limit, start_date, end_date):
+    query = session.query(model)
+    if start_date:
+        query = query.filter(model.timestamp >= start_date)
+    if end_date:
+        query = query.filter(model.timestamp < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    if cursor:
+        query = query.filter(tuple_(model.timestamp, model.id) < tuple_(*cursor))
+
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1].timestamp, rows[-1].id)
+    return rows, None
+
+def get_sales_page(session: Session, cursor=None, limit: int = 10, start_date=None, end_date=None):
+    """
+    Returns (sales, next_cursor): up to limit sales older than cursor, newest
+    first, optionally restricted to start_date..end_date (whole days).
+    """
+    return _keyset_page(session, Sale, cursor, limit, start_date, end_date)
+
+def get_expenses_page(session: Session, cursor=None, limit: int = 10, start_date=None, end_date=None):
+    """
+    Returns (expenses, next_cursor): up to limit expenses older than cursor,
+    newest first, optionally restricted to start_date..end_date (whole days).
+    """
+    return _keyset_page(session, Expense, cursor, limit, start_date, end_date)
+
+
+# -----------------------------
+# 📦 BULK INSERTS
+# -----------------------------
+
+DEFAULT_BATCH_SIZE = 1000
+
+def _batches(records, batch_size: int):
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        yield batch
+
+def _with_timestamps(batch, columns):
+    """
+    Builds a batch frame from record dicts. Missing timestamps default to now.
+    Timestamps stay Python datetimes so naive and aware values can mix.
+    """
+    import pandas as pd
+
+    now = datetime.now(UTC)
+    frame = pd.DataFrame.from_records(batch, columns=columns)
+    frame['timestamp'] = pd.Series([r.get('timestamp') or now for r in batch], dtype=object)
+    frame['day'] = [ts.date() for ts in frame['timestamp']]
+    return frame
+
+def _insert_batch(session: Session, model, frame: 'pd.DataFrame', return_ids: bool):
+    rows = frame.drop(columns='day').to_dict('records')
+    if return_ids:
+        # Ids in the same order as the records, even when the dialect batches
+        # the executemany into multi-row INSERTs
+        statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return session.execute(statement, rows).scalars().all()
+    session.execute(insert(model), rows)
+    return []
+
+def create_sales_bulk(
+    session: Session,
+    records,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    return_ids: bool = False
+):
+    """
+    Inserts many sales in one transaction, batch_size rows per executemany.
+    Each record is a dict with the create_sale arguments (timestamp optional).
+    total_sale and profit are computed per batch with vectorized arithmetic,
+    and the daily rollup gets one upsert per (day, category, item) per batch.
+    Each sale is linked to its product, which is added if new.
+
+    Returns the number of rows inserted, or the new ids when return_ids is set.
+    """
+    columns = ['item_name', 'category', 'price_per_unit', 'quantity_sold', 'cost']
+    inserted, ids = 0, []
+
+    try:
+        for batch in _batches(records, batch_size):
+            frame = _with_timestamps(batch, columns)
+            frame['total_sale'] = frame['price_per_unit'] * frame['quantity_sold']
+            frame['profit'] = frame['total_sale'] - frame['cost']
+            frame['product_id'] = frame['item_name'].map(product_ids(session, frame)).astype('int64')
+
+            ids.extend(_insert_batch(session, Sale, frame, return_ids))
+            record_sales_batch(session, frame)
+            inserted += len(frame)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return ids if return_ids else inserted
+
+def create_expenses_bulk(
+    session: Session,
+    records,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    return_ids: bool = False
+):
+    """
+    Inserts many expenses in one transaction, batch_size rows per executemany.
+    Each record is a dict with the create_expense arguments (description and
+    timestamp optional).
+
+    Returns the number of rows inserted, or the new ids when return_ids is set.
+    """
+    columns = ['expense_type', 'amount', 'description']
+    inserted, ids = 0, []
+
+    try:
+        for batch in _batches(records, batch_size):
+            frame = _with_timestamps(batch, columns)
+            frame['description'] = frame['description'].astype(object).where(frame['description'].notna(), None)
+
+            ids.extend(_insert_batch(session, Expense, frame, return_ids))
+            record_expenses_batch(session, frame)
+            inserted += len(frame)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return ids if return_ids else inserted
+
+
 # -----------------------------
 # 📅 FILTERED QUERY HELPERS
 # -----------------------------
 
 def get_sales_in_range(session: Session, start_date, end_date):
     """
-    Returns all sales between start_date and end_date.
+    Returns all sales between start_date and end_date, the end day included.
     """
-    return session.query(Sale).filter(Sale.timestamp >= start_date, Sale.timestamp <= end_date).all()
+    end_exclusive = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    return session.query(Sale).filter(Sale.timestamp >= start_date, Sale.timestamp < end_exclusive).all()
 
 def get_expenses_in_range(session: Session, start_date, end_date):
     """
-    Returns all expenses between start_date and end_date.
+    Returns all expenses between start_date and end_date, the end day included.
+    """
+    end_exclusive = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    return session.query(Expense).filter(Expense.timestamp >= start_date, Expense.timestamp < end_exclusive).all()
+
+
+
+# -----------------------------
+# 🧮 COLUMNAR RANGE FETCH
+# -----------------------------
+# Core selects of just the needed columns, loaded straight into a DataFrame.
+# No ORM objects or identity map, so cached frames stay small. Like the
+# aggregate helpers, the end day is included in full.
+
+SALES_FRAME_COLUMNS = ('id', 'timestamp', 'item_name', 'category',
+                       'quantity_sold', 'price_per_unit', 'total_sale')
+EXPENSES_FRAME_COLUMNS = ('id', 'timestamp', 'expense_type', 'amount', 'description')
+
+# Low-cardinality text columns are stored as categoricals to cut memory
+_CATEGORICAL_COLUMNS = {'item_name', 'category', 'expense_type'}
+
+def _range_frame(session: Session, model, columns, start_date, end_date):
+    table = model.__table__
+    end_exclusive = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    stmt = select(*(table.c[name] for name in columns)) \
+        .where(table.c.timestamp >= start_date, table.c.timestamp < end_exclusive) \
+        .order_by(table.c.timestamp)
+
+    import pandas as pd
+
+    result = session.execute(stmt)
+    frame = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    for name in _CATEGORICAL_COLUMNS.intersection(frame.columns):
+        frame[name] = frame[name].astype('category')
+    if 'timestamp' in frame.columns:
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    return frame
+
+def get_sales_frame(session: Session, start_date, end_date, columns=SALES_FRAME_COLUMNS):
+    """
+    Returns sales between start_date and end_date as a DataFrame holding only
+    the requested columns, ordered by timestamp.
+    """
+    return _range_frame(session, Sale, columns, start_date, end_date)
+
+def get_expenses_frame(session: Session, start_date, end_date, columns=EXPENSES_FRAME_COLUMNS):
+    """
+    Returns expenses between start_date and end_date as a DataFrame holding
+    only the requested columns, ordered by timestamp.
+    """
+    return _range_frame(session, Expense, columns, start_date, end_date)
+
+
+# -----------------------------
+# 📤 STREAMING CSV EXPORT
+# -----------------------------
+# Rows come through a server-side cursor (yield_per) and each chunk is
+# formatted and yielded as CSV text, so memory stays flat however long the
+# range is. The session must stay open until the generator is exhausted.
+
+DEFAULT_EXPORT_CHUNK_SIZE = 5000
+
+def _iter_range_csv(session: Session, model, columns, format_chunk, start_date, end_date, chunk_size):
+    import pandas as pd
+
+    table = model.__table__
+    end_exclusive = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    stmt = select(*(table.c[name] for name in columns)) \
+        .where(table.c.timestamp >= start_date, table.c.timestamp < end_exclusive) \
+        .order_by(table.c.timestamp) \
+        .execution_options(yield_per=chunk_size)
+
+    result = session.execute(stmt)
+    header = True
+    for rows in result.partitions():
+        chunk = format_chunk(pd.DataFrame(rows, columns=columns))
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+    if header:
+        # Empty range: still emit the header row
+        yield format_chunk(pd.DataFrame(columns=columns)).to_csv(index=False)
+
+def _format_sales_export(frame: 'pd.DataFrame'):
+    import pandas as pd
+
+    timestamps = pd.to_datetime(frame['timestamp'])
+    return pd.DataFrame({
+        'Date': timestamps.dt.strftime('%Y-%m-%d'),
+        'Time': timestamps.dt.strftime('%H:%M:%S'),
+        'Item': frame['item_name'],
+        'Category': frame['category'],
+        'Quantity': frame['quantity_sold'],
+        'Price per Unit': frame['price_per_unit'],
+        'Total Sale': frame['total_sale']
+    })
+
+def _format_expenses_export(frame: 'pd.DataFrame'):
+    import pandas as pd
+
+    timestamps = pd.to_datetime(frame['timestamp'])
+    return pd.DataFrame({
+        'Date': timestamps.dt.strftime('%Y-%m-%d'),
+        'Time': timestamps.dt.strftime('%H:%M:%S'),
+        'Type': frame['expense_type'],
+        'Amount': frame['amount'],
+        'Description': frame['description'].fillna('')
+    })
+
+def iter_sales_csv(session: Session, start_date, end_date, chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE):
+    """
+    Yields the sales export for start_date to end_date as CSV text chunks,
+    header first.
+    """
+    columns = ['timestamp', 'item_name', 'category', 'quantity_sold', 'price_per_unit', 'total_sale']
+    return _iter_range_csv(session, Sale, columns, _format_sales_export, start_date, end_date, chunk_size)
+
+def iter_expenses_csv(session: Session, start_date, end_date, chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE):
+    """
+    Yields the expenses export for start_date to end_date as CSV text chunks,
+    header first.
+    """
+    columns = ['timestamp', 'expense_type', 'amount', 'description']
+    return _iter_range_csv(session, Expense, columns, _format_expenses_export, start_date, end_date, chunk_size)
+
+
+# -----------------------------
+# 📊 AGGREGATE QUERY HELPERS
+# -----------------------------
+# These read the daily rollup tables, so start_date and end_date are whole
+# days and both are included. Totals and breakdowns go through
+# sales_source / expense_source, which swap in the monthly summaries for
+# closed months that are fully covered and still fresh. Each takes an
+# optional months argument, a summaries.fresh_months result for its range or
+# a wider one; builders look it up once and pass it to every call.
+
+def get_sales_totals(session: Session, start_date, end_date, months=None):
+    """
+    Returns total sales, total quantity and transaction count between
+    start_date and end_date.
+    """
+    source = sales_source(session, start_date, end_date, months)
+    total_sales, total_quantity, transactions = session.query(
+        func.coalesce(func.sum(source.c.total_sales), 0.0),
+        func.coalesce(func.sum(source.c.total_quantity), 0),
+        func.coalesce(func.sum(source.c.transactions), 0)
+    ).one()
+
+    return {
+        'total_sales': float(total_sales),
+        'total_quantity': int(total_quantity),
+        'transactions': int(transactions)
+    }
+
+def get_expense_totals(session: Session, start_date, end_date, months=None):
+    """
+    Returns total expense amount and expense count between start_date and end_date.
+    """
+    source = expense_source(session, start_date, end_date, months)
+    total_expenses, count = session.query(
+        func.coalesce(func.sum(source.c.total_amount), 0.0),
+        func.coalesce(func.sum(source.c.expense_count), 0)
+    ).one()
+
+    return {
+        'total_expenses': float(total_expenses),
+        'count': int(count)
+    }
+
+def get_period_comparison(session: Session, start_date, end_date, comp_start=None, comp_end=None, months=None):
+    """
+    Returns {'current': totals, 'comparison': totals or None} in a single
+    statement over the sales and expense sources of both ranges, so fresh
+    closed months come from the monthly summaries. Each totals dict has
+    total_sales, total_expenses, net_profit and transactions. months may
+    cover both ranges.
+    """
+    periods = {'current': (start_date, end_date)}
+    if comp_start and comp_end:
+        periods['comparison'] = (comp_start, comp_end)
+    if months is None:
+        months = fresh_months(session, min(start for start, _ in periods.values()),
+                              max(end for _, end in periods.values()))
+
+    rows = []
+    for name, (start, end) in periods.items():
+        sales = sales_source(session, start, end, months)
+        expenses = expense_source(session, start, end, months)
+        period = literal(name).label('period')
+        rows.append(select(period, sales.c.total_sales, sales.c.transactions,
+                           literal(0.0, Float).label('total_expenses')))
+        rows.append(select(period, literal(0.0, Float).label('total_sales'), literal(0, Integer).label('transactions'),
+                           expenses.c.total_amount.label('total_expenses')))
+    combined = union_all(*rows).subquery()
+    totals = {
+        period: (total_sales, transactions, total_expenses)
+        for period, total_sales, transactions, total_expenses in session.execute(
+            select(combined.c.period, func.sum(combined.c.total_sales), func.sum(combined.c.transactions),
+                   func.sum(combined.c.total_expenses)).group_by(combined.c.period)
+        )
+    }
+
+    result = {'current': None, 'comparison': None}
+    for name in periods:
+        total_sales, transactions, total_expenses = totals.get(name, (0.0, 0, 0.0))
+        total_sales = float(total_sales or 0.0)
+        total_expenses = float(total_expenses or 0.0)
+        result[name] = {
+            'total_sales': total_sales,
+            'total_expenses': total_expenses,
+            'net_profit': total_sales - total_expenses,
+            'transactions': int(transactions or 0)
+        }
+    return result
+
+def get_daily_sales_totals(session: Session, start_date, end_date):
+    """
+    Returns a {date: total_sale} mapping grouped by calendar day.
+    """
+    rows = session.query(DailySalesRollup.day, func.sum(DailySalesRollup.total_sales)) \
+        .filter(DailySalesRollup.day >= start_date, DailySalesRollup.day <= end_date) \
+        .group_by(DailySalesRollup.day).order_by(DailySalesRollup.day).all()
+    return {d: float(total) for d, total in rows}
+
+def get_daily_expense_totals(session: Session, start_date, end_date):
+    """
+    Returns a {date: amount} mapping grouped by calendar day.
+    """
+    rows = session.query(DailyExpenseRollup.day, func.sum(DailyExpenseRollup.total_amount)) \
+        .filter(DailyExpenseRollup.day >= start_date, DailyExpenseRollup.day <= end_date) \
+        .group_by(DailyExpenseRollup.day).order_by(DailyExpenseRollup.day).all()
+    return {d: float(total) for d, total in rows}
+
+def get_sales_by_category(session: Session, start_date, end_date, months=None):
+    """
+    Returns per-category sales, quantity, transaction count and number of
+    distinct items, ordered by sales descending.
+    """
+    source = sales_source(session, start_date, end_date, months)
+    total = func.sum(source.c.total_sales)
+    rows = session.query(
+        source.c.category,
+        total,
+        func.sum(source.c.total_quantity),
+        func.sum(source.c.transactions),
+        func.count(func.distinct(source.c.item_name))
+    ).group_by(source.c.category).order_by(total.desc()).all()
+
+    return [
+        {
+            'category': category,
+            'sales': float(sales),
+            'quantity': int(quantity),
+            'transactions': int(transactions),
+            'unique_items': int(unique_items)
+        }
+        for category, sales, quantity, transactions, unique_items in rows
+    ]
+
+def get_sales_by_item(session: Session, start_date, end_date, limit: int = None, months=None):
+    """
+    Returns per-item sales, quantity, transaction count and average unit price
+    (sales / quantity), ordered by sales descending. Pass limit to get only the
+    top items.
+    """
+    source = sales_source(session, start_date, end_date, months)
+    total = func.sum(source.c.total_sales)
+    query = session.query(
+        source.c.item_name,
+        func.max(source.c.category),
+        total,
+        func.sum(source.c.total_quantity),
+        func.sum(source.c.transactions)
+    ).group_by(source.c.item_name).order_by(total.desc())
+
+    if limit:
+        query = query.limit(limit)
+
+    return [
+        {
+            'item_name': item_name,
+            'category': category,
+            'sales': float(sales),
+            'quantity': int(quantity),
+            'transactions': int(transactions),
+            # sum() over the PostgreSQL summary views comes back as Decimal
+            'avg_price': float(sales) / int(quantity) if quantity else 0.0
+        }
+        for item_name, category, sales, quantity, transactions in query.all()
+    ]
+
+def get_expenses_by_type(session: Session, start_date, end_date, months=None):
+    """
+    Returns a {expense_type: amount} mapping, ordered by amount descending.
+    """
+    source = expense_source(session, start_date, end_date, months)
+    total = func.sum(source.c.total_amount)
+    rows = session.query(source.c.expense_type, total) \
+        .group_by(source.c.expense_type).order_by(total.desc()).all()
+    return {expense_type: float(amount) for expense_type, amount in rows}
+
+def get_data_version(session: Session, start_date, end_date, sales_only: bool = False):
+    """
+    Returns a watermark for start_date..end_date (whole days) that grows
+    whenever a sale or expense on one of those days is written (only a sale
+    with sales_only). Compare it with the value stored next to a cached
+    result to know if it is stale.
+    """
+    version = DailyDataVersion.sales_version if sales_only else DailyDataVersion.version
+    return int(session.query(func.coalesce(func.sum(version), 0))
+               .filter(DailyDataVersion.day >= start_date, DailyDataVersion.day <= end_date).scalar())
+
+def get_day_versions(session: Session, start_date, end_date):
+    """
+    Returns {day: data version} for the days of start_date..end_date that
+    have ever been written.
     """
-    return session.query(Expense).filter(Expense.timestamp >= start_date, Expense.timestamp <= end_date).all()
+    return dict(session.query(DailyDataVersion.day, DailyDataVersion.version)
+                .filter(DailyDataVersion.day >= start_date, DailyDataVersion.day <= end_date).all())
@@ -1,16 +1,178 @@
-from sqlalchemy import create_engine
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import contextvars
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+import threading
+import time
+
 from app.config import settings
+from app.query_stats import QueryStats
+from app.pool_stats import pool_stats, TimedQueuePool, TimedNullPool
+
+# Bound to the engine when it is first created (see get_engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+_query_executor = None
+# Set in query worker threads so nested fan-outs run inline instead of
+# waiting on the workers they occupy
+_in_query_worker = threading.local()
+
+# Filled by the cursor events below once the engine exists
+query_stats = QueryStats(slow_ms=settings.SLOW_QUERY_MS, slow_log_path=settings.SLOW_QUERY_LOG)
+
+
+def get_engine():
+    """
+    Returns the process-wide engine, creating it and its pool on first use.
+    Nothing connects to the database or validates DATABASE_URL at import time.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                settings.validate_config()
+                _engine = create_engine(settings.DATABASE_URL, echo=False, **_pool_options())
+                SessionLocal.configure(bind=_engine)
+                pool_stats.attach(_engine.pool)
+                if settings.QUERY_STATS:
+                    _instrument(_engine)
+                if settings.DB_POOL_WARMUP and settings.DB_POOL == 'queue':
+                    threading.Thread(target=warm_up_pool, name="pool-warmup", daemon=True).start()
+    return _engine
+
+def _pool_options():
+    # NullPool has nothing to size or recycle: every checkout is a fresh
+    # connection, which PgBouncer in front of the database then pools
+    if settings.DB_POOL == 'null':
+        return {'poolclass': TimedNullPool, 'pool_pre_ping': settings.DB_POOL_PRE_PING}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+    }
+
+def _instrument(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        # EXPLAINs run from the Diagnostics page would only clutter the stats
+        if statement.startswith('EXPLAIN'):
+            return
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        query_stats.record(statement, parameters, seconds, rows, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def discard_timer(context):
+        started = context.connection.info.get('query_started') if context.connection else None
+        if started:
+            started.pop()
+
+def warm_up_pool(connections: int = None):
+    """
+    Opens up to `connections` (default DB_POOL_SIZE) pooled connections at
+    once and hands them back to the pool, so later checkouts reuse them
+    instead of connecting.
+    """
+    engine = get_engine()
+    connections = connections or settings.DB_POOL_SIZE
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    except Exception as e:
+        print(f"Pool warm-up stopped after {len(opened)} connection(s): {e}")
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+def __getattr__(name):
+    # Keeps `from app.database import engine` working for scripts; it creates
+    # the engine at that point, so app code should call get_engine() instead
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@contextmanager
+def session_scope():
+    """
+    Yields a fresh Session for one unit of work and returns its connection to
+    the pool on exit. Commits on success and rolls back on error.
+
+    Sessions are not thread-safe, so never cache one across Streamlit reruns
+    or users; open a scope around each query instead.
+    """
+    get_engine()
+    session = SessionLocal()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _run_in_session(function, args):
+    _in_query_worker.active = True
+    try:
+        with session_scope() as session:
+            return function(session, *args)
+    finally:
+        _in_query_worker.active = False
+
+def submit_queries(calls: dict):
+    """
+    Starts each call in `calls` ({name: (function, *args)}) as
+    function(session, *args) on a query worker thread with its own session,
+    and returns {name: Future} straight away. The QUERY_WORKERS threads are
+    shared by all sessions, so together they hold at most that many pooled
+    connections (see config.py).
+
+    Workers run in a copy of the caller's context, so statements are still
+    attributed to the calling page. Inside a worker, or with QUERY_WORKERS
+    at 1, the calls run one after another before this returns.
+    """
+    global _query_executor
+    if settings.QUERY_WORKERS <= 1 or getattr(_in_query_worker, 'active', False):
+        futures = {}
+        for name, (function, *args) in calls.items():
+            futures[name] = Future()
+            try:
+                with session_scope() as session:
+                    futures[name].set_result(function(session, *args))
+            except Exception as e:
+                futures[name].set_exception(e)
+        return futures
+
+    if _query_executor is None:
+        with _engine_lock:
+            if _query_executor is None:
+                _query_executor = ThreadPoolExecutor(max_workers=settings.QUERY_WORKERS,
+                                                     thread_name_prefix="query")
+    get_engine()
+    return {
+        name: _query_executor.submit(contextvars.copy_context().run, _run_in_session, function, args)
+        for name, (function, *args) in calls.items()
+    }
+
+def gather(futures: dict):
+    """
+    Waits for the futures from submit_queries and returns {name: result}.
+    The first failed call's exception is raised.
+    """
+    return {name: future.result() for name, future in futures.items()}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,148 @@
+from datetime import date, datetime, timedelta, UTC
+from typing import TYPE_CHECKING
+import argparse
+
+from app.models import SalesForecast
+from app.crud import get_daily_sales_totals, get_data_version
+from app.rollups import dialect_insert
+from app.cache import forecast_cache
+
+# numpy and pandas are imported where a model is fitted, so a forecast
+# served from the cache or the table doesn't load them
+if TYPE_CHECKING:
+    import numpy as np
+
+FORECAST_HORIZON = 7
+# The model is fitted to the completed days of this lookback, whatever
+# period the page shows
+FORECAST_LOOKBACK_DAYS = 90
+# The model has 8 parameters (intercept, trend, 6 weekday effects), so it
+# needs a few weeks of completed days to fit more than noise
+MIN_HISTORY_DAYS = 21
+
+
+# -----------------------------
+# 📐 SEASONAL MODEL
+# -----------------------------
+# daily sales = intercept + slope * day_index + weekday effect, with Monday as
+# the baseline weekday. One least-squares solve over the whole history.
+
+def _design_matrix(day_index: 'np.ndarray', weekdays: 'np.ndarray'):
+    import numpy as np
+
+    weekday_dummies = (weekdays[:, None] == np.arange(1, 7)[None, :]).astype(float)
+    return np.column_stack([np.ones(len(day_index)), day_index, weekday_dummies])
+
+def fit_seasonal_model(dates, values):
+    """
+    Fits trend plus day-of-week to consecutive daily values. Returns the
+    model as a dict of plain floats so it can be cached or stored as JSON.
+    """
+    import numpy as np
+    import pandas as pd
+
+    dates = pd.DatetimeIndex(dates)
+    day_index = np.arange(len(dates), dtype=float)
+    X = _design_matrix(day_index, dates.weekday.to_numpy())
+    coef, *_ = np.linalg.lstsq(X, np.asarray(values, dtype=float), rcond=None)
+
+    return {
+        'origin': dates[0].date().isoformat(),
+        'intercept': float(coef[0]),
+        'trend_per_day': float(coef[1]),
+        # Effect of each weekday (0 = Monday) relative to Monday
+        'weekday_effect': [0.0] + [float(c) for c in coef[2:]],
+    }
+
+def predict(model: dict, dates):
+    """
+    Predicts daily sales for dates, floored at 0.
+    """
+    import numpy as np
+    import pandas as pd
+
+    dates = pd.DatetimeIndex(dates)
+    day_index = (dates - pd.Timestamp(model['origin'])).days.to_numpy(dtype=float)
+    weekday_effect = np.asarray(model['weekday_effect'])[dates.weekday.to_numpy()]
+    values = model['intercept'] + model['trend_per_day'] * day_index + weekday_effect
+    return np.clip(values, 0.0, None)
+
+
+# -----------------------------
+# 🔮 FORECASTS
+# -----------------------------
+
+def build_forecast(sales_by_day: dict, start_date, end_date, horizon: int = FORECAST_HORIZON):
+    """
+    Fits the model to start_date..end_date, from the first day with sales
+    on (later days without sales count as 0), and forecasts the horizon days
+    after end_date. Returns None when there is too little history, otherwise
+    a dict with dates, predictions, history_avg and the fitted model.
+    """
+    import pandas as pd
+
+    if not sales_by_day:
+        return None
+    history_dates = pd.date_range(start=max(start_date, min(sales_by_day)), end=end_date, freq='D')
+    if len(history_dates) < MIN_HISTORY_DAYS:
+        return None
+
+    history = pd.Series(sales_by_day, dtype=float).reindex(history_dates.date, fill_value=0.0).to_numpy()
+    model = fit_seasonal_model(history_dates, history)
+    future_dates = pd.date_range(start=end_date + timedelta(days=1), periods=horizon, freq='D')
+
+    return {
+        'dates': [d.isoformat() for d in future_dates.date],
+        'predictions': predict(model, future_dates).tolist(),
+        'history_avg': float(history.mean()),
+        'model': model,
+    }
+
+def _stored_or_fitted(session, start_date, end_date, horizon, version):
+    stored = session.get(SalesForecast, (start_date, end_date, horizon))
+    if stored is not None and stored.data_version == version:
+        return stored.forecast
+
+    forecast = build_forecast(get_daily_sales_totals(session, start_date, end_date), start_date, end_date, horizon)
+    if forecast is not None:
+        # Two sessions can fit the same window at once; the later write wins
+        # instead of failing on the primary key
+        stmt = dialect_insert(session, SalesForecast.__table__).values(
+            start_date=start_date, end_date=end_date, horizon=horizon,
+            data_version=version, forecast=forecast, computed_at=datetime.now(UTC)
+        )
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=['start_date', 'end_date', 'horizon'],
+            set_={name: stmt.excluded[name] for name in ('data_version', 'forecast', 'computed_at')}
+        ))
+    return forecast
+
+def get_sales_forecast(session, horizon: int = FORECAST_HORIZON, today: date = None):
+    """
+    Returns the build_forecast result for the FORECAST_LOOKBACK_DAYS ending
+    yesterday, so the first forecast day is today. It comes from the
+    in-process cache or the sales_forecasts table until a sale on one of
+    those days is written; sales entered today leave it alone. Otherwise it
+    is refitted and stored. The caller commits the session.
+    """
+    end_date = (today or date.today()) - timedelta(days=1)
+    start_date = end_date - timedelta(days=FORECAST_LOOKBACK_DAYS - 1)
+    version = get_data_version(session, start_date, end_date, sales_only=True)
+    return forecast_cache.get_or_compute(
+        (start_date, end_date, horizon), version,
+        lambda: _stored_or_fitted(session, start_date, end_date, horizon, version)
+    )
+
+
+if __name__ == "__main__":
+    from app.database import session_scope
+
+    # Run nightly so the first page load of the day finds the forecast stored
+    parser = argparse.ArgumentParser(description="Precompute today's sales forecast.")
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON)
+    args = parser.parse_args()
+
+    with session_scope() as session:
+        forecast = get_sales_forecast(session, args.horizon)
+    print(f"{sum(forecast['predictions']):.2f} TRY over the next {args.horizon} days"
+          if forecast else "Not enough history")
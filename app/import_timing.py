@@ -0,0 +1,84 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = [ROOT / "streamlit_app" / "dashboard.py"] + sorted((ROOT / "streamlit_app" / "pages").glob("*.py"))
+
+# Runs in a fresh interpreter per page, like the first request after a dyno
+# restart. Reports the time to import streamlit and the time of the page's
+# first full script run (its own imports, queries and rendering).
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+sys.stderr.write("-- page --\\n"); sys.stderr.flush()
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.run()
+finished = time.perf_counter()
+print(json.dumps({
+    "streamlit_import_s": round(imported - started, 3),
+    "first_run_s": round(finished - imported, 3),
+    "exceptions": [str(e.value) for e in app.exception],
+}))
+"""
+
+
+def _top_imports(importtime_log: str, limit: int):
+    """
+    Sums `python -X importtime` cumulative times per top-level package,
+    counting only imports that happened while the page ran.
+    """
+    totals = {}
+    _, _, page_log = importtime_log.partition("-- page --")
+    for line in page_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        # Top-level imports have a single space of indent; nested ones more
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            parts = name.strip().split(".")
+            # Our own modules are reported one level down (app.crud, ...)
+            package = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+            totals[package] = totals.get(package, 0) + int(cumulative) / 1e6
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return {package: round(seconds, 3) for package, seconds in ranked}
+
+def measure_page(page: Path, top: int = 8):
+    """
+    Cold-starts page in a subprocess and returns its timings plus the
+    slowest top-level imports it pulled in.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, str(page)],
+        capture_output=True, text=True, cwd=ROOT, env=env
+    )
+    if completed.returncode != 0:
+        return {"page": page.name, "error": completed.stderr.strip().splitlines()[-1:]}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {"page": page.name, **result, "slowest_imports_s": _top_imports(completed.stderr, top)}
+
+
+if __name__ == "__main__":
+    # python -m app.import_timing [--json] [PAGE ...]
+    parser = argparse.ArgumentParser(description="Report cold-start import and first-run time per page.")
+    parser.add_argument("pages", nargs="*", help="page files (defaults to every page)")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per page")
+    args = parser.parse_args()
+
+    for page in [Path(p).resolve() for p in args.pages] or PAGES:
+        result = measure_page(page)
+        if args.json:
+            print(json.dumps(result))
+        elif "error" in result:
+            print(f"{result['page']:<22} failed: {result['error']}")
+        else:
+            imports = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["slowest_imports_s"].items())
+            print(f"{result['page']:<22} streamlit {result['streamlit_import_s']:.2f}s, "
+                  f"first run {result['first_run_s']:.2f}s  [{imports}]")
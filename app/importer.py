@@ -0,0 +1,245 @@
+from sqlalchemy import insert
+from datetime import datetime
+import argparse
+import io
+import os
+import time
+
+import pandas as pd
+
+from app.models import Sale, Expense
+from app.rollups import record_sales_batch, record_expenses_batch
+from app.catalog import product_ids
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Columns each import kind expects in the source file. Optional columns get the
+# listed default when missing.
+IMPORT_SPECS = {
+    'sales': {
+        'model': Sale,
+        'required': ['item_name', 'category', 'price_per_unit', 'quantity_sold', 'timestamp'],
+        'optional': {'cost': 0.0, 'currency': 'TRY'},
+        'columns': ['item_name', 'category', 'price_per_unit', 'quantity_sold', 'total_sale',
+                    'cost', 'profit', 'currency', 'timestamp', 'product_id'],
+        'record_rollup': record_sales_batch,
+    },
+    'expenses': {
+        'model': Expense,
+        'required': ['expense_type', 'amount', 'timestamp'],
+        'optional': {'description': None, 'currency': 'TRY'},
+        'columns': ['expense_type', 'amount', 'description', 'currency', 'timestamp'],
+        'record_rollup': record_expenses_batch,
+    },
+}
+
+
+# -----------------------------
+# 📂 READING
+# -----------------------------
+
+def _file_format(source, file_format: str = None):
+    if file_format:
+        return file_format
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    return 'parquet' if str(name).lower().endswith(('.parquet', '.pq')) else 'csv'
+
+def iter_chunks(source, file_format: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Streams a CSV or Parquet file (path or file-like) as DataFrames of at most
+    chunk_size rows, so the whole file is never held in memory.
+    """
+    if _file_format(source, file_format) == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+
+# -----------------------------
+# ✅ VALIDATION
+# -----------------------------
+
+def _reject(frame, mask, reason, rejected):
+    if mask.any():
+        bad = frame[mask].copy()
+        bad['reject_reason'] = reason
+        rejected.append(bad)
+    return frame[~mask]
+
+def parse_timestamps(values: pd.Series, dayfirst: bool = True):
+    """
+    Parses each value on its own, so one file can mix dates, datetimes and
+    formats. ISO 8601 comes first so that 2024-01-05 is always 5 January;
+    anything else (05/01/2024 10:30) is read day first unless dayfirst is
+    False. Zone-aware values are converted to UTC. Unparseable values
+    become NaT.
+    """
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601', utc=True)
+    rest = parsed.isna() & values.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest], errors='coerce', format='mixed', dayfirst=dayfirst, utc=True)
+    return parsed.dt.tz_localize(None)
+
+def validate_chunk(frame: pd.DataFrame, kind: str, dayfirst: bool = True):
+    """
+    Coerces types, applies defaults and derives total_sale / profit for sales.
+    Returns (valid, rejected); rejected keeps the source row plus a
+    reject_reason column.
+    """
+    spec = IMPORT_SPECS[kind]
+    missing = [c for c in spec['required'] if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s) for {kind} import: {', '.join(missing)}")
+
+    source = frame
+    frame = frame.copy()
+    for column, default in spec['optional'].items():
+        if column not in frame.columns:
+            frame[column] = default
+
+    rejected = []
+    frame['timestamp'] = parse_timestamps(frame['timestamp'], dayfirst)
+    frame = _reject(frame, frame['timestamp'].isna(), 'invalid timestamp', rejected)
+
+    if kind == 'sales':
+        for column in ('item_name', 'category'):
+            frame[column] = frame[column].fillna('').astype(str).str.strip()
+            frame = _reject(frame, frame[column] == '', f'empty {column}', rejected)
+        for column in ('price_per_unit', 'quantity_sold', 'cost'):
+            raw = frame[column]
+            frame[column] = pd.to_numeric(raw, errors='coerce')
+            if column == 'cost':
+                # A blank cost means unknown, recorded as 0 like the entry form does
+                frame[column] = frame[column].mask(raw.isna() | (raw.astype(str).str.strip() == ''), 0.0)
+            frame = _reject(frame, frame[column].isna() | (frame[column] < 0), f'invalid {column}', rejected)
+        frame = _reject(frame, (frame['quantity_sold'] < 1) | (frame['quantity_sold'] % 1 != 0),
+                        'quantity_sold must be a whole number of at least 1', rejected)
+
+        frame['quantity_sold'] = frame['quantity_sold'].astype('int64')
+        frame['total_sale'] = frame['price_per_unit'] * frame['quantity_sold']
+        frame['profit'] = frame['total_sale'] - frame['cost']
+    else:
+        frame['expense_type'] = frame['expense_type'].fillna('').astype(str).str.strip()
+        frame = _reject(frame, frame['expense_type'] == '', 'empty expense_type', rejected)
+        frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce')
+        frame = _reject(frame, frame['amount'].isna() | (frame['amount'] < 0), 'invalid amount', rejected)
+        frame['description'] = frame['description'].where(frame['description'] != '', None)
+
+    frame['day'] = frame['timestamp'].dt.date
+    rejected = pd.concat(rejected) if rejected else pd.DataFrame(columns=list(source.columns) + ['reject_reason'])
+    if not rejected.empty:
+        # Report the rows as they appeared in the file, not the coerced values
+        rejected = source.loc[rejected.index].assign(reject_reason=rejected['reject_reason'])
+    return frame, rejected
+
+
+# -----------------------------
+# 🚚 LOADING
+# -----------------------------
+
+def _copy_rows(connection, table, frame: pd.DataFrame, columns):
+    """
+    Loads frame into table. On PostgreSQL this is a single COPY FROM STDIN on
+    the connection's current transaction; other databases use executemany.
+    """
+    if connection.dialect.name != 'postgresql':
+        connection.execute(insert(table), frame[columns].to_dict('records'))
+        return
+
+    buffer = io.StringIO()
+    frame[columns].to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+    buffer.seek(0)
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def load_chunk(connection, frame: pd.DataFrame, kind: str):
+    """
+    Loads an already validated frame (see validate_chunk) into sales or
+    expenses and folds it into the daily rollups, on the caller's transaction.
+    Sales are linked to their products, which are added if new.
+    """
+    spec = IMPORT_SPECS[kind]
+    if kind == 'sales':
+        frame = frame.assign(product_id=frame['item_name'].map(product_ids(connection, frame)).astype('int64'))
+    _copy_rows(connection, spec['model'].__table__, frame, spec['columns'])
+    spec['record_rollup'](connection, frame)
+
+def import_file(
+    engine,
+    source,
+    kind: str = 'sales',
+    file_format: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress=None,
+    dayfirst: bool = True
+):
+    """
+    Imports a CSV or Parquet file into sales or expenses. Each chunk is
+    validated, COPYed and folded into the daily rollups in its own
+    transaction, so a failure keeps every chunk loaded before it.
+
+    on_progress, if given, is called with the running report after each
+    committed chunk, so it also tells how far a failed import got. dayfirst
+    is passed to parse_timestamps.
+    Returns a report dict with rows_loaded, rows_rejected, seconds,
+    rows_per_second and a rejected DataFrame.
+    """
+    report = {'rows_loaded': 0, 'rows_rejected': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    rejected_chunks = []
+    started = time.perf_counter()
+
+    for chunk in iter_chunks(source, file_format, chunk_size):
+        valid, rejected = validate_chunk(chunk, kind, dayfirst)
+
+        if not valid.empty:
+            with engine.begin() as connection:
+                load_chunk(connection, valid, kind)
+
+        report['rows_loaded'] += len(valid)
+        report['rows_rejected'] += len(rejected)
+        report['seconds'] = time.perf_counter() - started
+        report['rows_per_second'] = report['rows_loaded'] / report['seconds'] if report['seconds'] else 0.0
+        if not rejected.empty:
+            rejected_chunks.append(rejected)
+        if on_progress:
+            on_progress(report)
+
+    report['rejected'] = pd.concat(rejected_chunks) if rejected_chunks else pd.DataFrame()
+    return report
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    engine = get_engine()
+
+    parser = argparse.ArgumentParser(description="Bulk-load historical sales or expenses from CSV/Parquet.")
+    parser.add_argument("kind", choices=sorted(IMPORT_SPECS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--rejects", help="write rejected rows to this CSV file")
+    parser.add_argument("--month-first", action="store_true", help="read dates like 05/01/2024 as May 1st")
+    args = parser.parse_args()
+
+    def print_progress(report):
+        print(f"\r{report['rows_loaded']:,} loaded, {report['rows_rejected']:,} rejected, "
+              f"{report['rows_per_second']:,.0f} rows/s", end="", flush=True)
+
+    result = import_file(engine, args.path, args.kind, args.format, args.chunk_size, print_progress,
+                         dayfirst=not args.month_first)
+    print(f"\nDone in {result['seconds']:.1f}s at {datetime.now():%Y-%m-%d %H:%M:%S}")
+
+    if args.rejects and not result['rejected'].empty:
+        result['rejected'].to_csv(args.rejects, index=False)
+        print(f"Rejected rows written to {args.rejects}")
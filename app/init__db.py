@@ -1,8 +1,8 @@
-from app.database import engine
-from app.models import Base
+from app.database import get_engine
+from app.migrations import upgrade
 
 def init():
-    Base.metadata.create_all(bind=engine)
+    upgrade(get_engine())
 
 if __name__ == "__main__":
     init()
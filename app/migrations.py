@@ -0,0 +1,453 @@
+from sqlalchemy import (
+    MetaData, Table, Column, ForeignKey, Integer, String, Float, Date, DateTime, Text, JSON,
+    create_engine, select, inspect, text
+)
+from datetime import datetime, UTC
+from pathlib import Path
+import sys
+import tempfile
+
+from app.models import Base
+from app.rollups import rebuild_sales_rollup, rebuild_expense_rollup
+from app.summaries import rebuild_summaries
+from app.partitions import partition_existing_tables, ensure_partitions
+from app.catalog import sync_catalog
+
+# Tracks which migrations have been applied. Kept outside Base.metadata so
+# create_all on the models never touches it.
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+# -----------------------------
+# 🧱 MIGRATIONS
+# -----------------------------
+# Each migration takes an open connection and runs inside the same transaction
+# that records it. Append new ones to MIGRATIONS; never renumber or edit an
+# applied one. Each spells out its own DDL: the models only describe the
+# latest schema, and a migration must do the same thing whenever it runs.
+
+def _create_tables(connection, metadata: MetaData):
+    # checkfirst: databases set up while migrations still followed the models
+    # got some of these tables early
+    metadata.create_all(bind=connection, checkfirst=True)
+
+def _baseline_tables():
+    """
+    Returns sales and expenses as the app first created them, before any
+    migration existed; production databases started out with just these.
+    """
+    metadata = MetaData()
+    sales = Table(
+        'sales', metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('item_name', String, nullable=False),
+        Column('category', String, nullable=False),
+        Column('price_per_unit', Float, nullable=False),
+        Column('quantity_sold', Integer, nullable=False),
+        Column('total_sale', Float, nullable=False),
+        Column('cost', Float, nullable=False),
+        Column('profit', Float, nullable=False),
+        Column('currency', String),
+        Column('timestamp', DateTime)
+    )
+    expenses = Table(
+        'expenses', metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('expense_type', String, nullable=False),
+        Column('amount', Float, nullable=False),
+        Column('description', Text),
+        Column('currency', String),
+        Column('timestamp', DateTime)
+    )
+    return metadata, sales, expenses
+
+def _create_base_tables(connection):
+    _create_tables(connection, _baseline_tables()[0])
+
+# Indexes as each migration created them: (name, table, columns, columns the
+# index INCLUDEs on PostgreSQL)
+_ID_INDEXES = [
+    ('ix_sales_id', 'sales', ['id'], []),
+    ('ix_expenses_id', 'expenses', ['id'], []),
+]
+_RANGE_INDEXES = [
+    ('ix_sales_timestamp', 'sales', ['timestamp'], ['total_sale', 'quantity_sold']),
+    ('ix_sales_category_timestamp', 'sales', ['category', 'timestamp'], ['total_sale', 'quantity_sold']),
+    ('ix_sales_item_name_timestamp', 'sales', ['item_name', 'timestamp'], ['total_sale', 'quantity_sold']),
+    ('ix_expenses_timestamp', 'expenses', ['timestamp'], ['amount']),
+    ('ix_expenses_expense_type_timestamp', 'expenses', ['expense_type', 'timestamp'], ['amount']),
+]
+_KEYSET_INDEXES = [
+    ('ix_sales_timestamp_id', 'sales', ['timestamp', 'id'], []),
+    ('ix_expenses_timestamp_id', 'expenses', ['timestamp', 'id'], []),
+]
+
+def _create_indexes(connection, indexes, table: str = None, unique: bool = False):
+    """
+    Creates each index that doesn't exist yet, optionally only table's.
+    """
+    for name, on, columns, include in indexes:
+        if table and on != table:
+            continue
+        quoted = ', '.join(f'"{column}"' for column in columns)
+        sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {on} ({quoted})"
+        if include and connection.dialect.name == 'postgresql':
+            sql += f" INCLUDE ({', '.join(include)})"
+        connection.execute(text(sql))
+
+def _add_range_indexes(connection):
+    _create_indexes(connection, _RANGE_INDEXES)
+
+def _backfill_timestamps(connection):
+    """
+    Gives rows saved without a timestamp the one of the row before them
+    (ids follow entry order), or the row after, or the current time. Every
+    day-keyed table, and the partitions on PostgreSQL, need one per row.
+    """
+    for table in ('sales', 'expenses'):
+        connection.execute(text(f"""
+            UPDATE {table} SET "timestamp" = COALESCE(
+                (SELECT max(earlier."timestamp") FROM {table} earlier WHERE earlier.id < {table}.id),
+                (SELECT min(later."timestamp") FROM {table} later WHERE later.id > {table}.id),
+                CURRENT_TIMESTAMP
+            )
+            WHERE "timestamp" IS NULL
+        """))
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text(f'ALTER TABLE {table} ALTER COLUMN "timestamp" SET NOT NULL'))
+
+def _create_daily_rollups(connection):
+    metadata = MetaData()
+    Table(
+        'daily_sales_rollup', metadata,
+        Column('day', Date, primary_key=True),
+        Column('category', String, primary_key=True),
+        Column('item_name', String, primary_key=True),
+        Column('total_sales', Float, nullable=False),
+        Column('total_quantity', Integer, nullable=False),
+        Column('transactions', Integer, nullable=False),
+        Column('total_cost', Float, nullable=False),
+        Column('total_profit', Float, nullable=False)
+    )
+    Table(
+        'daily_expense_rollup', metadata,
+        Column('day', Date, primary_key=True),
+        Column('expense_type', String, primary_key=True),
+        Column('total_amount', Float, nullable=False),
+        Column('expense_count', Integer, nullable=False)
+    )
+    _create_tables(connection, metadata)
+    _backfill_timestamps(connection)
+    # daily_data_versions only exists from migration 5, so no version bumps here
+    rebuild_sales_rollup(connection)
+    rebuild_expense_rollup(connection)
+
+def _add_keyset_indexes(connection):
+    _create_indexes(connection, _KEYSET_INDEXES)
+
+def _create_data_versions(connection):
+    metadata = MetaData()
+    Table(
+        'daily_data_versions', metadata,
+        Column('day', Date, primary_key=True),
+        Column('version', Integer, nullable=False)
+    )
+    _create_tables(connection, metadata)
+    # Seed a version row for every day that has data
+    connection.execute(text(
+        "INSERT INTO daily_data_versions (day, version) "
+        "SELECT day, 1 FROM (SELECT day FROM daily_sales_rollup UNION SELECT day FROM daily_expense_rollup) AS days "
+        "WHERE day NOT IN (SELECT day FROM daily_data_versions)"
+    ))
+
+# PostgreSQL materialized view definitions; elsewhere the summaries are
+# tables with these columns, filled by rebuild_summaries
+_SUMMARY_VIEWS = {
+    'monthly_sales_summary': """
+        SELECT CAST(date_trunc('month', day) AS DATE) AS month, category, item_name,
+               sum(total_sales) AS total_sales, sum(total_quantity) AS total_quantity,
+               sum(transactions) AS transactions, sum(total_cost) AS total_cost,
+               sum(total_profit) AS total_profit
+        FROM daily_sales_rollup GROUP BY 1, 2, 3
+    """,
+    'monthly_expense_summary': """
+        SELECT CAST(date_trunc('month', day) AS DATE) AS month, expense_type,
+               sum(total_amount) AS total_amount, sum(expense_count) AS expense_count
+        FROM daily_expense_rollup GROUP BY 1, 2
+    """,
+}
+# REFRESH ... CONCURRENTLY needs a unique index on each view
+_SUMMARY_INDEXES = [
+    ('ux_monthly_sales_summary', 'monthly_sales_summary', ['month', 'category', 'item_name'], []),
+    ('ux_monthly_expense_summary', 'monthly_expense_summary', ['month', 'expense_type'], []),
+]
+
+def _create_summaries(connection):
+    metadata = MetaData()
+    Table(
+        'summary_month_versions', metadata,
+        Column('month', Date, primary_key=True),
+        Column('version', Integer, nullable=False)
+    )
+    if connection.dialect.name == 'postgresql':
+        _create_tables(connection, metadata)
+        for name, definition in _SUMMARY_VIEWS.items():
+            connection.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {definition}"))
+    else:
+        Table(
+            'monthly_sales_summary', metadata,
+            Column('month', Date, nullable=False),
+            Column('category', String, nullable=False),
+            Column('item_name', String, nullable=False),
+            Column('total_sales', Float, nullable=False),
+            Column('total_quantity', Integer, nullable=False),
+            Column('transactions', Integer, nullable=False),
+            Column('total_cost', Float, nullable=False),
+            Column('total_profit', Float, nullable=False)
+        )
+        Table(
+            'monthly_expense_summary', metadata,
+            Column('month', Date, nullable=False),
+            Column('expense_type', String, nullable=False),
+            Column('total_amount', Float, nullable=False),
+            Column('expense_count', Integer, nullable=False)
+        )
+        _create_tables(connection, metadata)
+    _create_indexes(connection, _SUMMARY_INDEXES, unique=True)
+    rebuild_summaries(connection)
+
+def _partition_tables(connection):
+    # The partition key can't be NULL; migration 3 already backfilled, this
+    # catches anything written without a timestamp since
+    _backfill_timestamps(connection)
+    # Indexes on the new parent tables: the ones sales and expenses had by then
+    partition_existing_tables(connection, lambda table: _create_indexes(
+        connection, _ID_INDEXES + _RANGE_INDEXES + _KEYSET_INDEXES, table
+    ))
+
+def _create_sales_forecasts(connection):
+    metadata = MetaData()
+    Table(
+        'sales_forecasts', metadata,
+        Column('start_date', Date, primary_key=True),
+        Column('end_date', Date, primary_key=True),
+        Column('horizon', Integer, primary_key=True),
+        Column('data_version', Integer, nullable=False),
+        Column('forecast', JSON, nullable=False),
+        Column('computed_at', DateTime)
+    )
+    _create_tables(connection, metadata)
+
+def _create_product_catalog(connection):
+    metadata = MetaData()
+    Table(
+        'categories', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String, nullable=False, unique=True)
+    )
+    Table(
+        'products', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String, nullable=False, unique=True),
+        Column('category_id', Integer, ForeignKey('categories.id'), nullable=False, index=True),
+        Column('unit_cost', Float, nullable=False),
+        Column('unit_price', Float),
+        Column('created_at', DateTime)
+    )
+    _create_tables(connection, metadata)
+    # Databases whose migration 1 still followed the models already have it
+    if 'product_id' not in {c['name'] for c in inspect(connection).get_columns('sales')}:
+        connection.execute(text("ALTER TABLE sales ADD COLUMN product_id INTEGER"))
+    _create_indexes(connection, [('ix_sales_product_id', 'sales', ['product_id'], [])])
+    # Backfill: one product per item sold so far, costed from its history
+    sync_catalog(connection)
+
+def _create_applied_writes(connection):
+    metadata = MetaData()
+    Table(
+        'applied_writes', metadata,
+        Column('idempotency_key', String, primary_key=True),
+        Column('kind', String, nullable=False),
+        Column('applied_at', DateTime)
+    )
+    _create_tables(connection, metadata)
+
+def _drop_weekly_summaries(connection):
+    # Migration 6 once built weekly summaries too; nothing ever read them
+    kind = 'MATERIALIZED VIEW' if connection.dialect.name == 'postgresql' else 'TABLE'
+    for name in ('weekly_sales_summary', 'weekly_expense_summary'):
+        connection.execute(text(f"DROP {kind} IF EXISTS {name}"))
+
+def _add_sales_versions(connection):
+    # Starts at 0 everywhere: results stored against the old combined
+    # version are recomputed once
+    connection.execute(text(
+        "ALTER TABLE daily_data_versions ADD COLUMN sales_version INTEGER NOT NULL DEFAULT 0"
+    ))
+
+
+MIGRATIONS = [
+    (1, "create sales and expenses tables", _create_base_tables),
+    (2, "timestamp range and grouping indexes", _add_range_indexes),
+    (3, "daily sales and expense rollups with backfill", _create_daily_rollups),
+    (4, "(timestamp, id) keyset pagination indexes", _add_keyset_indexes),
+    (5, "per-day data versions for cache invalidation", _create_data_versions),
+    (6, "monthly summaries with month versions", _create_summaries),
+    (7, "monthly range partitions for sales and expenses (PostgreSQL)", _partition_tables),
+    (8, "stored sales forecasts", _create_sales_forecasts),
+    (9, "product catalog with unit costs, backfilled from sales", _create_product_catalog),
+    (10, "idempotency keys for the write-behind queue", _create_applied_writes),
+    (11, "drop the unused weekly summaries", _drop_weekly_summaries),
+    (12, "sales-only data versions", _add_sales_versions),
+]
+
+
+# -----------------------------
+# 🚀 RUNNER
+# -----------------------------
+
+def get_applied_versions(engine):
+    """
+    Returns the set of migration versions already applied to the database.
+    """
+    with engine.begin() as connection:
+        migration_metadata.create_all(bind=connection)
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(engine):
+    """
+    Applies every pending migration in order, each in its own transaction.
+    Returns the list of versions that were applied.
+    """
+    applied = get_applied_versions(engine)
+    newly_applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.now(UTC)
+            ))
+        print(f"Applied migration {version}: {description}")
+        newly_applied.append(version)
+
+    # Runs on every release so upcoming months always have a partition
+    with engine.begin() as connection:
+        created = ensure_partitions(connection)
+    if created:
+        print(f"Created partitions: {', '.join(created)}")
+
+    return newly_applied
+
+def status(engine):
+    """
+    Prints every known migration and whether it has been applied.
+    """
+    applied = get_applied_versions(engine)
+    for version, description, _ in MIGRATIONS:
+        state = "applied" if version in applied else "pending"
+        print(f"{version:>4}  {state:<8} {description}")
+
+
+# -----------------------------
+# ✅ UPGRADE CHECK
+# -----------------------------
+
+def _create_baseline_database(engine):
+    metadata, sales, expenses = _baseline_tables()
+    with engine.begin() as connection:
+        metadata.create_all(bind=connection)
+        connection.execute(sales.insert(), [
+            {'item_name': 'Tea', 'category': 'Drinks', 'price_per_unit': 10.0, 'quantity_sold': 2,
+             'total_sale': 20.0, 'cost': 8.0, 'profit': 12.0, 'currency': 'TRY',
+             'timestamp': datetime(2025, 3, 4, 10)},
+            {'item_name': 'Rice', 'category': 'Food', 'price_per_unit': 5.0, 'quantity_sold': 1,
+             'total_sale': 5.0, 'cost': 3.0, 'profit': 2.0, 'currency': 'TRY',
+             'timestamp': datetime(2025, 5, 6, 11)},
+            # The original model let the timestamp be NULL
+            {'item_name': 'Rice', 'category': 'Food', 'price_per_unit': 5.0, 'quantity_sold': 3,
+             'total_sale': 15.0, 'cost': 9.0, 'profit': 6.0, 'currency': 'TRY', 'timestamp': None},
+        ])
+        connection.execute(expenses.insert(), [
+            {'expense_type': 'Rent', 'amount': 100.0, 'description': 'March', 'currency': 'TRY',
+             'timestamp': None},
+        ])
+
+def _schema_differences(engine):
+    """
+    Lists every model table, column and index missing from the database, and
+    any sales or expenses still without a timestamp.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(f"table {table.name}")
+            continue
+        columns = {c['name'] for c in inspector.get_columns(table.name)}
+        missing += [f"column {table.name}.{c.name}" for c in table.columns if c.name not in columns]
+        indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        missing += [f"index {index.name}" for index in table.indexes if index.name not in indexes]
+
+    with engine.connect() as connection:
+        for table in ('sales', 'expenses'):
+            if connection.execute(text(f'SELECT count(*) FROM {table} WHERE "timestamp" IS NULL')).scalar():
+                missing.append(f"timestamps in {table}")
+    return missing
+
+def check(url: str = None):
+    """
+    Upgrades a database holding only the original sales and expenses tables
+    (with a few rows) and an empty one, then compares both with the models.
+    Uses temporary SQLite files unless url names an empty database, in which
+    case only the baseline upgrade runs there. Returns True if both match.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if url:
+            targets = {'baseline': url}
+        else:
+            targets = {name: f"sqlite:///{Path(directory) / name}.sqlite" for name in ('baseline', 'empty')}
+
+        ok = True
+        for name, target in targets.items():
+            engine = create_engine(target)
+            try:
+                if inspect(engine).get_table_names():
+                    raise RuntimeError(f"{target} is not empty")
+                if name == 'baseline':
+                    _create_baseline_database(engine)
+                upgrade(engine)
+                missing = _schema_differences(engine)
+            finally:
+                engine.dispose()
+            print(f"{name}: " + (f"missing {', '.join(missing)}" if missing else "matches the models"))
+            ok = ok and not missing
+    return ok
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade(get_engine())
+    elif command == "status":
+        status(get_engine())
+    elif command == "check":
+        # python -m app.migrations check [EMPTY_DATABASE_URL]
+        sys.exit(0 if check(sys.argv[2] if len(sys.argv) > 2 else None) else 1)
+    else:
+        print("Usage: python -m app.migrations [upgrade|status|check [EMPTY_DATABASE_URL]]")
+        sys.exit(1)
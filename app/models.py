@@ -1,9 +1,30 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, Index, JSON, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, UTC
 
 Base = declarative_base()
 
+
+# Product catalog. Sales keep item_name / category as text too, since the
+# rollups and summaries are keyed on them; product_id ties a sale to its
+# product and unit cost.
+
+class Category(Base):
+    __tablename__ = 'categories'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+class Product(Base):
+    __tablename__ = 'products'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    category_id = Column(Integer, ForeignKey('categories.id'), nullable=False, index=True)
+    # Cost of one unit to the shop and the usual selling price, both in TRY
+    unit_cost = Column(Float, nullable=False, default=0.0)
+    unit_price = Column(Float)
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+
 class Sale(Base):
     __tablename__ = 'sales'
     id = Column(Integer, primary_key=True, index=True)
@@ -15,7 +36,28 @@ class Sale(Base):
     cost = Column(Float, nullable=False)
     profit = Column(Float, nullable=False)
     currency = Column(String, default="TRY")
-    timestamp = Column(DateTime, default=lambda: datetime.now(UTC))
+    # NOT NULL: the rollups and the monthly partitions key on it. Older rows
+    # without one were backfilled by migration 3.
+    timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+    # products.id, filled by create_sale and app/catalog.py. Not a database
+    # foreign key: migration 1 creates sales before products exists.
+    product_id = Column(Integer)
+
+    # Every read path filters on a timestamp range and the dashboards group by
+    # category / item, so these double as covering indexes on PostgreSQL.
+    # There the table is also partitioned by month on timestamp, with a
+    # primary key of (id, timestamp) (see app/partitions.py); ids stay unique.
+    __table_args__ = (
+        Index('ix_sales_timestamp', 'timestamp',
+              postgresql_include=['total_sale', 'quantity_sold']),
+        Index('ix_sales_category_timestamp', 'category', 'timestamp',
+              postgresql_include=['total_sale', 'quantity_sold']),
+        Index('ix_sales_item_name_timestamp', 'item_name', 'timestamp',
+              postgresql_include=['total_sale', 'quantity_sold']),
+        # Keyset pagination order for recent activity
+        Index('ix_sales_timestamp_id', 'timestamp', 'id'),
+        Index('ix_sales_product_id', 'product_id'),
+    )
 
 class Expense(Base):
     __tablename__ = 'expenses'
@@ -24,6 +66,65 @@ class Expense(Base):
     amount = Column(Float, nullable=False)
     description = Column(Text)
     currency = Column(String, default="TRY")
-    timestamp = Column(DateTime, default=lambda: datetime.now(UTC))
+    timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        Index('ix_expenses_timestamp', 'timestamp', postgresql_include=['amount']),
+        Index('ix_expenses_expense_type_timestamp', 'expense_type', 'timestamp',
+              postgresql_include=['amount']),
+        Index('ix_expenses_timestamp_id', 'timestamp', 'id'),
+    )
+
+
+# Daily rollups, kept in step with the raw tables by create_sale / create_expense
+# (see app/rollups.py). Past days never change, so dashboards read these instead
+# of re-scanning history.
+
+class DailySalesRollup(Base):
+    __tablename__ = 'daily_sales_rollup'
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    item_name = Column(String, primary_key=True)
+    total_sales = Column(Float, nullable=False, default=0.0)
+    total_quantity = Column(Integer, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+    total_profit = Column(Float, nullable=False, default=0.0)
+
+class DailyExpenseRollup(Base):
+    __tablename__ = 'daily_expense_rollup'
+    day = Column(Date, primary_key=True)
+    expense_type = Column(String, primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+class DailyDataVersion(Base):
+    # Bumped whenever a sale or expense on that day is written, so cached
+    # period results can tell whether their date range has changed.
+    __tablename__ = 'daily_data_versions'
+    day = Column(Date, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    # Bumped by sale writes only, for results that don't read expenses
+    sales_version = Column(Integer, nullable=False, default=0)
+
+
+class SalesForecast(Base):
+    # Fitted forecast for a history window, stored with the window's data
+    # version so it is reused until a sale in that window changes
+    # (see app/forecasting.py).
+    __tablename__ = 'sales_forecasts'
+    start_date = Column(Date, primary_key=True)
+    end_date = Column(Date, primary_key=True)
+    horizon = Column(Integer, primary_key=True)
+    data_version = Column(Integer, nullable=False)
+    forecast = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, default=lambda: datetime.now(UTC))
 
 
+class AppliedWrite(Base):
+    # Idempotency keys of entries flushed from the local write-behind queue,
+    # written in the same transaction as the entry (see app/write_queue.py)
+    __tablename__ = 'applied_writes'
+    idempotency_key = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=lambda: datetime.now(UTC))
@@ -0,0 +1,187 @@
+from sqlalchemy import text, func, select
+from datetime import date, timedelta
+import sys
+
+from app.models import Sale, Expense
+
+# Tables range-partitioned by month on timestamp (PostgreSQL only). Each month
+# lives in <table>_YYYY_MM; anything outside the created months lands in
+# <table>_default until its month is created.
+PARTITIONED_TABLES = [Sale.__table__, Expense.__table__]
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def _next_month(month: date):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def partition_name(table_name: str, month: date):
+    return f"{table_name}_{month:%Y_%m}"
+
+def is_partitioned(connection, table_name: str):
+    if connection.dialect.name != 'postgresql':
+        return False
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+        {'name': table_name}
+    ).scalar()
+    return relkind == 'p'
+
+def list_partitions(connection, table_name: str):
+    """
+    Returns the names of the partitions currently attached to table_name.
+    """
+    if connection.dialect.name != 'postgresql':
+        return []
+    return connection.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :name
+        ORDER BY child.relname
+    """), {'name': table_name}).scalars().all()
+
+
+# -----------------------------
+# 🗓️ MONTHLY PARTITIONS
+# -----------------------------
+
+def create_partition(connection, table_name: str, month: date):
+    """
+    Creates and attaches the partition for month. Rows already sitting in the
+    default partition for that month are moved into it first, since
+    PostgreSQL refuses to attach a range the default partition still holds.
+    """
+    name = partition_name(table_name, month)
+    bounds = {'lower': month, 'upper': _next_month(month)}
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {table_name}_default
+            WHERE "timestamp" >= :lower AND "timestamp" < :upper
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    connection.execute(text(
+        f"ALTER TABLE {table_name} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+    ))
+    return name
+
+def ensure_months(connection, table_name: str, first: date, last: date):
+    """
+    Creates any missing partitions of table_name for the months first..last
+    (both given as the first day of the month). Returns the names created.
+    """
+    existing = set(list_partitions(connection, table_name))
+    created = []
+    month = first
+    while month <= last:
+        if partition_name(table_name, month) not in existing:
+            created.append(create_partition(connection, table_name, month))
+        month = _next_month(month)
+    return created
+
+def ensure_partitions(connection, months_ahead: int = DEFAULT_MONTHS_AHEAD):
+    """
+    Makes sure every partitioned table has a partition for the current month
+    and the next months_ahead months. Returns the names of the partitions
+    created. A no-op on tables that are not partitioned, including every
+    table outside PostgreSQL.
+    """
+    current = date.today().replace(day=1)
+    last = current
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    created = []
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(connection, table.name):
+            created += ensure_months(connection, table.name, current, last)
+    return created
+
+def detach_partition(connection, table_name: str, month: date):
+    """
+    Detaches a month from table_name, leaving it as a standalone table to
+    archive or drop. Dashboard totals are unaffected since they read the
+    daily rollups.
+    """
+    name = partition_name(table_name, month)
+    connection.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {name}"))
+    return name
+
+
+# -----------------------------
+# 🧱 CONVERSION
+# -----------------------------
+
+def partition_existing_tables(connection, create_indexes):
+    """
+    Converts sales and expenses into tables partitioned by month, copying
+    every existing row. Used by migration 7; does nothing outside PostgreSQL.
+    The primary key becomes (id, timestamp) because PostgreSQL requires the
+    partition key in it; ids keep coming from the same sequence.
+    create_indexes(table_name) recreates the table's indexes on the new
+    parent, as they stood when the migration was written.
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(connection, table.name):
+            continue
+        name, old = table.name, f"{table.name}_unpartitioned"
+        sequence = connection.execute(select(func.pg_get_serial_sequence(name, 'id'))).scalar()
+
+        connection.execute(text(f"ALTER TABLE {name} RENAME TO {old}"))
+        # Free up the {name}_pkey constraint name for the new table
+        connection.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {name}_pkey TO {old}_pkey"))
+        connection.execute(text(
+            f'CREATE TABLE {name} (LIKE {old} INCLUDING DEFAULTS, PRIMARY KEY (id, "timestamp")) '
+            f'PARTITION BY RANGE ("timestamp")'
+        ))
+        connection.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+
+        # One partition per month of history, so old data prunes like new data
+        first = connection.execute(text(f'SELECT min("timestamp") FROM {old}')).scalar()
+        current = date.today().replace(day=1)
+        ensure_months(connection, name, first.date().replace(day=1) if first else current, current)
+
+        connection.execute(text(f"INSERT INTO {name} SELECT * FROM {old}"))
+
+        # Hand the id sequence over to the new table before the old one goes
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        connection.execute(text(f"DROP TABLE {old}"))
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+
+        # Indexes on the parent cascade to every partition, present and future
+        create_indexes(name)
+
+    ensure_partitions(connection)
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    engine = get_engine()
+
+    # python -m app.partitions [ensure [MONTHS_AHEAD] | list | detach TABLE YYYY-MM]
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    with engine.begin() as connection:
+        if command == "ensure":
+            ahead = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MONTHS_AHEAD
+            created = ensure_partitions(connection, ahead)
+            print(f"Created {len(created)} partition(s): {', '.join(created) or '-'}")
+        elif command == "list":
+            for table in PARTITIONED_TABLES:
+                print(f"{table.name}: {', '.join(list_partitions(connection, table.name)) or 'not partitioned'}")
+        elif command == "detach" and len(sys.argv) == 4:
+            month = date.fromisoformat(f"{sys.argv[3]}-01")
+            print(f"Detached {detach_partition(connection, sys.argv[2], month)}")
+        else:
+            print("Usage: python -m app.partitions [ensure [MONTHS_AHEAD] | list | detach TABLE YYYY-MM]")
+            sys.exit(1)
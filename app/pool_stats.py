@@ -0,0 +1,153 @@
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, NullPool
+import threading
+import time
+
+from app.config import settings
+from app.query_stats import percentile
+
+# Samples kept for each rolling percentile
+WINDOW = 1000
+
+
+class PoolStats:
+    """
+    Live connection pool metrics gathered from pool events: connections in
+    use (and the peak), overflow, checkout wait, how long connections are
+    held and how long they live before being closed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        # Live connections (with their opening time, by connection record)
+        # and checkouts are kept across resets; they are still out there
+        self._open = {}
+        self.checked_out = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.closed = 0
+            self.invalidated = 0
+            self.timeouts = 0
+            self.peak_checked_out = self.checked_out
+            self._waits = deque(maxlen=WINDOW)
+            self._holds = deque(maxlen=WINDOW)
+            self._lifetimes = deque(maxlen=WINDOW)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self._waits.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def attach(self, pool):
+        """
+        Listens to `pool`'s events. Called once from get_engine.
+        """
+        self.pool = pool
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, record):
+            with self._lock:
+                self.connects += 1
+                self._open[id(record)] = time.perf_counter()
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, record, proxy):
+            record.info['checked_out_at'] = time.perf_counter()
+            with self._lock:
+                self.checkouts += 1
+                self.checked_out += 1
+                self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, record):
+            started = record.info.pop('checked_out_at', None)
+            if started is None:
+                return
+            with self._lock:
+                self.checked_out -= 1
+                self._holds.append(time.perf_counter() - started)
+
+        @event.listens_for(pool, "close")
+        def on_close(dbapi_connection, record):
+            with self._lock:
+                opened = self._open.pop(id(record), None)
+                self.closed += 1
+                if opened is not None:
+                    self._lifetimes.append(time.perf_counter() - opened)
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, record, exception):
+            with self._lock:
+                self.invalidated += 1
+
+    def snapshot(self):
+        """
+        Returns the counters, the pool's own view of its state and
+        percentiles of checkout wait, hold time and connection lifetime.
+        """
+        with self._lock:
+            result = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'closed': self.closed,
+                'invalidated': self.invalidated,
+                'timeouts': self.timeouts,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'open': len(self._open),
+                'oldest_open_s': time.perf_counter() - min(self._open.values()) if self._open else 0.0,
+            }
+            samples = {'wait': sorted(self._waits), 'hold': sorted(self._holds),
+                       'lifetime': sorted(self._lifetimes)}
+
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            # QueuePool has no public accessor for max_overflow; get_engine
+            # builds the pool from the setting
+            result.update({'strategy': 'queue', 'size': pool.size(), 'idle': pool.checkedin(),
+                           'overflow': max(0, pool.overflow()), 'max_overflow': settings.DB_MAX_OVERFLOW})
+        else:
+            result.update({'strategy': 'null', 'size': 0, 'idle': 0, 'overflow': 0, 'max_overflow': 0})
+
+        for name, values in samples.items():
+            result[name] = {
+                'count': len(values),
+                'mean_s': sum(values) / len(values) if values else 0.0,
+                'p50_s': percentile(values, 0.50) if values else 0.0,
+                'p95_s': percentile(values, 0.95) if values else 0.0,
+                'p99_s': percentile(values, 0.99) if values else 0.0,
+                'max_s': values[-1] if values else 0.0,
+            }
+        return result
+
+
+pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    # There is no event before a checkout starts, so the wait (including
+    # opening a new connection when the pool has none idle) is timed around
+    # the pool's internal _do_get
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        return connection
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
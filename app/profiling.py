@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from datetime import datetime, UTC
+from functools import wraps
+from pathlib import Path
+import cProfile
+import io
+import json
+import pstats
+import time
+
+from app.config import settings
+
+# Per-rerun timing for Streamlit pages. A page creates one RenderTimer at the
+# top of the script, wraps its sections in timer.section(...) and calls
+# finish() at the end. Sections may nest; each reports only its own time, so
+# the breakdown adds up to the rerun total.
+
+# Functions listed in the profile summary shown on the page
+PROFILE_TOP = 25
+
+
+def profiling_requested(query_params=None):
+    """
+    True when RENDER_PROFILE is set or the page was opened with ?profile=1.
+    """
+    if settings.RENDER_PROFILE:
+        return True
+    return bool(query_params) and query_params.get('profile', '').lower() in ('1', 'true', 'yes')
+
+
+class RenderTimer:
+    """
+    Collects wall-clock time per named section for one page rerun, plus a
+    cProfile of the whole rerun when profile=True.
+    """
+
+    def __init__(self, page: str, profile: bool = False):
+        self.page = page
+        self.sections = {}
+        self._children = []
+        self._started = time.perf_counter()
+        self._profiler = None
+        if profile:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this thread
+                self._profiler = None
+
+    @contextmanager
+    def section(self, name: str):
+        """
+        Times the enclosed block under `name`. Time spent in nested sections
+        is booked to them, not to this one; repeated names accumulate.
+        """
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._children.pop()
+            self.sections[name] = self.sections.get(name, 0.0) + elapsed - nested
+            if self._children:
+                self._children[-1] += elapsed
+
+    def timed(self, name: str, function):
+        """
+        Returns `function` wrapped so every call is timed under `name`, e.g.
+        plotly_chart = timer.timed("plotly_chart", st.plotly_chart).
+        """
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def finish(self):
+        """
+        Stops the clock (and the profiler) and returns the rerun report:
+        sections in the order they first ran, untimed remainder, total and
+        the top of the profile when profiling.
+        """
+        total = time.perf_counter() - self._started
+        profile = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            profile = self._profiler
+
+        report = {
+            'at': datetime.now(UTC).isoformat(timespec='milliseconds'),
+            'page': self.page,
+            'total_s': total,
+            'sections': dict(self.sections),
+            'untimed_s': max(0.0, total - sum(self.sections.values())),
+            'profile': _profile_summary(profile) if profile else None,
+        }
+        write_report(report, profile)
+        return report
+
+
+def _profile_summary(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    return out.getvalue()
+
+def write_report(report: dict, profiler=None):
+    """
+    Appends the timing (without the profile text) to RENDER_TIMING_LOG as a
+    JSON line and dumps the raw profile into RENDER_PROFILE_DIR, when set.
+    The .prof files open with `python -m pstats` or snakeviz.
+    """
+    try:
+        if settings.RENDER_TIMING_LOG:
+            line = json.dumps({
+                **{k: v for k, v in report.items() if k != 'profile'},
+                'profiled': profiler is not None,
+            })
+            with open(settings.RENDER_TIMING_LOG, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
+        if profiler is not None and settings.RENDER_PROFILE_DIR:
+            directory = Path(settings.RENDER_PROFILE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(directory / f"{report['page']}-{datetime.now(UTC):%Y%m%dT%H%M%S%fZ}.prof")
+    except OSError as e:
+        print(f"Could not write render timing: {e}")
+
+def timing_rows(report: dict):
+    """
+    Returns one row per section for display, slowest first, ending with the
+    untimed remainder (widgets, markdown and anything outside a section).
+    """
+    total = report['total_s'] or 1.0
+    entries = sorted(report['sections'].items(), key=lambda item: item[1], reverse=True)
+    entries.append(('(untimed)', report['untimed_s']))
+    return [{'Section': name, 'ms': round(seconds * 1000, 1), '%': round(100 * seconds / total, 1)}
+            for name, seconds in entries]
@@ -0,0 +1,158 @@
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, UTC
+import hashlib
+import json
+import re
+import threading
+
+# Page currently running in this thread (set by each Streamlit page), used to
+# attribute statements to the page that issued them
+current_page = ContextVar('current_page', default=None)
+
+# Durations kept per statement for the rolling percentiles
+WINDOW = 500
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))+\s*\)')
+_POSTCOMPILE = re.compile(r'__\[POSTCOMPILE_\w+\]')
+
+
+def set_current_page(name: str):
+    current_page.set(name)
+
+def page_label():
+    page = current_page.get()
+    if page:
+        return page
+    return 'cli' if threading.current_thread() is threading.main_thread() else 'background'
+
+def fingerprint(statement: str):
+    """
+    Normalizes a statement so runs that differ only in literal values or IN
+    list length share one entry. Returns (id, normalized text).
+    """
+    normalized = _WHITESPACE.sub(' ', statement).strip()
+    normalized = _POSTCOMPILE.sub('?', normalized)
+    normalized = _LITERALS.sub('?', normalized)
+    normalized = _IN_LISTS.sub('(?)', normalized)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class QueryStats:
+    """
+    In-memory statistics per statement fingerprint: call count, total time,
+    rows, calling pages and percentiles over the last WINDOW durations.
+
+    Statements slower than slow_ms are also appended to slow_log_path as
+    JSON lines when a path is set.
+    """
+
+    def __init__(self, slow_ms: float = 200.0, slow_log_path: str = None):
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameters, seconds: float, rows: int = None, executemany: bool = False):
+        key, normalized = fingerprint(statement)
+        page = page_label()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'fingerprint': key,
+                    'statement': normalized,
+                    'calls': 0,
+                    'total_s': 0.0,
+                    'max_s': 0.0,
+                    'rows': 0,
+                    'pages': Counter(),
+                    'durations': deque(maxlen=WINDOW),
+                    'sample': None,
+                }
+            entry['calls'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+            entry['rows'] += rows or 0
+            entry['pages'][page] += 1
+            entry['durations'].append(seconds)
+            if not executemany:
+                # Kept so EXPLAIN ANALYZE can replay a real call
+                entry['sample'] = (statement, parameters)
+
+        if self.slow_log_path and seconds * 1000 >= self.slow_ms:
+            self._log_slow(key, normalized, seconds, rows, page)
+
+    def _log_slow(self, key, normalized, seconds, rows, page):
+        line = json.dumps({
+            'at': datetime.now(UTC).isoformat(timespec='milliseconds'),
+            'fingerprint': key,
+            'ms': round(seconds * 1000, 2),
+            'rows': rows,
+            'page': page,
+            'statement': normalized,
+        })
+        try:
+            with self._lock, open(self.slow_log_path, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+    def snapshot(self):
+        """
+        Returns one summary dict per statement, sorted by total time descending.
+        """
+        with self._lock:
+            entries = [dict(e, durations=sorted(e['durations']), pages=dict(e['pages']))
+                       for e in self._entries.values()]
+
+        rows = []
+        for e in entries:
+            durations = e.pop('durations')
+            e.pop('sample')
+            rows.append({
+                **e,
+                'mean_s': e['total_s'] / e['calls'],
+                'p50_s': percentile(durations, 0.50),
+                'p95_s': percentile(durations, 0.95),
+                'p99_s': percentile(durations, 0.99),
+            })
+        return sorted(rows, key=lambda r: r['total_s'], reverse=True)
+
+    def sample(self, key: str):
+        """
+        Returns the last (statement, parameters) seen for a fingerprint, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['sample'] if entry else None
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def explain(connection, statement: str, parameters):
+    """
+    Runs EXPLAIN ANALYZE (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite) for a
+    captured SELECT and returns the plan as text. Runs inside a transaction
+    that is rolled back, since ANALYZE executes the statement.
+    """
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        raise ValueError("Only SELECT statements can be explained")
+
+    if connection.dialect.name == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) '
+    else:
+        prefix = 'EXPLAIN QUERY PLAN '
+
+    with connection.begin() as transaction:
+        rows = connection.exec_driver_sql(prefix + statement, parameters or ()).all()
+        transaction.rollback()
+    return '\n'.join(' | '.join(str(value) for value in row) for row in rows)
@@ -0,0 +1,131 @@
+from sqlalchemy.orm import Session
+from datetime import date
+
+from app.cache import sales_frame_cache
+from app.database import submit_queries, gather
+from app.crud import (
+    get_sales_totals, get_expense_totals, get_period_comparison, get_daily_sales_totals,
+    get_daily_expense_totals, get_sales_by_category, get_sales_by_item, get_expenses_by_type,
+    get_sales_frame, get_day_versions
+)
+from app.forecasting import get_sales_forecast
+from app.summaries import fresh_months
+from app.snapshots import (
+    analytics_snapshot, snapshot_sales_time_profile, snapshot_sales_by_category, snapshot_sales_by_item
+)
+from app.utils.analytics import daily_trend, category_metrics, item_table, sales_time_profile
+
+# Data builders behind the dashboard and overview pages. The pages cache
+# what these return per data version; benchmarks call them directly.
+#
+# Their queries don't depend on each other, so they are fanned out with
+# submit_queries and each runs on its own pooled connection; a rerun then
+# waits about as long as the slowest query rather than the sum of them.
+
+
+def build_dashboard_data(session: Session, start_date, end_date):
+    """
+    Returns everything the main dashboard renders for start_date..end_date.
+    `session` only looks up the fresh summary months; the fanned-out reads
+    use their own sessions.
+    """
+    # Looked up once here instead of by each aggregate below
+    months = fresh_months(session, start_date, end_date)
+
+    # Calculate metrics in the database, all at once
+    results = gather(submit_queries({
+        'sales_totals': (get_sales_totals, start_date, end_date, months),
+        'expense_totals': (get_expense_totals, start_date, end_date, months),
+        'sales_by_day': (get_daily_sales_totals, start_date, end_date),
+        'expenses_by_day': (get_daily_expense_totals, start_date, end_date),
+        'category_sales': (get_sales_by_category, start_date, end_date, months),
+        'top_products': (get_sales_by_item, start_date, end_date, 10, months),
+        'expense_types': (get_expenses_by_type, start_date, end_date, months),
+    }))
+
+    sales_totals = results['sales_totals']
+    total_sales = sales_totals['total_sales']
+    total_expenses = results['expense_totals']['total_expenses']
+    net_profit = total_sales - total_expenses
+    roi = (net_profit / total_expenses * 100) if total_expenses > 0 else 0
+    sales_by_day = results['sales_by_day']
+    expenses_by_day = results['expenses_by_day']
+
+    return {
+        'total_sales': total_sales,
+        'total_expenses': total_expenses,
+        'net_profit': net_profit,
+        'roi': roi,
+        'transactions': sales_totals['transactions'],
+        'sales_by_day': sales_by_day,
+        'expenses_by_day': expenses_by_day,
+        'daily_trend': daily_trend(sales_by_day, expenses_by_day),
+        'category_sales': results['category_sales'],
+        'top_products': results['top_products'],
+        'expense_types': results['expense_types']
+    }
+
+def _time_profile(session: Session, start_date, end_date):
+    # Raw rows are only needed for the hourly and weekday breakdowns. Only
+    # the days written since the last fetch are re-read. Keyed on the length
+    # and on how far the window ends before today: a preset like "Last 7
+    # Days" keeps its entry as it slides forward a day, while a custom range
+    # of the same length gets an entry of its own.
+    return sales_time_profile(sales_frame_cache.refresh(
+        ('time_profile', (end_date - start_date).days, (date.today() - end_date).days), start_date, end_date,
+        lambda start, end: get_sales_frame(session, start, end, columns=('id', 'timestamp', 'total_sale')),
+        get_day_versions(session, start_date, end_date)
+    ))
+
+def build_overview_data(session: Session, start_date, end_date, comp_start=None, comp_end=None):
+    """
+    Returns (current, comparison) for the overview page. comparison is the
+    headline totals of comp_start..comp_end, or None without a comparison range.
+
+    The forecast may be stored through `session`, so the caller commits it.
+    """
+    snapshot = analytics_snapshot()
+    # Fresh summary months over both periods, looked up once for every
+    # aggregate below
+    months = fresh_months(session, min(start_date, comp_start or start_date), max(end_date, comp_end or end_date))
+    calls = {
+        # Headline totals for both periods come back from one statement
+        'periods': (get_period_comparison, start_date, end_date, comp_start, comp_end, months),
+        'sales_by_day': (get_daily_sales_totals, start_date, end_date),
+        'expenses_by_day': (get_daily_expense_totals, start_date, end_date),
+    }
+    if snapshot:
+        # The scans over raw sales go to DuckDB; totals and trends still come
+        # from the live rollups
+        calls.update({
+            'time_profile': (lambda _, *args: snapshot_sales_time_profile(snapshot, *args), start_date, end_date),
+            'categories': (lambda _, *args: snapshot_sales_by_category(snapshot, *args), start_date, end_date),
+            'items': (lambda _, *args: snapshot_sales_by_item(snapshot, *args), start_date, end_date, 10),
+        })
+    else:
+        calls.update({
+            'time_profile': (_time_profile, start_date, end_date),
+            'categories': (get_sales_by_category, start_date, end_date, months),
+            'items': (get_sales_by_item, start_date, end_date, 10, months),
+        })
+    pending = submit_queries(calls)
+
+    # The forecast can write, so it stays on the caller's session and runs
+    # here while the reads above are in flight
+    forecast = get_sales_forecast(session)
+    results = gather(pending)
+    periods = results['periods']
+
+    # Every derived table is built here so reruns only render cached results
+    current_data = {
+        **periods['current'],
+        'trend': daily_trend(results['sales_by_day'], results['expenses_by_day'], start_date, end_date),
+        'category_metrics': category_metrics(results['categories']),
+        'top_items': item_table(results['items']),
+        'hourly_sales': results['time_profile']['hourly'],
+        'weekday_sales': results['time_profile']['weekday'],
+        'forecast': forecast,
+        'snapshot_at': snapshot['taken_at'] if snapshot else None,
+    }
+
+    return current_data, periods['comparison']
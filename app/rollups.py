@@ -0,0 +1,236 @@
+from sqlalchemy import func, delete, select, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, date, timedelta
+import sys
+from typing import TYPE_CHECKING
+
+from app.models import Sale, Expense, DailySalesRollup, DailyExpenseRollup, DailyDataVersion
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SALES_ROLLUP_KEYS = ['day', 'category', 'item_name']
+EXPENSE_ROLLUP_KEYS = ['day', 'expense_type']
+
+_upsert_inserts = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def _dialect_name(executor):
+    # Works for both a Session and a Connection
+    dialect = getattr(executor, 'dialect', None) or executor.get_bind().dialect
+    return dialect.name
+
+def dialect_insert(executor, table):
+    """
+    Returns an INSERT for table with the executor's dialect extensions
+    (on_conflict_do_update / on_conflict_do_nothing).
+    """
+    return _upsert_inserts[_dialect_name(executor)](table)
+
+def _upsert(executor, table, key_names: list, rows: list):
+    """
+    Adds each row's non-key values onto the rollup row with the same keys,
+    creating it if needed. Several rows go out as one executemany.
+    """
+    if not rows:
+        return
+
+    stmt = dialect_insert(executor, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_names,
+        set_={name: table.c[name] + stmt.excluded[name] for name in rows[0] if name not in key_names}
+    )
+    executor.execute(stmt, rows)
+
+def _day_bounds(start_date, end_date):
+    # Rollups work on whole days, so the end day is included in full
+    lower = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    upper = datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
+    return lower, upper
+
+
+# -----------------------------
+# 🔖 DATA VERSIONS
+# -----------------------------
+
+def bump_data_versions(executor, days, sales: bool = False):
+    """
+    Increments daily_data_versions for each day, inside the caller's
+    transaction, and sales_version too when sales were written. Every rollup
+    write goes through here, so a cached result for a date range stays valid
+    exactly until one of its days is written.
+    """
+    _upsert(executor, DailyDataVersion.__table__, ['day'],
+            [{'day': day, 'version': 1, 'sales_version': int(sales)} for day in sorted(set(days))])
+
+
+# -----------------------------
+# ✍️ INCREMENTAL UPDATES
+# -----------------------------
+
+def record_sale(executor, sale: Sale):
+    """
+    Folds a single sale into daily_sales_rollup. Call inside the transaction
+    that inserts the sale so both commit or roll back together.
+    """
+    _upsert(executor, DailySalesRollup.__table__, SALES_ROLLUP_KEYS, [{
+        'day': sale.timestamp.date(),
+        'category': sale.category,
+        'item_name': sale.item_name,
+        'total_sales': sale.total_sale,
+        'total_quantity': sale.quantity_sold,
+        'transactions': 1,
+        'total_cost': sale.cost,
+        'total_profit': sale.profit,
+    }])
+    bump_data_versions(executor, [sale.timestamp.date()], sales=True)
+
+def record_expense(executor, expense: Expense):
+    """
+    Folds a single expense into daily_expense_rollup.
+    """
+    _upsert(executor, DailyExpenseRollup.__table__, EXPENSE_ROLLUP_KEYS, [{
+        'day': expense.timestamp.date(),
+        'expense_type': expense.expense_type,
+        'total_amount': expense.amount,
+        'expense_count': 1,
+    }])
+    bump_data_versions(executor, [expense.timestamp.date()])
+
+def record_sales_batch(executor, sales: 'pd.DataFrame'):
+    """
+    Folds a batch of sales into daily_sales_rollup with one upsert per
+    (day, category, item). Expects the sales table columns plus a 'day' column.
+    """
+    grouped = sales.groupby(SALES_ROLLUP_KEYS, observed=True, sort=False).agg(
+        total_sales=('total_sale', 'sum'),
+        total_quantity=('quantity_sold', 'sum'),
+        transactions=('total_sale', 'size'),
+        total_cost=('cost', 'sum'),
+        total_profit=('profit', 'sum'),
+    ).reset_index()
+    _upsert(executor, DailySalesRollup.__table__, SALES_ROLLUP_KEYS, grouped.to_dict('records'))
+    bump_data_versions(executor, grouped['day'], sales=True)
+
+def record_expenses_batch(executor, expenses: 'pd.DataFrame'):
+    """
+    Folds a batch of expenses into daily_expense_rollup with one upsert per
+    (day, expense_type). Expects the expenses table columns plus a 'day' column.
+    """
+    grouped = expenses.groupby(EXPENSE_ROLLUP_KEYS, observed=True, sort=False).agg(
+        total_amount=('amount', 'sum'),
+        expense_count=('amount', 'size'),
+    ).reset_index()
+    _upsert(executor, DailyExpenseRollup.__table__, EXPENSE_ROLLUP_KEYS, grouped.to_dict('records'))
+    bump_data_versions(executor, grouped['day'])
+
+
+# -----------------------------
+# 🔁 REBUILD / BACKFILL
+# -----------------------------
+
+def rebuild_sales_rollup(executor, start_date: date = None, end_date: date = None):
+    """
+    Recomputes daily_sales_rollup from the sales table for the given days
+    (all history when no range is given).
+    """
+    rollup = DailySalesRollup.__table__
+    lower, upper = _day_bounds(start_date, end_date)
+
+    clear = delete(rollup)
+    if start_date:
+        clear = clear.where(rollup.c.day >= start_date)
+    if end_date:
+        clear = clear.where(rollup.c.day <= end_date)
+    executor.execute(clear)
+
+    day = func.date(Sale.timestamp, type_=Date)
+    source = select(
+        day,
+        Sale.category,
+        Sale.item_name,
+        func.sum(Sale.total_sale),
+        func.sum(Sale.quantity_sold),
+        func.count(Sale.id),
+        func.sum(Sale.cost),
+        func.sum(Sale.profit)
+    ).group_by(day, Sale.category, Sale.item_name)
+    if lower:
+        source = source.where(Sale.timestamp >= lower)
+    if upper:
+        source = source.where(Sale.timestamp < upper)
+
+    executor.execute(rollup.insert().from_select(
+        ['day', 'category', 'item_name', 'total_sales', 'total_quantity',
+         'transactions', 'total_cost', 'total_profit'],
+        source
+    ))
+
+def rebuild_expense_rollup(executor, start_date: date = None, end_date: date = None):
+    """
+    Recomputes daily_expense_rollup from the expenses table for the given days
+    (all history when no range is given).
+    """
+    rollup = DailyExpenseRollup.__table__
+    lower, upper = _day_bounds(start_date, end_date)
+
+    clear = delete(rollup)
+    if start_date:
+        clear = clear.where(rollup.c.day >= start_date)
+    if end_date:
+        clear = clear.where(rollup.c.day <= end_date)
+    executor.execute(clear)
+
+    day = func.date(Expense.timestamp, type_=Date)
+    source = select(
+        day,
+        Expense.expense_type,
+        func.sum(Expense.amount),
+        func.count(Expense.id)
+    ).group_by(day, Expense.expense_type)
+    if lower:
+        source = source.where(Expense.timestamp >= lower)
+    if upper:
+        source = source.where(Expense.timestamp < upper)
+
+    executor.execute(rollup.insert().from_select(
+        ['day', 'expense_type', 'total_amount', 'expense_count'],
+        source
+    ))
+
+def rebuild_rollups(executor, start_date: date = None, end_date: date = None):
+    """
+    Rebuilds both rollup tables and bumps the data version of every day in
+    the range. The caller owns the transaction.
+    """
+    rebuild_sales_rollup(executor, start_date, end_date)
+    rebuild_expense_rollup(executor, start_date, end_date)
+
+    days = set()
+    for day_column in (DailySalesRollup.day, DailyExpenseRollup.day, DailyDataVersion.day):
+        query = select(day_column).distinct()
+        if start_date:
+            query = query.where(day_column >= start_date)
+        if end_date:
+            query = query.where(day_column <= end_date)
+        days.update(executor.execute(query).scalars())
+    bump_data_versions(executor, days, sales=True)
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    engine = get_engine()
+
+    # python -m app.rollups [START_DATE END_DATE]   (dates as YYYY-MM-DD)
+    if len(sys.argv) not in (1, 3):
+        print("Usage: python -m app.rollups [START_DATE END_DATE]")
+        sys.exit(1)
+
+    start, end = (date.fromisoformat(d) for d in sys.argv[1:3]) if len(sys.argv) == 3 else (None, None)
+    with engine.begin() as connection:
+        rebuild_rollups(connection, start, end)
+    print(f"Rebuilt daily rollups for {start or 'all history'} to {end or 'today'}")
@@ -0,0 +1,259 @@
+from datetime import date, datetime, timedelta, UTC
+from pathlib import Path
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud import get_sales_frame, get_expenses_frame, SALES_FRAME_COLUMNS, EXPENSES_FRAME_COLUMNS
+from app.models import DailySalesRollup, DailyExpenseRollup, DailyDataVersion
+
+# Parquet snapshots of sales and expenses, one file per month, answered by an
+# embedded DuckDB instead of the live database. Picked with
+# ANALYTICS_BACKEND=snapshot; duckdb is optional (pip install duckdb) and the
+# database is used whenever it or a snapshot is missing.
+#
+# Layout under ANALYTICS_SNAPSHOT_DIR:
+#   CURRENT                               id of the snapshot readers use
+#   <id>/manifest.json                    month versions and files
+#   <id>/<table>/month=YYYY-MM/data.parquet
+#
+# A new snapshot only re-exports months whose data version changed; other
+# month files are hard-linked from the previous snapshot.
+
+SNAPSHOT_TABLES = {
+    'sales': (get_sales_frame, SALES_FRAME_COLUMNS),
+    'expenses': (get_expenses_frame, EXPENSES_FRAME_COLUMNS),
+}
+# Older snapshots are removed, keeping this many so open readers can finish
+KEEP_SNAPSHOTS = 2
+
+
+def duckdb_available():
+    return importlib.util.find_spec('duckdb') is not None
+
+def _month_key(day: date):
+    return day.strftime('%Y-%m')
+
+def _month_bounds(key: str):
+    first = datetime.strptime(key, '%Y-%m').date()
+    return first, (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+# -----------------------------
+# 📸 TAKING SNAPSHOTS
+# -----------------------------
+
+def _month_versions(session: Session):
+    """
+    Returns {'YYYY-MM': data version} for every month with sales or expenses.
+    """
+    days = set()
+    for rollup in (DailySalesRollup, DailyExpenseRollup):
+        days.update(day for (day,) in session.query(rollup.day).distinct())
+
+    versions = {_month_key(day): 0 for day in days}
+    for day, version in session.query(DailyDataVersion.day, DailyDataVersion.version):
+        key = _month_key(day)
+        if key in versions:
+            versions[key] += version
+    return versions
+
+def _write_parquet(frame, path: Path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path)
+
+def current_snapshot(directory: str = None):
+    """
+    Returns the manifest of the snapshot readers should use, or None.
+    """
+    root = Path(directory or settings.ANALYTICS_SNAPSHOT_DIR)
+    try:
+        snapshot_id = (root / 'CURRENT').read_text().strip()
+        manifest = json.loads((root / snapshot_id / 'manifest.json').read_text())
+    except (OSError, ValueError):
+        return None
+    manifest['path'] = str(root / snapshot_id)
+    return manifest
+
+def take_snapshot(engine, directory: str = None):
+    """
+    Writes a new snapshot next to the current one, re-exporting only months
+    whose data version moved, then points CURRENT at it. Returns its manifest.
+    """
+    root = Path(directory or settings.ANALYTICS_SNAPSHOT_DIR)
+    previous = current_snapshot(root)
+    snapshot_id = f"{datetime.now(UTC):%Y%m%dT%H%M%S%fZ}-{os.getpid()}"
+    target = root / snapshot_id
+
+    with Session(engine) as session:
+        # Versions are read before the rows, so a write landing mid-export
+        # makes its month look stale next time rather than fresh
+        versions = _month_versions(session)
+        manifest = {'id': snapshot_id, 'taken_at': datetime.now(UTC).isoformat(timespec='seconds'),
+                    'months': versions, 'tables': {}, 'exported': 0, 'reused': 0}
+
+        for table, (fetch, columns) in SNAPSHOT_TABLES.items():
+            manifest['tables'][table] = []
+            for key in sorted(versions):
+                path = target / table / f"month={key}" / 'data.parquet'
+                old = Path(previous['path']) / table / f"month={key}" / 'data.parquet' if previous else None
+                if old and previous['months'].get(key) == versions[key] and key in previous['tables'].get(table, []):
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    try:
+                        os.link(old, path)
+                    except OSError:
+                        shutil.copyfile(old, path)
+                    manifest['reused'] += 1
+                else:
+                    frame = fetch(session, *_month_bounds(key), columns=columns)
+                    if frame.empty:
+                        continue
+                    _write_parquet(frame, path)
+                    manifest['exported'] += 1
+                manifest['tables'][table].append(key)
+
+    target.mkdir(parents=True, exist_ok=True)
+    (target / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    pointer = root / f"CURRENT.{snapshot_id}"
+    pointer.write_text(snapshot_id)
+    os.replace(pointer, root / 'CURRENT')
+
+    _remove_old_snapshots(root, snapshot_id)
+    return manifest
+
+def _remove_old_snapshots(root: Path, keep_id: str):
+    snapshots = sorted(p for p in root.iterdir() if p.is_dir() and (p / 'manifest.json').exists())
+    for old in snapshots[:-KEEP_SNAPSHOTS]:
+        if old.name != keep_id:
+            shutil.rmtree(old, ignore_errors=True)
+
+def start_snapshot_thread(engine, interval_seconds: int):
+    """
+    Starts a daemon thread that takes a snapshot every interval_seconds.
+    """
+    def run():
+        while True:
+            try:
+                take_snapshot(engine)
+            except Exception as e:
+                print(f"Analytics snapshot failed: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=run, name="analytics-snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+# -----------------------------
+# 🦆 QUERYING
+# -----------------------------
+
+def analytics_snapshot():
+    """
+    Returns the snapshot manifest when ANALYTICS_BACKEND is 'snapshot',
+    duckdb is installed and a snapshot exists; None means use the database.
+    """
+    if settings.ANALYTICS_BACKEND != 'snapshot' or not duckdb_available():
+        return None
+    return current_snapshot()
+
+def _query(snapshot: dict, table: str, select_sql: str, start_date, end_date, suffix: str = ''):
+    """
+    Runs `SELECT <select_sql> FROM <table> WHERE <range> <suffix>` over the
+    snapshot files and returns the rows. Only the month files overlapping
+    the range are read; the timestamp filter trims the edge months.
+    """
+    import duckdb
+
+    months = [m for m in snapshot['tables'][table] if _month_key(start_date) <= m <= _month_key(end_date)]
+    if not months:
+        return []
+
+    files = [str(Path(snapshot['path']) / table / f"month={m}" / 'data.parquet') for m in months]
+    end_exclusive = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    sql = (f"SELECT {select_sql} FROM read_parquet(?) "
+           f"WHERE timestamp >= ? AND timestamp < ? {suffix}")
+    # One in-memory connection per call: cheap, and safe across page threads
+    with duckdb.connect() as connection:
+        return connection.execute(
+            sql, [files, datetime.combine(start_date, datetime.min.time()), end_exclusive]
+        ).fetchall()
+
+def snapshot_sales_time_profile(snapshot: dict, start_date, end_date):
+    """
+    Same result as sales_time_profile over the snapshot's sales.
+    """
+    import pandas as pd
+
+    hourly = pd.Series(0.0, index=range(24))
+    weekday = pd.Series(0.0, index=range(7))
+    rows = _query(snapshot, 'sales', "hour(timestamp), isodow(timestamp) - 1, sum(total_sale)",
+                  start_date, end_date, "GROUP BY 1, 2")
+    for hour, day, total in rows:
+        hourly[hour] += total
+        weekday[day] += total
+    return {'hourly': hourly, 'weekday': weekday}
+
+def snapshot_sales_by_category(snapshot: dict, start_date, end_date):
+    """
+    Same rows as crud.get_sales_by_category, read from the snapshot.
+    """
+    rows = _query(snapshot, 'sales',
+                  "category, sum(total_sale), sum(quantity_sold), count(*), count(DISTINCT item_name)",
+                  start_date, end_date, "GROUP BY category ORDER BY 2 DESC")
+    return [
+        {
+            'category': category,
+            'sales': float(sales),
+            'quantity': int(quantity),
+            'transactions': int(transactions),
+            'unique_items': int(unique_items)
+        }
+        for category, sales, quantity, transactions, unique_items in rows
+    ]
+
+def snapshot_sales_by_item(snapshot: dict, start_date, end_date, limit: int = None):
+    """
+    Same rows as crud.get_sales_by_item, read from the snapshot.
+    """
+    suffix = "GROUP BY item_name ORDER BY 3 DESC" + (f" LIMIT {int(limit)}" if limit else "")
+    rows = _query(snapshot, 'sales',
+                  "item_name, max(category), sum(total_sale), sum(quantity_sold), count(*)",
+                  start_date, end_date, suffix)
+    return [
+        {
+            'item_name': item_name,
+            'category': category,
+            'sales': float(sales),
+            'quantity': int(quantity),
+            'transactions': int(transactions),
+            'avg_price': float(sales) / quantity if quantity else 0.0
+        }
+        for item_name, category, sales, quantity, transactions in rows
+    ]
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    parser = argparse.ArgumentParser(description="Snapshot sales and expenses to Parquet for the analytics engine.")
+    parser.add_argument("--loop", type=int, metavar="SECONDS", help="keep taking snapshots every SECONDS")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.loop:
+        start_snapshot_thread(engine, args.loop).join()
+    else:
+        result = take_snapshot(engine)
+        print(f"Snapshot {result['id']}: {result['exported']} month file(s) exported, "
+              f"{result['reused']} reused, in {settings.ANALYTICS_SNAPSHOT_DIR}")
@@ -0,0 +1,236 @@
+from sqlalchemy import (
+    MetaData, Table, Column, Date, String, Float, Integer, select, func, cast, delete, text,
+    union_all, and_, or_
+)
+from datetime import date, timedelta
+import argparse
+import threading
+import time
+
+from app.models import DailySalesRollup, DailyExpenseRollup, DailyDataVersion
+
+# Monthly summaries built from the daily rollups. On PostgreSQL they
+# are materialized views refreshed CONCURRENTLY; elsewhere they are plain
+# tables rebuilt in place. Migration 6 creates them; these definitions are
+# only for reading and refreshing, and stay out of Base.metadata.
+summary_metadata = MetaData()
+
+monthly_sales_summary = Table(
+    'monthly_sales_summary', summary_metadata,
+    Column('month', Date, nullable=False),
+    Column('category', String, nullable=False),
+    Column('item_name', String, nullable=False),
+    Column('total_sales', Float, nullable=False),
+    Column('total_quantity', Integer, nullable=False),
+    Column('transactions', Integer, nullable=False),
+    Column('total_cost', Float, nullable=False),
+    Column('total_profit', Float, nullable=False)
+)
+
+monthly_expense_summary = Table(
+    'monthly_expense_summary', summary_metadata,
+    Column('month', Date, nullable=False),
+    Column('expense_type', String, nullable=False),
+    Column('total_amount', Float, nullable=False),
+    Column('expense_count', Integer, nullable=False)
+)
+
+# Data version of each month at its last refresh. A month's summary rows are
+# only trusted while its current version still matches.
+summary_month_versions = Table(
+    'summary_month_versions', summary_metadata,
+    Column('month', Date, primary_key=True),
+    Column('version', Integer, nullable=False)
+)
+
+SUMMARY_TABLES = [monthly_sales_summary, monthly_expense_summary]
+
+# Only one process refreshes at a time across all dynos
+_REFRESH_LOCK_ID = 7341001
+
+
+def _month(column, dialect_name: str):
+    # First day of the month containing column
+    if dialect_name == 'postgresql':
+        return cast(func.date_trunc('month', column), Date)
+    return func.date(column, 'start of month', type_=Date)
+
+def _definitions(dialect_name: str):
+    """
+    Returns {summary table: select statement that computes it}.
+    """
+    R, E = DailySalesRollup, DailyExpenseRollup
+    month = _month(R.day, dialect_name)
+    expense_month = _month(E.day, dialect_name)
+
+    return {
+        monthly_sales_summary: select(
+            month.label('month'), R.category, R.item_name,
+            func.sum(R.total_sales).label('total_sales'),
+            func.sum(R.total_quantity).label('total_quantity'),
+            func.sum(R.transactions).label('transactions'),
+            func.sum(R.total_cost).label('total_cost'),
+            func.sum(R.total_profit).label('total_profit')
+        ).group_by(month, R.category, R.item_name),
+        monthly_expense_summary: select(
+            expense_month.label('month'), E.expense_type,
+            func.sum(E.total_amount).label('total_amount'),
+            func.sum(E.expense_count).label('expense_count')
+        ).group_by(expense_month, E.expense_type),
+    }
+
+
+# -----------------------------
+# 🔁 REFRESH
+# -----------------------------
+
+def _snapshot_month_versions(connection):
+    month = _month(DailyDataVersion.day, connection.dialect.name)
+    versions = connection.execute(
+        select(month, func.sum(DailyDataVersion.version)).group_by(month)
+    ).all()
+
+    connection.execute(delete(summary_month_versions))
+    if versions:
+        connection.execute(summary_month_versions.insert(),
+                           [{'month': m, 'version': int(v)} for m, v in versions])
+
+def rebuild_summaries(connection):
+    """
+    Recomputes every summary and the month versions they match, inside the
+    caller's transaction. Migration 6 creates the summaries.
+    """
+    # Versions are captured before the data, so a write landing mid-refresh
+    # makes its month look stale (safe) rather than fresh (wrong)
+    _snapshot_month_versions(connection)
+
+    if connection.dialect.name == 'postgresql':
+        for table in SUMMARY_TABLES:
+            connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {table.name}"))
+    else:
+        for table, definition in _definitions(connection.dialect.name).items():
+            connection.execute(delete(table))
+            connection.execute(table.insert().from_select([c.name for c in table.columns], definition))
+
+def refresh_summaries(engine):
+    """
+    Refreshes every summary in one transaction. Returns False without doing
+    anything if another process is already refreshing.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            if not connection.execute(select(func.pg_try_advisory_xact_lock(_REFRESH_LOCK_ID))).scalar():
+                return False
+        rebuild_summaries(connection)
+    return True
+
+def start_refresh_thread(engine, interval_seconds: int):
+    """
+    Starts a daemon thread that refreshes the summaries every interval_seconds.
+    """
+    def run():
+        while True:
+            try:
+                refresh_summaries(engine)
+            except Exception as e:
+                print(f"Summary refresh failed: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=run, name="summary-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# -----------------------------
+# 🔎 READING
+# -----------------------------
+
+def _month_start(day: date):
+    return day.replace(day=1)
+
+def _next_month(month: date):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def fresh_months(session, start_date, end_date):
+    """
+    Returns the closed months lying entirely inside start_date..end_date
+    whose summary rows are up to date with the daily rollups.
+    """
+    current_month = _month_start(date.today())
+    candidates = []
+    month = _month_start(start_date) if start_date.day == 1 else _next_month(start_date)
+    while _next_month(month) - timedelta(days=1) <= end_date and month < current_month:
+        candidates.append(month)
+        month = _next_month(month)
+    if not candidates:
+        return []
+
+    stored = dict(session.execute(
+        select(summary_month_versions.c.month, summary_month_versions.c.version)
+        .where(summary_month_versions.c.month.in_(candidates))
+    ).all())
+
+    month_bucket = _month(DailyDataVersion.day, session.get_bind().dialect.name)
+    current = dict(session.execute(
+        select(month_bucket, func.sum(DailyDataVersion.version))
+        .where(DailyDataVersion.day >= candidates[0], DailyDataVersion.day < _next_month(candidates[-1]))
+        .group_by(month_bucket)
+    ).all())
+
+    return [m for m in candidates if m in stored and stored[m] == current.get(m, 0)]
+
+def _combined_source(session, daily, summary, columns, start_date, end_date, months=None):
+    if months is None:
+        months = fresh_months(session, start_date, end_date)
+    else:
+        # Looked up over a wider range; keep the months this one covers
+        months = [m for m in months if m >= start_date and _next_month(m) - timedelta(days=1) <= end_date]
+    daily_rows = select(*(getattr(daily, c) for c in columns)) \
+        .where(daily.day >= start_date, daily.day <= end_date)
+    if not months:
+        return daily_rows.subquery()
+
+    # Days inside a fresh month come from the summary instead
+    daily_rows = daily_rows.where(~or_(*(
+        and_(daily.day >= m, daily.day < _next_month(m)) for m in months
+    )))
+    summary_rows = select(*(summary.c[c] for c in columns)).where(summary.c.month.in_(months))
+    return union_all(daily_rows, summary_rows).subquery()
+
+def sales_source(session, start_date, end_date, months=None):
+    """
+    Returns a subquery of per-category, per-item sales rows covering
+    start_date..end_date. Fresh closed months are read from
+    monthly_sales_summary and the remaining days from daily_sales_rollup.
+    Aggregate it like the daily rollup.
+
+    months is a fresh_months result for this range or a wider one. Pass it
+    when several sources are built at once so it is looked up only once.
+    """
+    columns = ['category', 'item_name', 'total_sales', 'total_quantity', 'transactions']
+    return _combined_source(session, DailySalesRollup, monthly_sales_summary, columns,
+                            start_date, end_date, months)
+
+def expense_source(session, start_date, end_date, months=None):
+    """
+    Returns a subquery of per-expense-type rows covering start_date..end_date,
+    combining monthly_expense_summary with daily_expense_rollup as sales_source does.
+    """
+    columns = ['expense_type', 'total_amount', 'expense_count']
+    return _combined_source(session, DailyExpenseRollup, monthly_expense_summary, columns,
+                            start_date, end_date, months)
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+
+    engine = get_engine()
+
+    parser = argparse.ArgumentParser(description="Refresh the monthly summaries.")
+    parser.add_argument("--loop", type=int, metavar="SECONDS", help="keep refreshing every SECONDS")
+    args = parser.parse_args()
+
+    if args.loop:
+        start_refresh_thread(engine, args.loop).join()
+    else:
+        print("Summaries refreshed" if refresh_summaries(engine) else "Another refresh is running")
@@ -0,0 +1,202 @@
+from datetime import date, datetime, timedelta
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete
+
+from app.models import (
+    Sale, Expense, Product, Category, DailySalesRollup, DailyExpenseRollup, DailyDataVersion,
+    SalesForecast, AppliedWrite
+)
+from app.importer import load_chunk
+from app.partitions import PARTITIONED_TABLES, is_partitioned, ensure_months
+from app.summaries import refresh_summaries, rebuild_summaries
+
+# Deterministic synthetic history for benchmarks and local testing. For a
+# given seed, row count, end date and chunk size the generated rows are
+# identical from run to run and between SQLite and PostgreSQL.
+
+SIZES = {'10k': 10_000, '1M': 1_000_000, '10M': 10_000_000}
+DEFAULT_SEED = 42
+DEFAULT_DAYS = 730
+# Fixed rather than today so reruns on different days produce the same data
+DEFAULT_END = date(2025, 12, 31)
+GENERATE_CHUNK_SIZE = 200_000
+# One expense for every EXPENSE_RATIO sales
+EXPENSE_RATIO = 20
+
+# (category, item, unit price in TRY, unit cost share)
+CATALOG = [
+    ('Food', 'Jollof Rice', 180.0, 0.45), ('Food', 'Egusi Soup', 220.0, 0.50),
+    ('Food', 'Pounded Yam', 160.0, 0.40), ('Food', 'Suya', 150.0, 0.55),
+    ('Food', 'Fried Plantain', 90.0, 0.35), ('Food', 'Moi Moi', 80.0, 0.40),
+    ('Drinks', 'Zobo', 45.0, 0.30), ('Drinks', 'Malt', 40.0, 0.60),
+    ('Drinks', 'Chapman', 70.0, 0.35), ('Drinks', 'Palm Wine', 95.0, 0.50),
+    ('Snacks', 'Puff Puff', 30.0, 0.30), ('Snacks', 'Chin Chin', 50.0, 0.35),
+    ('Snacks', 'Meat Pie', 60.0, 0.45), ('Snacks', 'Plantain Chips', 40.0, 0.40),
+    ('Groceries', 'Garri', 120.0, 0.70), ('Groceries', 'Palm Oil', 210.0, 0.75),
+    ('Groceries', 'Yam Tuber', 140.0, 0.70), ('Groceries', 'Ogbono', 260.0, 0.72),
+    ('Groceries', 'Stockfish', 380.0, 0.78), ('Groceries', 'Crayfish', 150.0, 0.70),
+]
+
+# (expense type, median amount in TRY, spread of the log-normal)
+EXPENSE_TYPES = [
+    ('Items', 900.0, 0.6), ('Transport', 120.0, 0.5), ('Power', 350.0, 0.3),
+    ('Wages', 1500.0, 0.2), ('Rent', 6000.0, 0.05), ('Packaging', 200.0, 0.4),
+    ('Maintenance', 450.0, 0.8),
+]
+
+# Relative traffic by weekday (Monday first) and by hour of day
+WEEKDAY_WEIGHTS = np.array([0.85, 0.80, 0.90, 0.95, 1.15, 1.45, 1.30])
+HOUR_WEIGHTS = np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 3, 5, 9, 10, 7, 4, 4, 6, 9, 10, 7, 4, 1, 0], dtype=float)
+
+
+def parse_size(value: str):
+    """
+    Accepts a preset ('10k', '1M', '10M') or a plain row count.
+    """
+    return SIZES[value] if value in SIZES else int(value.replace('_', ''))
+
+def _day_weights(days: pd.DatetimeIndex):
+    # Weekday pattern, a December peak and ~30% growth over two years
+    weekday = WEEKDAY_WEIGHTS[days.weekday.to_numpy()]
+    season = 1 + 0.25 * np.cos(2 * np.pi * (days.dayofyear.to_numpy() - 350) / 365.25)
+    growth = np.linspace(1.0, 1.0 + 0.15 * len(days) / 365, len(days))
+    weights = weekday * season * growth
+    return weights / weights.sum()
+
+def _timestamps(rng, days, day_probabilities, n):
+    picked = days[rng.choice(len(days), size=n, p=day_probabilities)]
+    hours = rng.choice(24, size=n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = hours * 3600 + rng.integers(0, 3600, size=n)
+    return picked + pd.to_timedelta(seconds, unit='s')
+
+def _chunk_rngs(seed: int, total: int, chunk_size: int):
+    for index, child in enumerate(np.random.SeedSequence(seed).spawn(-(-total // chunk_size))):
+        yield np.random.default_rng(child), min(chunk_size, total - index * chunk_size)
+
+def generate_sales(rows: int, seed: int = DEFAULT_SEED, days: int = DEFAULT_DAYS,
+                   end_date: date = DEFAULT_END, chunk_size: int = GENERATE_CHUNK_SIZE):
+    """
+    Yields frames of synthetic sales shaped like validate_chunk output
+    (sales columns plus 'day'). Item popularity follows a Zipf-like skew,
+    so a few items dominate like in the real shop.
+    """
+    calendar = pd.date_range(end=end_date, periods=days, freq='D')
+    day_probabilities = _day_weights(calendar)
+    catalog = pd.DataFrame(CATALOG, columns=['category', 'item_name', 'price', 'cost_share'])
+    popularity = 1 / np.arange(1, len(catalog) + 1) ** 0.9
+    popularity /= popularity.sum()
+
+    for rng, n in _chunk_rngs(seed, rows, chunk_size):
+        items = catalog.iloc[rng.choice(len(catalog), size=n, p=popularity)].reset_index(drop=True)
+        quantity = rng.geometric(0.55, size=n)
+        total = items['price'].to_numpy() * quantity
+        cost = np.round(total * items['cost_share'].to_numpy(), 2)
+        timestamps = _timestamps(rng, calendar, day_probabilities, n)
+
+        yield pd.DataFrame({
+            'item_name': items['item_name'],
+            'category': items['category'],
+            'price_per_unit': items['price'],
+            'quantity_sold': quantity.astype('int64'),
+            'total_sale': total,
+            'cost': cost,
+            'profit': total - cost,
+            'currency': 'TRY',
+            'timestamp': timestamps,
+            'day': timestamps.date,
+        })
+
+def generate_expenses(rows: int, seed: int = DEFAULT_SEED, days: int = DEFAULT_DAYS,
+                      end_date: date = DEFAULT_END, chunk_size: int = GENERATE_CHUNK_SIZE):
+    """
+    Yields frames of synthetic expenses (expenses columns plus 'day') with
+    log-normal amounts per expense type.
+    """
+    calendar = pd.date_range(end=end_date, periods=days, freq='D')
+    day_probabilities = np.full(days, 1 / days)
+    types = pd.DataFrame(EXPENSE_TYPES, columns=['expense_type', 'median', 'sigma'])
+    frequency = np.array([0.35, 0.25, 0.1, 0.1, 0.02, 0.13, 0.05])
+
+    # Offset the seed so expenses don't mirror the sales random stream
+    for rng, n in _chunk_rngs(seed + 1, rows, chunk_size):
+        picked = types.iloc[rng.choice(len(types), size=n, p=frequency)].reset_index(drop=True)
+        amount = np.round(picked['median'].to_numpy() * rng.lognormal(0, picked['sigma'].to_numpy()), 2)
+        timestamps = _timestamps(rng, calendar, day_probabilities, n)
+
+        yield pd.DataFrame({
+            'expense_type': picked['expense_type'],
+            'amount': amount,
+            'description': 'synthetic',
+            'currency': 'TRY',
+            'timestamp': timestamps,
+            'day': timestamps.date,
+        })
+
+def reset_data(connection):
+    """
+    Deletes every sale, expense, product and derived row, including the
+    monthly summaries. Only for throwaway databases.
+    """
+    for model in (SalesForecast, DailyDataVersion, DailySalesRollup, DailyExpenseRollup, AppliedWrite,
+                  Sale, Expense, Product, Category):
+        connection.execute(delete(model.__table__))
+    # With no rollups left this empties the summaries and their month versions
+    rebuild_summaries(connection)
+
+def populate(engine, rows: int, seed: int = DEFAULT_SEED, days: int = DEFAULT_DAYS,
+             end_date: date = DEFAULT_END, on_progress=None):
+    """
+    Generates and loads `rows` sales plus rows / EXPENSE_RATIO expenses, one
+    transaction per chunk, then refreshes the summaries. Returns counts and timing.
+    """
+    started = time.perf_counter()
+    first_month = (end_date - timedelta(days=days - 1)).replace(day=1)
+    with engine.begin() as connection:
+        # Give the generated history its own monthly partitions on PostgreSQL
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(connection, table.name):
+                ensure_months(connection, table.name, first_month, end_date.replace(day=1))
+
+    loaded = {'sales': 0, 'expenses': 0}
+    streams = [
+        ('sales', generate_sales(rows, seed, days, end_date)),
+        ('expenses', generate_expenses(max(1, rows // EXPENSE_RATIO), seed, days, end_date)),
+    ]
+    for kind, frames in streams:
+        for frame in frames:
+            with engine.begin() as connection:
+                load_chunk(connection, frame, kind)
+            loaded[kind] += len(frame)
+            if on_progress:
+                on_progress(kind, loaded[kind])
+
+    refresh_summaries(engine)
+    return {**loaded, 'seconds': time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    from app.database import get_engine
+    from app.migrations import upgrade
+
+    parser = argparse.ArgumentParser(description="Load deterministic synthetic sales and expenses.")
+    parser.add_argument("--rows", default="10k", help="sales rows: 10k, 1M, 10M or a number")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--end", type=date.fromisoformat, default=DEFAULT_END, help="last day, YYYY-MM-DD")
+    parser.add_argument("--reset", action="store_true", help="delete existing sales and expenses first")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    upgrade(engine)
+    if args.reset:
+        with engine.begin() as connection:
+            reset_data(connection)
+
+    result = populate(engine, parse_size(args.rows), args.seed, args.days, args.end,
+                      lambda kind, count: print(f"\r{kind}: {count:,} rows".ljust(30), end="", flush=True))
+    print(f"\nLoaded {result['sales']:,} sales and {result['expenses']:,} expenses "
+          f"in {result['seconds']:.1f}s at {datetime.now():%Y-%m-%d %H:%M:%S}")
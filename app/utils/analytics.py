@@ -0,0 +1,106 @@
+from typing import TYPE_CHECKING
+
+# pandas and numpy are imported where they're used, so importing this module
+# for WEEKDAY_NAMES doesn't load them
+if TYPE_CHECKING:
+    import pandas as pd
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+# -----------------------------
+# 📈 DAILY TRENDS
+# -----------------------------
+
+def daily_trend(sales_by_day: dict, expenses_by_day: dict, start_date=None, end_date=None):
+    """
+    Builds the daily Sales / Expenses / Net Profit frame used by the trend charts.
+    With a start and end date every day in the range gets a row (missing days
+    are 0); otherwise only days that have sales or expenses are included.
+    """
+    import numpy as np
+    import pandas as pd
+
+    sales = pd.Series(sales_by_day, dtype=float)
+    expenses = pd.Series(expenses_by_day, dtype=float)
+
+    if start_date and end_date:
+        dates = pd.date_range(start=start_date, end=end_date, freq='D').date
+    else:
+        dates = sorted(set(sales.index) | set(expenses.index))
+
+    trend = pd.DataFrame({
+        'Date': dates,
+        'Sales': sales.reindex(dates, fill_value=0.0).to_numpy(),
+        'Expenses': expenses.reindex(dates, fill_value=0.0).to_numpy(),
+    })
+    trend['Net Profit'] = trend['Sales'] - trend['Expenses']
+    trend['Cumulative Sales'] = trend['Sales'].cumsum()
+    trend['Moving Avg (7d)'] = trend['Sales'].rolling(window=max(1, min(7, len(trend)))).mean()
+    # 0 on days without sales, where expenses alone would give -inf
+    day_sales = trend['Sales'].to_numpy()
+    has_sales = day_sales > 0
+    trend['Profit Margin %'] = np.where(has_sales, trend['Net Profit'] / np.where(has_sales, day_sales, 1) * 100, 0.0)
+    return trend
+
+
+# -----------------------------
+# 🏪 CATEGORY & ITEM TABLES
+# -----------------------------
+
+def category_metrics(categories: list):
+    """
+    Turns the rows from get_sales_by_category into a frame indexed by category
+    with average transaction and revenue share columns added.
+    """
+    import pandas as pd
+
+    columns = ['sales', 'quantity', 'transactions', 'unique_items']
+    metrics = pd.DataFrame(categories, columns=['category'] + columns).set_index('category')
+
+    total_sales = metrics['sales'].sum()
+    metrics['avg_transaction'] = metrics['sales'] / metrics['transactions'].clip(lower=1)
+    metrics['revenue_share'] = metrics['sales'] / total_sales * 100 if total_sales > 0 else 0.0
+    return metrics
+
+def item_table(items: list):
+    """
+    Turns the rows from get_sales_by_item into a display frame.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        items, columns=['item_name', 'category', 'sales', 'quantity', 'transactions', 'avg_price']
+    ).rename(columns={
+        'item_name': 'Item',
+        'category': 'Category',
+        'sales': 'Sales (TRY)',
+        'quantity': 'Quantity Sold',
+        'transactions': 'Transactions',
+        'avg_price': 'Avg Price'
+    })
+
+
+# -----------------------------
+# ⏰ TIME-OF-DAY PROFILE
+# -----------------------------
+
+def sales_time_profile(sales_frame: 'pd.DataFrame'):
+    """
+    Sums total_sale by hour of day (0-23) and by weekday (0 = Monday) from a
+    frame with timestamp and total_sale columns. Both series are always full
+    length, with 0 where there were no sales.
+    """
+    import numpy as np
+    import pandas as pd
+
+    timestamps = sales_frame['timestamp'].dt
+    values = sales_frame['total_sale'].to_numpy(dtype=float)
+
+    hourly = np.bincount(timestamps.hour.to_numpy(dtype=int), weights=values, minlength=24)
+    weekday = np.bincount(timestamps.weekday.to_numpy(dtype=int), weights=values, minlength=7)
+
+    return {
+        'hourly': pd.Series(hourly, index=range(24)),
+        'weekday': pd.Series(weekday, index=range(7)),
+    }
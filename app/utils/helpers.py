@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+import os
+import tempfile
+
+
+@contextmanager
+def spooled_download(chunks, suffix: str = ".csv"):
+    """
+    Writes text chunks to a temporary file and yields it opened for binary
+    reading, ready to hand to st.download_button. Only one chunk is held in
+    memory while writing. The file is removed on exit.
+
+    st.download_button still reads the whole file into Streamlit's in-memory
+    media store, where it stays until the session reruns, so peak memory
+    grows with the export: about one copy of the CSV bytes, instead of the
+    rows, a DataFrame and the CSV text at once. Streamlit 1.45 has no way
+    to stream a download from disk.
+    """
+    tmp = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8", newline="")
+    try:
+        with tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+        with open(tmp.name, "rb") as spooled:
+            yield spooled
+    finally:
+        os.remove(tmp.name)
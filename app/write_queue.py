@@ -0,0 +1,386 @@
+from datetime import datetime, UTC
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import session_scope
+from app.crud import create_sale, create_expense, save_product, get_products, get_categories
+from app.models import AppliedWrite
+
+logger = logging.getLogger(__name__)
+
+# Write-behind queue for the entry forms. Entries are appended to a local
+# SQLite file in WAL mode (a local disk write, no network) and a flusher
+# thread moves them into the database in batches. Each entry carries an
+# idempotency key that is stored in applied_writes in the same transaction,
+# so a batch retried after an unacknowledged commit is never applied twice.
+
+# Seconds between flushes when nothing wakes the flusher, and the cap on the
+# retry delay, which doubles with each failed attempt
+FLUSH_INTERVAL = 5
+MAX_RETRY_DELAY = 300
+# An entry the database rejects this many times moves to dead_writes, where
+# queue_status reports it until it is requeued. Attempts that fail because
+# the database can't be reached don't count.
+MAX_ATTEMPTS = 10
+
+# Failures that mean the database (or a pooled connection to it) isn't
+# available, rather than that the entries are bad
+_UNAVAILABLE = (OperationalError, InterfaceError, TimeoutError)
+
+# Seconds the last-known product catalog is used before the database is
+# asked again, and how long that read may wait for a connection
+CATALOG_MAX_AGE = 300
+CATALOG_CONNECT_TIMEOUT = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    idempotency_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    rejections INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_DEAD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_writes (
+    idempotency_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at TEXT NOT NULL
+)
+"""
+
+# One row: the catalog as last read from the database, when it was read and
+# when the database was last asked
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    products TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+)
+"""
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_wake = threading.Event()
+_catalog_engine = None
+
+
+def _connect(path: str = None):
+    connection = sqlite3.connect(path or settings.WRITE_QUEUE_PATH, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # FULL syncs the WAL on every commit, so an acknowledged entry survives
+    # a crash or power loss
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.execute(_SCHEMA)
+    # Queue files written before rejections were counted
+    if 'rejections' not in {row[1] for row in connection.execute("PRAGMA table_info(pending_writes)")}:
+        connection.execute("ALTER TABLE pending_writes ADD COLUMN rejections INTEGER NOT NULL DEFAULT 0")
+    connection.execute(_DEAD_SCHEMA)
+    connection.execute(_CATALOG_SCHEMA)
+    return connection
+
+
+# -----------------------------
+# 📥 ENQUEUE
+# -----------------------------
+
+def enqueue(kind: str, payload: dict, path: str = None):
+    """
+    Durably appends one entry and returns its idempotency key. kind is a
+    key of HANDLERS; payload must be JSON-serializable (datetimes are
+    stored as ISO strings).
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown write kind: {kind}")
+    key = uuid.uuid4().hex
+    connection = _connect(path)
+    try:
+        with connection:
+            connection.execute(
+                "INSERT INTO pending_writes (idempotency_key, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(payload, default=lambda value: value.isoformat()),
+                 datetime.now(UTC).isoformat(timespec='seconds'))
+            )
+    finally:
+        connection.close()
+    _wake.set()
+    return key
+
+def queue_status(path: str = None):
+    """
+    Returns the number of waiting entries, the oldest one's creation time,
+    the most recent error, if any, and the number of dead entries (see
+    MAX_ATTEMPTS) with the latest one's error.
+    """
+    connection = _connect(path)
+    try:
+        pending, oldest = connection.execute("SELECT count(*), min(created_at) FROM pending_writes").fetchone()
+        error = connection.execute(
+            "SELECT last_error FROM pending_writes WHERE last_error IS NOT NULL "
+            "ORDER BY next_attempt_at DESC LIMIT 1"
+        ).fetchone()
+        dead, dead_error = connection.execute(
+            "SELECT count(*), (SELECT last_error FROM dead_writes ORDER BY failed_at DESC LIMIT 1) FROM dead_writes"
+        ).fetchone()
+    finally:
+        connection.close()
+    return {'pending': pending, 'oldest': oldest, 'last_error': error[0] if error else None,
+            'dead': dead, 'dead_error': dead_error}
+
+def requeue_dead(path: str = None):
+    """
+    Moves every dead entry back into the queue with a fresh attempt count,
+    e.g. after fixing what made the database reject them. Returns how many.
+    """
+    connection = _connect(path)
+    try:
+        with connection:
+            moved = connection.execute(
+                "INSERT INTO pending_writes (idempotency_key, kind, payload, created_at) "
+                "SELECT idempotency_key, kind, payload, created_at FROM dead_writes"
+            ).rowcount
+            connection.execute("DELETE FROM dead_writes")
+    finally:
+        connection.close()
+    _wake.set()
+    return moved
+
+
+# -----------------------------
+# 🚚 FLUSH
+# -----------------------------
+
+def _parse_timestamp(values: dict):
+    if values.get('timestamp'):
+        values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+    return values
+
+def _apply_sale(session, payload: dict):
+    sale = _parse_timestamp(dict(payload['sale']))
+    if payload.get('product'):
+        # New product or a changed unit cost recorded with the sale
+        sale['product_id'] = save_product(session, **payload['product']).id
+    create_sale(session, **sale, commit=False)
+
+def _apply_expense(session, payload: dict):
+    create_expense(session, **_parse_timestamp(dict(payload)), commit=False)
+
+HANDLERS = {
+    'sale': _apply_sale,
+    'expense': _apply_expense,
+}
+
+def _apply(rows):
+    """
+    Writes rows in one transaction, skipping keys already applied.
+    """
+    with session_scope() as session:
+        keys = [key for key, _, _ in rows]
+        done = {key for (key,) in session.query(AppliedWrite.idempotency_key)
+                .filter(AppliedWrite.idempotency_key.in_(keys))}
+        for key, kind, payload in rows:
+            if key in done:
+                continue
+            HANDLERS[kind](session, json.loads(payload))
+            session.add(AppliedWrite(idempotency_key=key, kind=kind))
+
+def _reschedule(connection, keys, error: Exception, counts: bool = True):
+    """
+    Backs the entries off after a failed attempt. When the failure counts
+    against them (the database rejected them), entries rejected MAX_ATTEMPTS
+    times move to dead_writes.
+    """
+    with connection:
+        connection.executemany(
+            "UPDATE pending_writes SET attempts = attempts + 1, rejections = rejections + ?, last_error = ?, "
+            "next_attempt_at = ? + min(?, 1 << min(attempts, 16)) WHERE idempotency_key = ?",
+            [(int(counts), str(error)[:500], time.time(), MAX_RETRY_DELAY, key) for key in keys]
+        )
+        if not counts:
+            return
+        dead = [(key,) for (key,) in connection.execute(
+            "SELECT idempotency_key FROM pending_writes WHERE rejections >= ? "
+            f"AND idempotency_key IN ({', '.join('?' * len(keys))})", [MAX_ATTEMPTS, *keys]
+        )]
+        if dead:
+            connection.executemany(
+                "INSERT OR REPLACE INTO dead_writes "
+                "SELECT idempotency_key, kind, payload, created_at, attempts, last_error, ? "
+                "FROM pending_writes WHERE idempotency_key = ?",
+                [(datetime.now(UTC).isoformat(timespec='seconds'), key) for (key,) in dead]
+            )
+            connection.executemany("DELETE FROM pending_writes WHERE idempotency_key = ?", dead)
+            logger.error("Write queue: %d entr(ies) rejected %d times were moved to dead_writes",
+                         len(dead), MAX_ATTEMPTS)
+
+def flush(batch_size: int = None, path: str = None):
+    """
+    Moves due entries into the database, batch_size per transaction, until
+    none are left or one fails. When the database can't be reached, or no
+    pooled connection frees up in time, the whole batch is rescheduled; any
+    other failure is retried entry by entry so one bad entry can't hold back
+    the rest. Failed entries wait twice as long after each attempt, and one
+    rejected MAX_ATTEMPTS times is moved to dead_writes. Returns the number
+    written.
+    """
+    batch_size = batch_size or settings.WRITE_QUEUE_BATCH
+    connection = _connect(path)
+    written = 0
+    try:
+        while True:
+            rows = connection.execute(
+                "SELECT idempotency_key, kind, payload FROM pending_writes "
+                "WHERE next_attempt_at <= ? ORDER BY rowid LIMIT ?",
+                (time.time(), batch_size)
+            ).fetchall()
+            if not rows:
+                return written
+
+            try:
+                _apply(rows)
+                applied = rows
+            except _UNAVAILABLE as e:
+                _reschedule(connection, [key for key, _, _ in rows], e, counts=False)
+                return written
+            except Exception:
+                applied = []
+                for row in rows:
+                    try:
+                        _apply([row])
+                        applied.append(row)
+                    except Exception as e:
+                        _reschedule(connection, [row[0]], e, counts=not isinstance(e, _UNAVAILABLE))
+
+            with connection:
+                connection.executemany("DELETE FROM pending_writes WHERE idempotency_key = ?",
+                                       [(key,) for key, _, _ in applied])
+            written += len(applied)
+            if len(applied) < len(rows):
+                return written
+    finally:
+        connection.close()
+
+def start_flusher(interval_seconds: int = FLUSH_INTERVAL):
+    """
+    Starts the process-wide flusher thread unless it is already running. It
+    flushes every interval_seconds, or straight away after an enqueue.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return _flusher
+
+        def run():
+            while True:
+                try:
+                    flush()
+                except Exception:
+                    # The queue file itself failed; entries stay where they are
+                    logger.exception("Write queue flush failed")
+                _wake.wait(interval_seconds)
+                _wake.clear()
+
+        _flusher = threading.Thread(target=run, name="write-queue-flusher", daemon=True)
+        _flusher.start()
+        return _flusher
+
+
+
+# -----------------------------
+# 🗂️ LAST-KNOWN CATALOG
+# -----------------------------
+
+def _read_catalog():
+    # A connection of its own with a short connect timeout, so an
+    # unreachable database costs the entry page seconds, not minutes
+    global _catalog_engine
+    if _catalog_engine is None:
+        settings.validate_config()
+        url = make_url(settings.DATABASE_URL)
+        connect_args = {'connect_timeout': CATALOG_CONNECT_TIMEOUT} if url.get_backend_name() == 'postgresql' else {}
+        _catalog_engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+    with Session(_catalog_engine) as session:
+        return get_products(session), get_categories(session)
+
+def load_catalog(path: str = None, max_age: int = CATALOG_MAX_AGE):
+    """
+    Returns the product catalog as {'products', 'categories', 'fetched_at',
+    'stale'} from the copy kept in the queue file. The database is only
+    read when that copy was last checked more than max_age seconds ago; if
+    it can't be reached then, the old copy is returned with stale set.
+    Raises when there is no copy yet and the database can't be read.
+    """
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT products, categories, fetched_at, checked_at FROM catalog_snapshot"
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[3] >= max_age:
+            try:
+                products, categories = _read_catalog()
+            except (OperationalError, InterfaceError):
+                if row is None:
+                    raise
+                # Wait another max_age before trying again
+                with connection:
+                    connection.execute("UPDATE catalog_snapshot SET checked_at = ?", (now,))
+                row = (*row[:3], now)
+            else:
+                row = (json.dumps(products), json.dumps(categories), now, now)
+                with connection:
+                    connection.execute("INSERT OR REPLACE INTO catalog_snapshot VALUES (1, ?, ?, ?, ?)", row)
+    finally:
+        connection.close()
+
+    products, categories, fetched_at, checked_at = row
+    return {'products': json.loads(products), 'categories': json.loads(categories),
+            'fetched_at': datetime.fromtimestamp(fetched_at, UTC), 'stale': fetched_at < checked_at}
+
+def expire_catalog(path: str = None):
+    """
+    Makes the next load_catalog read the database, e.g. after a product
+    was saved.
+    """
+    connection = _connect(path)
+    try:
+        with connection:
+            connection.execute("UPDATE catalog_snapshot SET checked_at = 0")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or flush the local write-behind queue.")
+    parser.add_argument("command", choices=["status", "flush", "requeue"], nargs="?", default="status")
+    args = parser.parse_args()
+
+    if args.command == "requeue":
+        print(f"Requeued {requeue_dead()} dead entr(ies)")
+    if args.command in ("flush", "requeue"):
+        print(f"Wrote {flush()} queued entr(ies)")
+    status = queue_status()
+    print(f"{status['pending']} pending (oldest {status['oldest'] or '-'}), last error: {status['last_error'] or '-'}")
+    print(f"{status['dead']} dead, last error: {status['dead_error'] or '-'}")
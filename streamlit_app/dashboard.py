@@ -4,14 +4,18 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
-import pandas as pd
-from app.database import SessionLocal
+from app.database import session_scope
 from app.utils.calculations import get_roi
 from app.models import Sale, Expense
-from app.crud import get_sales_in_range, get_expenses_in_range
+from app.utils.analytics import category_metrics
+from app.crud import get_sales_page, get_expenses_page, iter_sales_csv, iter_expenses_csv, get_data_version
+from app.reports import build_dashboard_data
+from app.utils.helpers import spooled_download
+from app.cache import dashboard_cache
+from app.background import start_background_threads
+from app.query_stats import set_current_page
+from app.profiling import RenderTimer, profiling_requested, timing_rows
 
 # Page config
 st.set_page_config(
@@ -19,6 +23,11 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+set_current_page("dashboard")
+start_background_threads()
+# Per-section timing of this rerun, shown at the bottom of the sidebar
+timer = RenderTimer("dashboard", profile=profiling_requested(st.query_params))
+plotly_chart = timer.timed("st.plotly_chart", st.plotly_chart)
 
 # Custom CSS for better styling
 st.markdown("""
@@ -43,19 +52,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-
-# Initialize session with better error handling
-@st.cache_resource
-def init_db_session():
-    try:
-        return SessionLocal()
-    except Exception as e:
-        st.error(f"Database connection failed: {str(e)}")
-        st.stop()
-
-
-session = init_db_session()
-
 # Header
 st.markdown("# 🍲 Kika's Store Business Intelligence Dashboard")
 st.markdown("*Real-time insights for your food business success* 📈")
@@ -96,67 +92,93 @@ with st.sidebar:
 
     # Refresh button
     if st.button("🔄 Refresh Data"):
-        st.cache_data.clear()
+        # Only this period is evicted; other users' cached periods are untouched
+        dashboard_cache.invalidate((start_date, end_date))
+        st.session_state.pop('recent_sales_feed', None)
+        st.session_state.pop('recent_expenses_feed', None)
+        timer.finish()
         st.rerun()
 
 
-# Get data for selected period
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def get_dashboard_data(start_date, end_date):
-    sales_data = get_sales_in_range(session, start_date, end_date)
-    expenses_data = get_expenses_in_range(session, start_date, end_date)
+def format_recent_sale(s):
+    return {
+        'Date': s.timestamp.strftime('%Y-%m-%d %H:%M'),
+        'Item': s.item_name,
+        'Category': s.category,
+        'Qty': s.quantity_sold,
+        'Total': f"{s.total_sale:.2f} TRY"
+    }
 
-    # Calculate metrics
-    total_sales = sum(s.total_sale for s in sales_data)
-    total_expenses = sum(e.amount for e in expenses_data)
-    net_profit = total_sales - total_expenses
-    roi = (net_profit / total_expenses * 100) if total_expenses > 0 else 0
 
-    # Prepare daily data
-    sales_by_day = {}
-    expenses_by_day = {}
+def format_recent_expense(e):
+    return {
+        'Date': e.timestamp.strftime('%Y-%m-%d %H:%M'),
+        'Type': e.expense_type,
+        'Amount': f"{e.amount:.2f} TRY",
+        'Description': e.description[:30] + "..." if e.description and len(
+            e.description) > 30 else e.description or ""
+    }
 
-    for s in sales_data:
-        date = s.timestamp.date()
-        sales_by_day[date] = sales_by_day.get(date, 0) + s.total_sale
 
-    for e in expenses_data:
-        date = e.timestamp.date()
-        expenses_by_day[date] = expenses_by_day.get(date, 0) + e.amount
+def load_activity_page(feed_key, fetch_page, format_row):
+    # Appends the next keyset page to the feed kept in session_state
+    feed = st.session_state[feed_key]
+    with session_scope() as page_session:
+        rows, feed['cursor'] = fetch_page(page_session, cursor=feed['cursor'], limit=10,
+                                          start_date=feed['period'][0], end_date=feed['period'][1])
+        feed['rows'].extend(format_row(r) for r in rows)
+    feed['exhausted'] = feed['cursor'] is None
+
+
+def activity_feed(feed_key, fetch_page, format_row):
+    # One feed per browser session, restarted whenever the period changes
+    period = (start_date, end_date)
+    feed = st.session_state.get(feed_key)
+    if feed is None or feed['period'] != period:
+        st.session_state[feed_key] = {'period': period, 'rows': [], 'cursor': None, 'exhausted': False}
+        load_activity_page(feed_key, fetch_page, format_row)
+    return st.session_state[feed_key]
 
-    return {
-        'sales_data': sales_data,
-        'expenses_data': expenses_data,
-        'total_sales': total_sales,
-        'total_expenses': total_expenses,
-        'net_profit': net_profit,
-        'roi': roi,
-        'sales_by_day': sales_by_day,
-        'expenses_by_day': expenses_by_day
-    }
 
+# Get data for selected period
+def get_dashboard_data(start_date, end_date):
+    # Cached until a write touches one of the period's days, then recomputed
+    with session_scope() as session:
+        version = get_data_version(session, start_date, end_date)
+        return dashboard_cache.get_or_compute(
+            (start_date, end_date), version,
+            lambda: build_dashboard_data(session, start_date, end_date)
+        )
 
-data = get_dashboard_data(start_date, end_date)
+
+try:
+    with timer.section("data fetch + aggregation"):
+        data = get_dashboard_data(start_date, end_date)
+except Exception as e:
+    st.error(f"Database connection failed: {str(e)}")
+    # st.stop() ends the script here, so stop the clock (and profiler) first
+    timer.finish()
+    st.stop()
 
 # KPI Metrics Row
 st.markdown("## 🎯 Key Performance Indicators")
 col1, col2, col3, col4, col5 = st.columns(5)
 
-with col1:
+with col1, timer.section("KPIs"):
     st.metric(
         label="💰 Total Sales",
         value=f"{data['total_sales']:.2f} TRY",
         delta=f"{data['total_sales'] / max(1, len(data['sales_by_day'])):.2f} avg/day"
     )
 
-with col2:
+with col2, timer.section("KPIs"):
     st.metric(
         label="💸 Total Expenses",
         value=f"{data['total_expenses']:.2f} TRY",
         delta=f"{data['total_expenses'] / max(1, len(data['expenses_by_day'])):.2f} avg/day"
     )
 
-with col3:
+with col3, timer.section("KPIs"):
     profit_color = "normal" if data['net_profit'] >= 0 else "inverse"
     st.metric(
         label="📈 Net Profit",
@@ -165,24 +187,21 @@ with col3:
         delta_color=profit_color
     )
 
-with col4:
-    avg_transaction = data['total_sales'] / max(1, len(data['sales_data']))
+with col4, timer.section("KPIs"):
+    avg_transaction = data['total_sales'] / max(1, data['transactions'])
     st.metric(
         label="🛒 Avg Transaction",
         value=f"{avg_transaction:.2f} TRY",
-        delta=f"{len(data['sales_data'])} transactions"
+        delta=f"{data['transactions']} transactions"
     )
 
-with col5:
-    # Calculate top selling category
-    category_sales = {}
-    for s in data['sales_data']:
-        category_sales[s.category] = category_sales.get(s.category, 0) + s.total_sale
-    top_category = max(category_sales.items(), key=lambda x: x[1])[0] if category_sales else "N/A"
+with col5, timer.section("KPIs"):
+    # Categories come back ordered by sales, so the first one is the top seller
+    top_category = data['category_sales'][0] if data['category_sales'] else None
     st.metric(
         label="🏆 Top Category",
-        value=top_category,
-        delta=f"{max(category_sales.values()) if category_sales else 0:.0f} TRY"
+        value=top_category['category'] if top_category else "N/A",
+        delta=f"{top_category['sales'] if top_category else 0:.0f} TRY"
     )
 
 # Main Charts Section
@@ -191,18 +210,16 @@ st.markdown("## 📊 Performance Analytics")
 # Create tabs for different views
 tab1, tab2, tab3, tab4 = st.tabs(["💹 Trends", "🔍 Analysis", "🏪 Categories", "📋 Recent Activity"])
 
-with tab1:
+with tab1, timer.section("figures: trends"):
+    # plotly and pandas load on first use rather than with the page, so the
+    # header and sidebar are sent first and the cost shows up in the timings
+    import plotly.graph_objects as go
+
     col1, col2 = st.columns(2)
 
     with col1:
         # Sales vs Expenses Chart
-        all_dates = sorted(set(data['sales_by_day'].keys()) | set(data['expenses_by_day'].keys()))
-        chart_df = pd.DataFrame({
-            'Date': all_dates,
-            'Sales': [data['sales_by_day'].get(d, 0) for d in all_dates],
-            'Expenses': [data['expenses_by_day'].get(d, 0) for d in all_dates],
-            'Net Profit': [data['sales_by_day'].get(d, 0) - data['expenses_by_day'].get(d, 0) for d in all_dates]
-        })
+        chart_df = data['daily_trend']
 
         fig = go.Figure()
 
@@ -229,13 +246,11 @@ with tab1:
             hovermode='x unified',
             template='plotly_white'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     with col2:
         # Profit Margin Chart
         if len(chart_df) > 0:
-            chart_df['Profit Margin %'] = (chart_df['Net Profit'] / chart_df['Sales'] * 100).fillna(0)
-
             fig2 = go.Figure()
             fig2.add_trace(go.Scatter(
                 x=chart_df['Date'],
@@ -252,33 +267,34 @@ with tab1:
                 yaxis_title="Profit Margin (%)",
                 template='plotly_white'
             )
-            st.plotly_chart(fig2, use_container_width=True)
+            plotly_chart(fig2, use_container_width=True)
 
-with tab2:
+with tab2, timer.section("figures: analysis"):
     col1, col2 = st.columns(2)
 
     with col1:
         # Sales by Category Pie Chart
-        category_sales = {}
-        for s in data['sales_data']:
-            category_sales[s.category] = category_sales.get(s.category, 0) + s.total_sale
+        category_sales = data['category_sales']
 
         if category_sales:
+            # plotly.express is slow to import, so it loads only once a chart needs it
+            import plotly.express as px
+
             fig3 = px.pie(
-                values=list(category_sales.values()),
-                names=list(category_sales.keys()),
+                values=[c['sales'] for c in category_sales],
+                names=[c['category'] for c in category_sales],
                 title="🍕 Sales Distribution by Category"
             )
             fig3.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig3, use_container_width=True)
+            plotly_chart(fig3, use_container_width=True)
 
     with col2:
         # Expense Type Distribution
-        expense_types = {}
-        for e in data['expenses_data']:
-            expense_types[e.expense_type] = expense_types.get(e.expense_type, 0) + e.amount
+        expense_types = data['expense_types']
 
         if expense_types:
+            import plotly.express as px
+
             fig4 = px.bar(
                 x=list(expense_types.keys()),
                 y=list(expense_types.values()),
@@ -287,30 +303,20 @@ with tab2:
                 color_continuous_scale='Reds'
             )
             fig4.update_layout(xaxis_title="Expense Type", yaxis_title="Amount (TRY)")
-            st.plotly_chart(fig4, use_container_width=True)
+            plotly_chart(fig4, use_container_width=True)
 
-with tab3:
+with tab3, timer.section("figures: categories"):
     # Category Performance Analysis
-    if data['sales_data']:
-        category_analysis = {}
-        for s in data['sales_data']:
-            if s.category not in category_analysis:
-                category_analysis[s.category] = {'sales': 0, 'quantity': 0, 'transactions': 0}
-            category_analysis[s.category]['sales'] += s.total_sale
-            category_analysis[s.category]['quantity'] += s.quantity_sold
-            category_analysis[s.category]['transactions'] += 1
-
+    if data['category_sales']:
         # Create category performance dataframe
-        cat_df = pd.DataFrame([
-            {
-                'Category': cat,
-                'Total Sales (TRY)': data['sales'],
-                'Total Quantity': data['quantity'],
-                'Transactions': data['transactions'],
-                'Avg Sale per Transaction': data['sales'] / data['transactions']
-            }
-            for cat, data in category_analysis.items()
-        ])
+        with timer.section("aggregation: category metrics"):
+            cat_df = category_metrics(data['category_sales']).reset_index().rename(columns={
+                'category': 'Category',
+                'sales': 'Total Sales (TRY)',
+                'quantity': 'Total Quantity',
+                'transactions': 'Transactions',
+                'avg_transaction': 'Avg Sale per Transaction'
+            })[['Category', 'Total Sales (TRY)', 'Total Quantity', 'Transactions', 'Avg Sale per Transaction']]
 
         col1, col2 = st.columns(2)
 
@@ -320,62 +326,48 @@ with tab3:
 
         with col2:
             # Top products
-            product_sales = {}
-            for s in data['sales_data']:
-                product_sales[s.item_name] = product_sales.get(s.item_name, 0) + s.total_sale
-
-            top_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:10]
+            top_products = data['top_products']
 
             if top_products:
+                import plotly.express as px
+
                 fig5 = px.bar(
-                    x=[p[1] for p in top_products],
-                    y=[p[0] for p in top_products],
+                    x=[p['sales'] for p in top_products],
+                    y=[p['item_name'] for p in top_products],
                     orientation='h',
                     title="🥇 Top 10 Products by Sales",
-                    color=[p[1] for p in top_products],
+                    color=[p['sales'] for p in top_products],
                     color_continuous_scale='Viridis'
                 )
                 fig5.update_layout(yaxis={'categoryorder': 'total ascending'})
-                st.plotly_chart(fig5, use_container_width=True)
+                plotly_chart(fig5, use_container_width=True)
+
+with tab4, timer.section("recent activity"):
+    import pandas as pd
 
-with tab4:
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown("### 🧾 Recent Sales")
-        recent_sales = sorted(data['sales_data'], key=lambda x: x.timestamp, reverse=True)[:10]
-
-        if recent_sales:
-            sales_display = []
-            for s in recent_sales:
-                sales_display.append({
-                    'Date': s.timestamp.strftime('%Y-%m-%d %H:%M'),
-                    'Item': s.item_name,
-                    'Category': s.category,
-                    'Qty': s.quantity_sold,
-                    'Total': f"{s.total_sale:.2f} TRY"
-                })
-
-            st.dataframe(pd.DataFrame(sales_display), use_container_width=True)
+        sales_feed = activity_feed('recent_sales_feed', get_sales_page, format_recent_sale)
+
+        if sales_feed['rows']:
+            st.dataframe(pd.DataFrame(sales_feed['rows']), use_container_width=True)
+            if not sales_feed['exhausted']:
+                st.button("⬇️ Load more sales", on_click=load_activity_page,
+                          args=('recent_sales_feed', get_sales_page, format_recent_sale))
         else:
             st.info("No recent sales data available")
 
     with col2:
         st.markdown("### 💸 Recent Expenses")
-        recent_expenses = sorted(data['expenses_data'], key=lambda x: x.timestamp, reverse=True)[:10]
-
-        if recent_expenses:
-            expenses_display = []
-            for e in recent_expenses:
-                expenses_display.append({
-                    'Date': e.timestamp.strftime('%Y-%m-%d %H:%M'),
-                    'Type': e.expense_type,
-                    'Amount': f"{e.amount:.2f} TRY",
-                    'Description': e.description[:30] + "..." if e.description and len(
-                        e.description) > 30 else e.description or ""
-                })
-
-            st.dataframe(pd.DataFrame(expenses_display), use_container_width=True)
+        expenses_feed = activity_feed('recent_expenses_feed', get_expenses_page, format_recent_expense)
+
+        if expenses_feed['rows']:
+            st.dataframe(pd.DataFrame(expenses_feed['rows']), use_container_width=True)
+            if not expenses_feed['exhausted']:
+                st.button("⬇️ Load more expenses", on_click=load_activity_page,
+                          args=('recent_expenses_feed', get_expenses_page, format_recent_expense))
         else:
             st.info("No recent expense data available")
 
@@ -383,45 +375,31 @@ with tab4:
 st.markdown("## 📥 Export Data")
 col1, col2, col3 = st.columns(3)
 
-with col1:
+with col1, timer.section("exports"):
     if st.button("📊 Download Sales Data"):
-        sales_df = pd.DataFrame([{
-            'Date': s.timestamp.strftime('%Y-%m-%d'),
-            'Time': s.timestamp.strftime('%H:%M:%S'),
-            'Item': s.item_name,
-            'Category': s.category,
-            'Quantity': s.quantity_sold,
-            'Price per Unit': s.price_per_unit,
-            'Total Sale': s.total_sale
-        } for s in data['sales_data']])
-
-        csv = sales_df.to_csv(index=False)
-        st.download_button(
-            label="💾 Download Sales CSV",
-            data=csv,
-            file_name=f"kika_sales_{start_date}_to_{end_date}.csv",
-            mime="text/csv"
-        )
+        # Built from a server-side cursor a chunk at a time, but the download
+        # button keeps the finished CSV in memory (see spooled_download)
+        with session_scope() as export_session, \
+                spooled_download(iter_sales_csv(export_session, start_date, end_date)) as csv:
+            st.download_button(
+                label="💾 Download Sales CSV",
+                data=csv,
+                file_name=f"kika_sales_{start_date}_to_{end_date}.csv",
+                mime="text/csv"
+            )
 
-with col2:
+with col2, timer.section("exports"):
     if st.button("💸 Download Expenses Data"):
-        expenses_df = pd.DataFrame([{
-            'Date': e.timestamp.strftime('%Y-%m-%d'),
-            'Time': e.timestamp.strftime('%H:%M:%S'),
-            'Type': e.expense_type,
-            'Amount': e.amount,
-            'Description': e.description or ''
-        } for e in data['expenses_data']])
-
-        csv = expenses_df.to_csv(index=False)
-        st.download_button(
-            label="💾 Download Expenses CSV",
-            data=csv,
-            file_name=f"kika_expenses_{start_date}_to_{end_date}.csv",
-            mime="text/csv"
-        )
+        with session_scope() as export_session, \
+                spooled_download(iter_expenses_csv(export_session, start_date, end_date)) as csv:
+            st.download_button(
+                label="💾 Download Expenses CSV",
+                data=csv,
+                file_name=f"kika_expenses_{start_date}_to_{end_date}.csv",
+                mime="text/csv"
+            )
 
-with col3:
+with col3, timer.section("exports"):
     if st.button("📈 Download Summary Report"):
         summary_data = {
             'Metric': ['Total Sales', 'Total Expenses', 'Net Profit', 'ROI (%)', 'Total Transactions',
@@ -431,11 +409,13 @@ with col3:
                 f"{data['total_expenses']:.2f} TRY",
                 f"{data['net_profit']:.2f} TRY",
                 f"{data['roi']:.2f}%",
-                len(data['sales_data']),
-                f"{data['total_sales'] / max(1, len(data['sales_data'])):.2f} TRY"
+                data['transactions'],
+                f"{data['total_sales'] / max(1, data['transactions']):.2f} TRY"
             ]
         }
 
+        import pandas as pd
+
         summary_df = pd.DataFrame(summary_data)
         csv = summary_df.to_csv(index=False)
         st.download_button(
@@ -449,8 +429,13 @@ with col3:
 st.markdown("---")
 st.markdown(f"*Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Data range: {start_date} to {end_date}*")
 
-# Properly close session
-try:
-    session.close()
-except Exception:
-    pass
\ No newline at end of file
+# Render timing for this rerun
+report = timer.finish()
+with st.sidebar.expander(f"⏱️ Render Timing · {report['total_s'] * 1000:.0f} ms"):
+    import pandas as pd
+
+    st.dataframe(pd.DataFrame(timing_rows(report)), use_container_width=True, hide_index=True)
+    if report['profile']:
+        st.code(report['profile'], language="text")
+    else:
+        st.caption("Add ?profile=1 to the URL to profile a rerun.")
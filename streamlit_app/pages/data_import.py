@@ -0,0 +1,66 @@
+import streamlit as st
+from app.database import get_engine
+from app.importer import import_file, DEFAULT_CHUNK_SIZE
+from app.query_stats import set_current_page
+from app.background import start_background_threads
+
+set_current_page("data_import")
+start_background_threads()
+
+st.title("📥 Import Historical Data")
+st.markdown("*Bulk-load sales or expenses from a CSV or Parquet export*")
+
+kind = st.selectbox("Data Type", ["sales", "expenses"], format_func=str.title)
+
+if kind == "sales":
+    st.caption("Columns: item_name, category, price_per_unit, quantity_sold, timestamp, "
+               "and optionally cost and currency. total_sale and profit are calculated for you.")
+else:
+    st.caption("Columns: expense_type, amount, timestamp, and optionally description and currency.")
+
+uploaded_file = st.file_uploader("Upload file", type=["csv", "parquet"])
+chunk_size = st.number_input("Rows per chunk", min_value=1_000, max_value=500_000,
+                             value=DEFAULT_CHUNK_SIZE, step=10_000)
+month_first = st.checkbox("Dates like 05/01/2024 are month first (MM/DD/YYYY)", value=False,
+                          help="ISO dates such as 2024-01-05 are always read as year-month-day")
+
+if uploaded_file and st.button("🚀 Start Import"):
+    progress = st.empty()
+    committed = {'rows_loaded': 0, 'rows_rejected': 0}
+
+    def show_progress(report):
+        committed.update(report)
+        progress.info(f"⏳ {report['rows_loaded']:,} rows loaded, {report['rows_rejected']:,} rejected "
+                      f"({report['rows_per_second']:,.0f} rows/s)")
+
+    try:
+        report = import_file(get_engine(), uploaded_file, kind, chunk_size=int(chunk_size),
+                             on_progress=show_progress, dayfirst=not month_first)
+    except Exception as e:
+        progress.empty()
+        st.error(f"❌ Import failed: {e}")
+        if committed['rows_loaded']:
+            # Each chunk commits on its own, so these stay in the database
+            st.warning(f"⚠️ {committed['rows_loaded']:,} rows from earlier chunks were already imported "
+                       f"({committed['rows_rejected']:,} rejected). Remove them from the file before retrying.")
+    else:
+        progress.empty()
+        st.success(f"✅ Imported {report['rows_loaded']:,} {kind} rows in {report['seconds']:.1f}s")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("📊 Rows Loaded", f"{report['rows_loaded']:,}")
+        with col2:
+            st.metric("⚠️ Rows Rejected", f"{report['rows_rejected']:,}")
+        with col3:
+            st.metric("⚡ Throughput", f"{report['rows_per_second']:,.0f} rows/s")
+
+        if not report['rejected'].empty:
+            st.markdown("### ⚠️ Rejected Rows")
+            st.dataframe(report['rejected'].head(100), use_container_width=True)
+            st.download_button(
+                label="💾 Download Rejected Rows",
+                data=report['rejected'].to_csv(index=False),
+                file_name=f"kika_{kind}_import_rejects.csv",
+                mime="text/csv"
+            )
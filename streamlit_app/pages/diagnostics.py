@@ -0,0 +1,125 @@
+import streamlit as st
+import pandas as pd
+from app.config import settings
+from app.database import get_engine, query_stats, pool_stats
+from app.query_stats import set_current_page, explain
+from app.background import start_background_threads
+
+st.set_page_config(page_title="Diagnostics", layout="wide")
+set_current_page("diagnostics")
+start_background_threads()
+
+st.title("🩺 Diagnostics")
+st.markdown("*Connection pool and statement timings for this server process since start-up or the last reset*")
+
+# Connection pool, from pool events
+get_engine()
+st.markdown("### 🏊 Connection Pool")
+pool = pool_stats.snapshot()
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    if pool['strategy'] == 'queue':
+        st.metric("🔌 Checked Out", f"{pool['checked_out']} / {pool['size'] + pool['max_overflow']}",
+                  help=f"Peak {pool['peak_checked_out']}")
+    else:
+        st.metric("🔌 Checked Out", f"{pool['checked_out']}", help=f"Peak {pool['peak_checked_out']}")
+with col2:
+    st.metric("🌊 Overflow", f"{pool['overflow']} / {pool['max_overflow']}")
+with col3:
+    st.metric("💤 Idle", f"{pool['idle']}")
+with col4:
+    st.metric("⌛ Checkout Timeouts", f"{pool['timeouts']:,}")
+
+if pool['strategy'] == 'queue':
+    st.caption(f"QueuePool: size {pool['size']}, max overflow {pool['max_overflow']}, "
+               f"timeout {settings.DB_POOL_TIMEOUT:.0f} s, recycle {settings.DB_POOL_RECYCLE} s")
+else:
+    st.caption("NullPool: a new connection per checkout, closed on check-in")
+st.caption(f"{pool['connects']:,} connection(s) opened, {pool['closed']:,} closed, "
+           f"{pool['invalidated']:,} invalidated, {pool['checkouts']:,} checkouts; "
+           f"{pool['open']} open, the oldest for {pool['oldest_open_s']:.0f} s")
+
+timings = pd.DataFrame([{
+    'Measure': label,
+    'Samples': pool[key]['count'],
+    'Mean (ms)': pool[key]['mean_s'] * 1000,
+    'p50 (ms)': pool[key]['p50_s'] * 1000,
+    'p95 (ms)': pool[key]['p95_s'] * 1000,
+    'p99 (ms)': pool[key]['p99_s'] * 1000,
+    'Max (ms)': pool[key]['max_s'] * 1000,
+} for key, label in [('wait', 'Checkout wait'), ('hold', 'Held by caller'), ('lifetime', 'Connection lifetime')]])
+st.dataframe(timings.round(2), use_container_width=True, hide_index=True)
+
+if st.button("🧹 Reset Pool Statistics"):
+    pool_stats.reset()
+    st.rerun()
+
+st.markdown("### 🧾 Statements")
+if not settings.QUERY_STATS:
+    st.info("Query statistics are off. Set QUERY_STATS=true to collect them.")
+    st.stop()
+
+stats = query_stats.snapshot()
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("🧾 Distinct Statements", f"{len(stats):,}")
+with col2:
+    st.metric("🔁 Executions", f"{sum(s['calls'] for s in stats):,}")
+with col3:
+    st.metric("⏱️ Total DB Time", f"{sum(s['total_s'] for s in stats):.2f} s")
+with col4:
+    st.metric("🐢 Slow Threshold", f"{settings.SLOW_QUERY_MS:.0f} ms")
+
+st.caption(f"Slow query log: {settings.SLOW_QUERY_LOG or 'off (set SLOW_QUERY_LOG to a file path)'}")
+
+if st.button("🧹 Reset Statistics"):
+    query_stats.reset()
+    st.rerun()
+
+if not stats:
+    st.info("No statements recorded yet. Open the dashboard or overview first.")
+    st.stop()
+
+# Top statements by total time
+st.markdown("### 🔝 Top Statements by Total Time")
+top = pd.DataFrame([{
+    'Fingerprint': s['fingerprint'],
+    'Statement': s['statement'][:120],
+    'Calls': s['calls'],
+    'Total (ms)': s['total_s'] * 1000,
+    'Mean (ms)': s['mean_s'] * 1000,
+    'p50 (ms)': s['p50_s'] * 1000,
+    'p95 (ms)': s['p95_s'] * 1000,
+    'p99 (ms)': s['p99_s'] * 1000,
+    'Max (ms)': s['max_s'] * 1000,
+    'Rows': s['rows'],
+    'Pages': ', '.join(f"{page} ({calls})" for page, calls in s['pages'].items()),
+} for s in stats])
+st.dataframe(top.round(2), use_container_width=True, hide_index=True)
+
+# EXPLAIN on demand
+st.markdown("### 🔬 Query Plan")
+by_fingerprint = {s['fingerprint']: s for s in stats}
+selected = st.selectbox(
+    "Statement",
+    list(by_fingerprint),
+    format_func=lambda key: f"{key} · {by_fingerprint[key]['statement'][:90]}"
+)
+st.code(by_fingerprint[selected]['statement'], language="sql")
+
+label = "EXPLAIN ANALYZE" if get_engine().dialect.name == 'postgresql' else "EXPLAIN QUERY PLAN"
+if st.button(f"🔬 Run {label}"):
+    sample = query_stats.sample(selected)
+    if sample is None:
+        st.warning("No single execution of this statement was captured (batch inserts only).")
+    else:
+        try:
+            with get_engine().connect() as connection:
+                plan = explain(connection, *sample)
+        except Exception as e:
+            st.error(f"❌ Could not explain this statement: {e}")
+        else:
+            st.caption(f"Replayed with the last captured parameters: {sample[1]}")
+            st.code(plan, language="text")
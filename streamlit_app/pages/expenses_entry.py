@@ -1,10 +1,25 @@
 import streamlit as st
 from datetime import datetime
-from app.database import SessionLocal
+from app.config import settings
+from app.database import session_scope
 from app.crud import create_expense
+from app.query_stats import set_current_page
+from app.background import start_background_threads
+from app.write_queue import enqueue, queue_status
+
+set_current_page("expenses_entry")
+start_background_threads()
 
 st.title("💸 Record Daily Expense")
 
+if settings.WRITE_BEHIND:
+    status = queue_status()
+    if status['pending']:
+        st.caption(f"⏳ {status['pending']} entr(ies) waiting to be written, oldest from {status['oldest']}")
+    if status['dead']:
+        st.error(f"❌ {status['dead']} entr(ies) were rejected by the database and not written: "
+                 f"{status['dead_error']}. Fix the cause, then run `python -m app.write_queue requeue`.")
+
 with st.form("expense_form"):
     expense_type = st.text_input("Expense Type", placeholder="e.g. Transport, Items, Electricity")
     amount = st.number_input("Amount (TRY)", min_value=0.0, step=1.0)
@@ -14,17 +29,19 @@ with st.form("expense_form"):
     submitted = st.form_submit_button("✅ Save Expense")
     if submitted:
         try:
-            session = SessionLocal()
             dt = datetime.combine(timestamp, datetime.min.time())
-            create_expense(
-                session=session,
-                expense_type=expense_type,
-                amount=amount,
-                description=description,
-                timestamp=dt
-            )
+            expense = {
+                'expense_type': expense_type,
+                'amount': amount,
+                'description': description,
+                'timestamp': dt,
+            }
+            if settings.WRITE_BEHIND:
+                # Written by the background flusher; survives a slow or offline database
+                enqueue('expense', expense)
+            else:
+                with session_scope() as session:
+                    create_expense(session=session, **expense)
             st.success("✅ Expense recorded successfully!")
         except Exception as e:
             st.error(f"❌ Error saving expense: {e}")
-        finally:
-            session.close()
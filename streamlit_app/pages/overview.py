@@ -1,15 +1,24 @@
 # streamlit_app/pages/Overview.py
 
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta
-from app.database import SessionLocal
-from app.crud import get_sales_in_range, get_expenses_in_range
-import pandas as pd
-import numpy as np
+from datetime import date, datetime, timedelta
+from app.database import session_scope
+from app.cache import overview_cache
+from app.crud import get_data_version
+from app.snapshots import analytics_snapshot
+from app.reports import build_overview_data
+from app.forecasting import FORECAST_LOOKBACK_DAYS
+from app.utils.analytics import WEEKDAY_NAMES
+from app.query_stats import set_current_page
+from app.background import start_background_threads
+from app.profiling import RenderTimer, profiling_requested, timing_rows
 
 st.set_page_config(page_title="Business Overview", layout="wide")
+set_current_page("overview")
+start_background_threads()
+# Per-section timing of this rerun, shown at the bottom of the sidebar
+timer = RenderTimer("overview", profile=profiling_requested(st.query_params))
+plotly_chart = timer.timed("st.plotly_chart", st.plotly_chart)
 
 # Custom styling
 st.markdown("""
@@ -36,9 +45,6 @@ st.markdown(
     '<div class="overview-header"><h1>📊 Business Intelligence Overview</h1><p>Comprehensive analytics and insights for strategic decision making</p></div>',
     unsafe_allow_html=True)
 
-# Setup DB session
-session = SessionLocal()
-
 # Sidebar controls
 with st.sidebar:
     st.markdown("## 🎛️ Analysis Controls")
@@ -74,48 +80,43 @@ with st.sidebar:
 
 
 # Get data
-@st.cache_data(ttl=300)
 def get_comprehensive_data(start_date, end_date, comp_start=None, comp_end=None):
-    # Current period data
-    sales = get_sales_in_range(session, start_date, end_date)
-    expenses = get_expenses_in_range(session, start_date, end_date)
-
-    current_data = {
-        'sales': sales,
-        'expenses': expenses,
-        'total_sales': sum(s.total_sale for s in sales),
-        'total_expenses': sum(e.amount for e in expenses),
-    }
-    current_data['net_profit'] = current_data['total_sales'] - current_data['total_expenses']
-
-    # Comparison period data
-    comparison_data = None
-    if comp_start and comp_end:
-        comp_sales = get_sales_in_range(session, comp_start, comp_end)
-        comp_expenses = get_expenses_in_range(session, comp_start, comp_end)
-        comparison_data = {
-            'sales': comp_sales,
-            'expenses': comp_expenses,
-            'total_sales': sum(s.total_sale for s in comp_sales),
-            'total_expenses': sum(e.amount for e in comp_expenses),
-        }
-        comparison_data['net_profit'] = comparison_data['total_sales'] - comparison_data['total_expenses']
-
-    return current_data, comparison_data
-
-
-current_data, comparison_data = get_comprehensive_data(
-    start_date, end_date,
-    comparison_start if enable_comparison else None,
-    comparison_end if enable_comparison else None
-)
+    # Cached until a write touches a day in either period, then recomputed
+    with session_scope() as session:
+        snapshot = analytics_snapshot()
+        version = (
+            get_data_version(session, start_date, end_date),
+            get_data_version(session, comp_start, comp_end) if comp_start and comp_end else None,
+            # A new snapshot changes the breakdowns read from it
+            snapshot['id'] if snapshot else None,
+            # The forecast starts today whatever the period
+            date.today()
+        )
+        return overview_cache.get_or_compute(
+            (start_date, end_date, comp_start, comp_end), version,
+            lambda: build_overview_data(session, start_date, end_date, comp_start, comp_end)
+        )
+
+
+try:
+    with timer.section("data fetch + aggregation"):
+        current_data, comparison_data = get_comprehensive_data(
+            start_date, end_date,
+            comparison_start if enable_comparison else None,
+            comparison_end if enable_comparison else None
+        )
+except Exception as e:
+    st.error(f"Database connection failed: {str(e)}")
+    # st.stop() ends the script here, so stop the clock (and profiler) first
+    timer.finish()
+    st.stop()
 
 # Executive Summary
 st.markdown("## 🎯 Executive Summary")
 
 col1, col2, col3, col4 = st.columns(4)
 
-with col1:
+with col1, timer.section("KPIs"):
     delta_sales = None
     if comparison_data:
         delta_sales = current_data['total_sales'] - comparison_data['total_sales']
@@ -124,7 +125,7 @@ with col1:
 
     st.metric("💰 Total Sales", f"{current_data['total_sales']:.2f} TRY", delta=delta_sales)
 
-with col2:
+with col2, timer.section("KPIs"):
     delta_expenses = None
     if comparison_data:
         delta_expenses = current_data['total_expenses'] - comparison_data['total_expenses']
@@ -134,7 +135,7 @@ with col2:
 
     st.metric("💸 Total Expenses", f"{current_data['total_expenses']:.2f} TRY", delta=delta_expenses)
 
-with col3:
+with col3, timer.section("KPIs"):
     delta_profit = None
     if comparison_data:
         delta_profit = current_data['net_profit'] - comparison_data['net_profit']
@@ -146,11 +147,11 @@ with col3:
 
     st.metric("📈 Net Profit", f"{current_data['net_profit']:.2f} TRY", delta=delta_profit)
 
-with col4:
-    avg_transaction = current_data['total_sales'] / max(1, len(current_data['sales']))
+with col4, timer.section("KPIs"):
+    avg_transaction = current_data['total_sales'] / max(1, current_data['transactions'])
     delta_avg = None
     if comparison_data:
-        comp_avg = comparison_data['total_sales'] / max(1, len(comparison_data['sales']))
+        comp_avg = comparison_data['total_sales'] / max(1, comparison_data['transactions'])
         delta_avg = avg_transaction - comp_avg
         delta_pct = (delta_avg / comp_avg * 100) if comp_avg > 0 else 0
         delta_avg = f"{delta_pct:+.1f}%"
@@ -160,34 +161,22 @@ with col4:
 # Advanced Analytics
 st.markdown("## 🔬 Advanced Analytics")
 
+if current_data['snapshot_at']:
+    st.caption(f"🦆 Hourly, weekday, category and item breakdowns come from the analytics snapshot "
+               f"taken at {current_data['snapshot_at']}")
+
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["📈 Trends", "🎯 Performance", "🔍 Deep Dive", "🚀 Insights", "📊 Forecasting"])
 
-with tab1:
+with tab1, timer.section("figures: trends"):
+    # plotly, numpy and pandas load on first use rather than with the page,
+    # so the header and sidebar are sent first and the cost shows up in the timings
+    import plotly.graph_objects as go
+
     col1, col2 = st.columns(2)
 
     with col1:
         # Daily trend analysis
-        daily_sales = {}
-        daily_expenses = {}
-
-        for s in current_data['sales']:
-            date = s.timestamp.date()
-            daily_sales[date] = daily_sales.get(date, 0) + s.total_sale
-
-        for e in current_data['expenses']:
-            date = e.timestamp.date()
-            daily_expenses[date] = daily_expenses.get(date, 0) + e.amount
-
-        # Create comprehensive daily dataframe
-        all_dates = pd.date_range(start=start_date, end=end_date, freq='D').date
-        trend_df = pd.DataFrame({
-            'Date': all_dates,
-            'Sales': [daily_sales.get(d, 0) for d in all_dates],
-            'Expenses': [daily_expenses.get(d, 0) for d in all_dates],
-        })
-        trend_df['Net Profit'] = trend_df['Sales'] - trend_df['Expenses']
-        trend_df['Cumulative Sales'] = trend_df['Sales'].cumsum()
-        trend_df['Moving Avg (7d)'] = trend_df['Sales'].rolling(window=min(7, len(trend_df))).mean()
+        trend_df = current_data['trend']
 
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=trend_df['Date'], y=trend_df['Sales'],
@@ -201,7 +190,7 @@ with tab1:
             yaxis_title="Sales (TRY)",
             hovermode='x unified'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     with col2:
         # Cumulative performance
@@ -215,92 +204,45 @@ with tab1:
             xaxis_title="Date",
             yaxis_title="Cumulative Sales (TRY)"
         )
-        st.plotly_chart(fig2, use_container_width=True)
+        plotly_chart(fig2, use_container_width=True)
+
+with tab2, timer.section("figures: performance"):
+    import plotly.graph_objects as go
+    import numpy as np
 
-with tab2:
     col1, col2 = st.columns(2)
 
     with col1:
         # Category performance with detailed metrics
-        category_metrics = {}
-        for s in current_data['sales']:
-            cat = s.category
-            if cat not in category_metrics:
-                category_metrics[cat] = {
-                    'sales': 0, 'quantity': 0, 'transactions': 0,
-                    'revenue_share': 0, 'items': set()
-                }
-            category_metrics[cat]['sales'] += s.total_sale
-            category_metrics[cat]['quantity'] += s.quantity_sold
-            category_metrics[cat]['transactions'] += 1
-            category_metrics[cat]['items'].add(s.item_name)
-
-        # Calculate revenue share
-        total_sales = sum(m['sales'] for m in category_metrics.values())
-        for cat in category_metrics:
-            category_metrics[cat]['revenue_share'] = (
-                        category_metrics[cat]['sales'] / total_sales * 100) if total_sales > 0 else 0
-            category_metrics[cat]['unique_items'] = len(category_metrics[cat]['items'])
-
-        if category_metrics:
+        category_metrics = current_data['category_metrics']
+
+        if not category_metrics.empty:
             # Performance heatmap
-            cats = list(category_metrics.keys())
             metrics = ['Sales', 'Transactions', 'Avg Transaction', 'Revenue Share %']
-
-            heatmap_data = []
-            for cat in cats:
-                data = category_metrics[cat]
-                avg_transaction = data['sales'] / max(1, data['transactions'])
-                heatmap_data.append([
-                    data['sales'],
-                    data['transactions'],
-                    avg_transaction,
-                    data['revenue_share']
-                ])
+            heatmap_data = category_metrics[
+                ['sales', 'transactions', 'avg_transaction', 'revenue_share']
+            ].to_numpy(dtype=float).T
 
             fig3 = go.Figure(data=go.Heatmap(
-                z=np.array(heatmap_data).T,
-                x=cats,
+                z=heatmap_data,
+                x=list(category_metrics.index),
                 y=metrics,
                 colorscale='RdYlGn',
-                text=np.round(np.array(heatmap_data).T, 2),
+                text=np.round(heatmap_data, 2),
                 texttemplate="%{text}",
                 textfont={"size": 10}
             ))
 
             fig3.update_layout(title="🎯 Category Performance Heatmap")
-            st.plotly_chart(fig3, use_container_width=True)
+            plotly_chart(fig3, use_container_width=True)
 
     with col2:
-        # Top performers analysis
-        item_performance = {}
-        for s in current_data['sales']:
-            item = s.item_name
-            if item not in item_performance:
-                item_performance[item] = {
-                    'sales': 0, 'quantity': 0, 'transactions': 0,
-                    'category': s.category, 'avg_price': 0
-                }
-            item_performance[item]['sales'] += s.total_sale
-            item_performance[item]['quantity'] += s.quantity_sold
-            item_performance[item]['transactions'] += 1
-            item_performance[item]['avg_price'] = s.price_per_unit
-
         # Top 10 items by sales
-        top_items = sorted(item_performance.items(), key=lambda x: x[1]['sales'], reverse=True)[:10]
-
-        if top_items:
-            items_df = pd.DataFrame([
-                {
-                    'Item': item[0],
-                    'Category': item[1]['category'],
-                    'Sales (TRY)': item[1]['sales'],
-                    'Quantity Sold': item[1]['quantity'],
-                    'Transactions': item[1]['transactions'],
-                    'Avg Price': item[1]['avg_price']
-                }
-                for item in top_items
-            ])
+        items_df = current_data['top_items']
+
+        if not items_df.empty:
+            # plotly.express is slow to import, so it loads only once a chart needs it
+            import plotly.express as px
 
             fig4 = px.treemap(
                 items_df,
@@ -310,22 +252,21 @@ with tab2:
                 color='Sales (TRY)',
                 color_continuous_scale='Viridis'
             )
-            st.plotly_chart(fig4, use_container_width=True)
+            plotly_chart(fig4, use_container_width=True)
+
+with tab3, timer.section("figures: deep dive"):
+    import plotly.graph_objects as go
 
-with tab3:
     col1, col2 = st.columns(2)
 
     with col1:
         # Hourly analysis
         st.markdown("### ⏰ Peak Hours Analysis")
-        hourly_sales = {}
-        for s in current_data['sales']:
-            hour = s.timestamp.hour
-            hourly_sales[hour] = hourly_sales.get(hour, 0) + s.total_sale
+        hourly_sales = current_data['hourly_sales']
 
-        if hourly_sales:
+        if hourly_sales.any():
             hours = list(range(24))
-            sales_by_hour = [hourly_sales.get(h, 0) for h in hours]
+            sales_by_hour = hourly_sales.tolist()
 
             fig5 = go.Figure()
             fig5.add_trace(go.Bar(
@@ -338,7 +279,7 @@ with tab3:
             ))
 
             # Add peak hour indicator
-            peak_hour = max(hourly_sales.items(), key=lambda x: x[1])[0] if hourly_sales else 0
+            peak_hour = hourly_sales.idxmax()
             fig5.add_vline(x=peak_hour, line_dash="dash", line_color="red",
                            annotation_text=f"Peak: {peak_hour}:00")
 
@@ -347,25 +288,20 @@ with tab3:
                 xaxis_title="Hour of Day",
                 yaxis_title="Sales (TRY)"
             )
-            st.plotly_chart(fig5, use_container_width=True)
+            plotly_chart(fig5, use_container_width=True)
 
     with col2:
         # Day of week analysis
         st.markdown("### 📅 Weekly Pattern Analysis")
-        weekday_sales = {}
-        weekday_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-
-        for s in current_data['sales']:
-            weekday = s.timestamp.weekday()
-            weekday_sales[weekday] = weekday_sales.get(weekday, 0) + s.total_sale
+        weekday_sales = current_data['weekday_sales']
 
-        if weekday_sales:
-            weekday_data = [weekday_sales.get(i, 0) for i in range(7)]
+        if weekday_sales.any():
+            weekday_data = weekday_sales.tolist()
 
             fig6 = go.Figure()
             fig6.add_trace(go.Scatterpolar(
                 r=weekday_data,
-                theta=weekday_names,
+                theta=WEEKDAY_NAMES,
                 fill='toself',
                 name='Sales by Weekday'
             ))
@@ -376,14 +312,14 @@ with tab3:
                 ),
                 title="🗓️ Weekly Sales Pattern"
             )
-            st.plotly_chart(fig6, use_container_width=True)
+            plotly_chart(fig6, use_container_width=True)
 
-with tab4:
+with tab4, timer.section("figures: insights"):
     # Business insights and recommendations
     st.markdown("### 💡 Key Business Insights")
 
     # Calculate various metrics for insights
-    total_transactions = len(current_data['sales'])
+    total_transactions = current_data['transactions']
     avg_transaction = current_data['total_sales'] / max(1, total_transactions)
     profit_margin = (current_data['net_profit'] / current_data['total_sales'] * 100) if current_data[
                                                                                             'total_sales'] > 0 else 0
@@ -424,17 +360,16 @@ with tab4:
 
     with col1:
         st.markdown("#### 📈 Growth Opportunities")
-        if category_metrics:
-            top_category = max(category_metrics.items(), key=lambda x: x[1]['sales'])[0]
+        if not category_metrics.empty:
+            top_category = category_metrics['sales'].idxmax()
             st.write(f"• **Expand {top_category} category** - Your best performer")
 
-            low_performers = [cat for cat, data in category_metrics.items()
-                              if data['revenue_share'] < 10]
+            low_performers = category_metrics.index[category_metrics['revenue_share'] < 10].tolist()
             if low_performers:
                 st.write(f"• **Review underperforming categories**: {', '.join(low_performers)}")
 
-        if hourly_sales:
-            peak_hour = max(hourly_sales.items(), key=lambda x: x[1])[0]
+        if hourly_sales.any():
+            peak_hour = hourly_sales.idxmax()
             st.write(f"• **Optimize staffing around {peak_hour}:00** - Peak sales hour")
 
     with col2:
@@ -452,29 +387,20 @@ with tab4:
         st.write("• **Digital payment options** - Reduce cash handling costs")
         st.write("• **Inventory optimization** - Track fast/slow-moving items")
 
-with tab5:
-    # Simple forecasting based on trends
+with tab5, timer.section("figures: forecasting"):
+    # Trend plus day-of-week model, fitted once per data version (app/forecasting.py)
     st.markdown("### 🔮 Sales Forecasting")
+    forecast = current_data['forecast']
 
-    if len(trend_df) > 7:  # Need at least a week of data
-        # Simple linear regression for forecasting
-        from sklearn.linear_model import LinearRegression
+    if forecast:
+        import plotly.graph_objects as go
         import numpy as np
+        import pandas as pd
 
-        # Prepare data for forecasting
-        days = np.arange(len(trend_df)).reshape(-1, 1)
-        sales_values = trend_df['Sales'].values
-
-        # Fit model
-        model = LinearRegression()
-        model.fit(days, sales_values)
-
-        # Predict next 7 days
-        future_days = np.arange(len(trend_df), len(trend_df) + 7).reshape(-1, 1)
-        future_predictions = model.predict(future_days)
+        future_predictions = np.asarray(forecast['predictions'])
 
         # Create forecast visualization
-        forecast_dates = pd.date_range(start=end_date + timedelta(days=1), periods=7, freq='D')
+        forecast_dates = pd.to_datetime(forecast['dates'])
 
         fig7 = go.Figure()
 
@@ -501,28 +427,33 @@ with tab5:
             xaxis_title="Date",
             yaxis_title="Predicted Sales (TRY)"
         )
-        st.plotly_chart(fig7, use_container_width=True)
+        plotly_chart(fig7, use_container_width=True)
 
         # Forecast summary
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("🎯 Next 7 Days Total", f"{sum(future_predictions):.2f} TRY")
+            st.metric("🎯 Next 7 Days Total", f"{future_predictions.sum():.2f} TRY")
         with col2:
-            st.metric("📊 Daily Average", f"{np.mean(future_predictions):.2f} TRY")
+            st.metric("📊 Daily Average", f"{future_predictions.mean():.2f} TRY")
         with col3:
-            current_avg = trend_df['Sales'].mean()
-            forecast_avg = np.mean(future_predictions)
+            current_avg = forecast['history_avg']
+            forecast_avg = future_predictions.mean()
             growth = ((forecast_avg - current_avg) / current_avg * 100) if current_avg > 0 else 0
             st.metric("📈 Projected Growth", f"{growth:+.1f}%")
+
+        weekday_effect = pd.Series(forecast['model']['weekday_effect'], index=WEEKDAY_NAMES)
+        st.caption(f"Fitted to the last {FORECAST_LOOKBACK_DAYS} days · "
+                   f"trend: {forecast['model']['trend_per_day']:+.2f} TRY/day · "
+                   f"strongest day: {weekday_effect.idxmax()} · weakest day: {weekday_effect.idxmin()}")
     else:
-        st.info("📊 Need at least 7 days of data for reliable forecasting")
+        st.info("📊 Need at least 3 weeks of completed days for reliable forecasting")
 
 # Data Export Section
 st.markdown("## 📥 Export Comprehensive Reports")
 
 col1, col2, col3 = st.columns(3)
 
-with col1:
+with col1, timer.section("exports"):
     if st.button("📊 Export Detailed Analysis"):
         # Create comprehensive analysis report
         analysis_data = []
@@ -548,14 +479,15 @@ with col1:
         })
 
         # Add category breakdown
-        if category_metrics:
-            for cat, data in category_metrics.items():
-                analysis_data.append({
-                    'Report Section': 'Category Analysis',
-                    'Metric': f'{cat} Sales',
-                    'Value': data['sales'],
-                    'Period': f"{start_date} to {end_date}"
-                })
+        for cat, cat_sales in category_metrics['sales'].items():
+            analysis_data.append({
+                'Report Section': 'Category Analysis',
+                'Metric': f'{cat} Sales',
+                'Value': cat_sales,
+                'Period': f"{start_date} to {end_date}"
+            })
+
+        import pandas as pd
 
         analysis_df = pd.DataFrame(analysis_data)
         csv = analysis_df.to_csv(index=False)
@@ -566,12 +498,9 @@ with col1:
             mime="text/csv"
         )
 
-with col2:
+with col2, timer.section("exports"):
     if st.button("📈 Export Trend Data"):
-        trend_export = trend_df.copy()
-        trend_export['Profit Margin %'] = (trend_export['Net Profit'] / trend_export['Sales'] * 100).fillna(0)
-
-        csv = trend_export.to_csv(index=False)
+        csv = trend_df.to_csv(index=False)
         st.download_button(
             label="💾 Download Trend Data",
             data=csv,
@@ -579,21 +508,18 @@ with col2:
             mime="text/csv"
         )
 
-with col3:
+with col3, timer.section("exports"):
     if st.button("🎯 Export Performance Metrics"):
-        if category_metrics:
-            perf_data = []
-            for cat, data in category_metrics.items():
-                perf_data.append({
-                    'Category': cat,
-                    'Total Sales (TRY)': data['sales'],
-                    'Total Transactions': data['transactions'],
-                    'Average Transaction (TRY)': data['sales'] / max(1, data['transactions']),
-                    'Revenue Share (%)': data['revenue_share'],
-                    'Unique Items': data['unique_items']
-                })
-
-            perf_df = pd.DataFrame(perf_data)
+        if not category_metrics.empty:
+            perf_df = category_metrics.reset_index().rename(columns={
+                'category': 'Category',
+                'sales': 'Total Sales (TRY)',
+                'transactions': 'Total Transactions',
+                'avg_transaction': 'Average Transaction (TRY)',
+                'revenue_share': 'Revenue Share (%)',
+                'unique_items': 'Unique Items'
+            })[['Category', 'Total Sales (TRY)', 'Total Transactions', 'Average Transaction (TRY)',
+                'Revenue Share (%)', 'Unique Items']]
             csv = perf_df.to_csv(index=False)
             st.download_button(
                 label="💾 Download Performance Data",
@@ -607,4 +533,13 @@ st.markdown("---")
 st.markdown(
     f"*Analysis generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Period: {start_date} to {end_date}*")
 
-session.close()
\ No newline at end of file
+# Render timing for this rerun
+report = timer.finish()
+with st.sidebar.expander(f"⏱️ Render Timing · {report['total_s'] * 1000:.0f} ms"):
+    import pandas as pd
+
+    st.dataframe(pd.DataFrame(timing_rows(report)), use_container_width=True, hide_index=True)
+    if report['profile']:
+        st.code(report['profile'], language="text")
+    else:
+        st.caption("Add ?profile=1 to the URL to profile a rerun.")
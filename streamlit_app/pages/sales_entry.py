@@ -1,9 +1,16 @@
 import streamlit as st
 from datetime import datetime
-from app.database import SessionLocal
-from app.crud import create_sale
+from app.config import settings
+from app.database import session_scope
+from app.crud import create_sale, save_product
+from app.query_stats import set_current_page
+from app.background import start_background_threads
+from app.write_queue import enqueue, queue_status, load_catalog, expire_catalog
 
 
+set_current_page("sales_entry")
+start_background_threads()
+
 st.title("🛒 Record Daily Sale")
 
 # Setup session state
@@ -12,15 +19,68 @@ if "show_total_sale" not in st.session_state:
 if "calculated_sale" not in st.session_state:
     st.session_state.calculated_sale = 0.0
 
+if settings.WRITE_BEHIND:
+    status = queue_status()
+    if status['pending']:
+        st.caption(f"⏳ {status['pending']} entr(ies) waiting to be written, oldest from {status['oldest']}")
+    if status['dead']:
+        st.error(f"❌ {status['dead']} entr(ies) were rejected by the database and not written: "
+                 f"{status['dead_error']}. Fix the cause, then run `python -m app.write_queue requeue`.")
+
+# The last-known catalog, so reruns don't go to the database each time
+try:
+    catalog = load_catalog()
+    products = {p['name']: p for p in catalog['products']}
+    categories = catalog['categories']
+    catalog_loaded = True
+    if catalog['stale']:
+        st.warning(f"⚠️ The database is not reachable right now. Showing the product catalog "
+                   f"from {catalog['fetched_at']:%Y-%m-%d %H:%M} UTC.")
+except Exception as e:
+    if not settings.WRITE_BEHIND:
+        st.error(f"❌ Could not load the product catalog: {e}")
+        st.stop()
+    # Sales can still be queued; they are matched to products by name when written
+    products, categories, catalog_loaded = {}, [], False
+    st.warning("⚠️ The database is not reachable right now. Sales are kept locally and written once it is back.")
+
+# Outside the form so the fields below follow the chosen product. Typing
+# filters the catalog; a name that isn't in it starts a new product.
+item_name = st.selectbox(
+    "🔎 Product",
+    list(products),
+    index=None,
+    placeholder="Type to search, or enter a new product name",
+    accept_new_options=True
+)
+
+if not item_name:
+    st.info("Pick a product to record a sale.")
+    st.stop()
+
+item_name = item_name.strip()
+product = products.get(item_name)
+if product:
+    st.caption(f"🏷️ {product['category']} · unit cost {product['unit_cost']:.2f} TRY")
+else:
+    st.caption("🆕 New product: it will be added to the catalog with this sale.")
+
 with st.form("sales_form"):
-    item_name = st.text_input("Item Name")
-    category = st.text_input("Category", value="Food")
+    if product:
+        category = product['category']
+    else:
+        category = st.selectbox("Category", categories or ["Food"], accept_new_options=True)
 
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
-        price = st.number_input("Price per unit (TRY)", min_value=0.0, step=0.5)
+        # Keyed per product so switching products resets the defaults
+        price = st.number_input("Price per unit (TRY)", min_value=0.0, step=0.5,
+                                value=float((product or {}).get('unit_price') or 0.0), key=f"price_{item_name}")
     with col2:
         quantity = st.number_input("Quantity sold", min_value=1, step=1)
+    with col3:
+        unit_cost = st.number_input("Unit cost (TRY)", min_value=0.0, step=0.5,
+                                    value=float((product or {}).get('unit_cost') or 0.0), key=f"cost_{item_name}")
 
     timestamp = st.date_input("Sale Date", value=datetime.today())
 
@@ -32,28 +92,41 @@ with st.form("sales_form"):
         st.session_state.show_total_sale = True
 
     if st.session_state.show_total_sale:
-        st.markdown(f"### 💰 Total Sale: **{st.session_state.calculated_sale:.2f} TRY**")
+        profit = st.session_state.calculated_sale - unit_cost * quantity
+        st.markdown(f"### 💰 Total Sale: **{st.session_state.calculated_sale:.2f} TRY** · Profit: **{profit:.2f} TRY**")
         save_button = st.form_submit_button("✅ Confirm and Save Sale")
 
         if save_button:
             try:
-                session = SessionLocal()
                 dt = datetime.combine(timestamp, datetime.min.time())
-                create_sale(
-                    session=session,
-                    item_name=item_name,
-                    category=category,
-                    price_per_unit=price,
-                    quantity_sold=quantity,
-                    cost=0.0,  # Placeholder; real cost logic will come later
-                    timestamp=dt
-                )
+                sale = {
+                    'item_name': item_name,
+                    'category': category,
+                    'price_per_unit': price,
+                    'quantity_sold': quantity,
+                    'cost': unit_cost * quantity,
+                    'timestamp': dt,
+                }
+                # New product, or its cost changed: keep the catalog current.
+                # Without the catalog we can't tell, so it is left alone.
+                unchanged = not catalog_loaded or (product and product['unit_cost'] == unit_cost)
+                product_update = None if unchanged else {
+                    'name': item_name,
+                    'category': category,
+                    'unit_cost': unit_cost,
+                    'unit_price': price if not product else None,
+                }
+
+                if settings.WRITE_BEHIND:
+                    enqueue('sale', {'sale': sale, 'product': product_update})
+                else:
+                    with session_scope() as session:
+                        product_id = save_product(session, **product_update).id if product_update else product['id']
+                        create_sale(session=session, **sale, product_id=product_id)
+                if product_update:
+                    # Pick up the new product or cost on the next rerun
+                    expire_catalog()
                 st.success("✅ Sale recorded successfully!")
                 st.session_state.show_total_sale = False
             except Exception as e:
                 st.error(f"❌ Error saving sale: {e}")
-            finally:
-                session.close()
-
-
-